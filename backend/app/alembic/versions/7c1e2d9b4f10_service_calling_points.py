@@ -0,0 +1,44 @@
+"""service calling points
+
+Revision ID: 7c1e2d9b4f10
+Revises: 4a653fa94068
+Create Date: 2026-10-18 13:45:12.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1e2d9b4f10'
+down_revision = '4a653fa94068'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('service_calling_points',
+    sa.Column('service_id', sa.String(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('crs', sa.String(length=3), nullable=False),
+    sa.Column('scheduled_time', sa.String(length=5), nullable=True),
+    sa.ForeignKeyConstraint(['service_id'], ['known_services.service_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('service_id', 'seq')
+    )
+    op.create_index('ix_service_calling_points_crs_service_id', 'service_calling_points', ['crs', 'service_id'], unique=False)
+
+    # Backfill from the existing calling_points JSON
+    op.execute("""
+        INSERT INTO service_calling_points (service_id, seq, crs, scheduled_time)
+        SELECT ks.service_id, cp.ordinality - 1, cp.value ->> 'crs', cp.value ->> 'scheduled_time'
+        FROM known_services ks
+        CROSS JOIN LATERAL json_array_elements(ks.calling_points) WITH ORDINALITY AS cp
+        WHERE ks.calling_points IS NOT NULL
+          AND json_typeof(ks.calling_points) = 'array'
+          AND cp.value ->> 'crs' IS NOT NULL
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_service_calling_points_crs_service_id', table_name='service_calling_points')
+    op.drop_table('service_calling_points')
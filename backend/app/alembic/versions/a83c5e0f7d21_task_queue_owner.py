@@ -0,0 +1,27 @@
+"""task queue owner
+
+Revision ID: a83c5e0f7d21
+Revises: f4b7d2e6a913
+Create Date: 2026-10-18 17:20:12.604913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a83c5e0f7d21'
+down_revision = 'f4b7d2e6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('task_queue', sa.Column('owner', sa.String(length=64), nullable=True))
+    op.create_index('ix_task_queue_queued_owner', 'task_queue', ['owner'], unique=False,
+                    postgresql_where=sa.text("status = 'queued'"))
+
+
+def downgrade():
+    op.drop_index('ix_task_queue_queued_owner', table_name='task_queue')
+    op.drop_column('task_queue', 'owner')
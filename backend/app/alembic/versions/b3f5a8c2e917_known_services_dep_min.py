@@ -0,0 +1,35 @@
+"""known services dep_min
+
+Revision ID: b3f5a8c2e917
+Revises: 7c1e2d9b4f10
+Create Date: 2026-10-18 14:10:37.518226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f5a8c2e917'
+down_revision = '7c1e2d9b4f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('known_services', sa.Column('dep_min', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE known_services
+        SET dep_min = split_part(scheduled_departure, ':', 1)::int * 60
+                    + split_part(scheduled_departure, ':', 2)::int
+    """)
+    op.alter_column('known_services', 'dep_min', nullable=False)
+    op.create_index('ix_known_services_origin_dep_min', 'known_services', ['origin', 'dep_min'], unique=False)
+    # The composite index covers lookups by origin alone
+    op.drop_index(op.f('ix_known_services_origin'), table_name='known_services')
+
+
+def downgrade():
+    op.create_index(op.f('ix_known_services_origin'), 'known_services', ['origin'], unique=False)
+    op.drop_index('ix_known_services_origin_dep_min', table_name='known_services')
+    op.drop_column('known_services', 'dep_min')
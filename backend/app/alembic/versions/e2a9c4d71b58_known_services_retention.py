@@ -0,0 +1,32 @@
+"""known services retention
+
+Revision ID: e2a9c4d71b58
+Revises: b3f5a8c2e917
+Create Date: 2026-10-18 14:42:05.913374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4d71b58'
+down_revision = 'b3f5a8c2e917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows have unknown running days, so trust them on every day
+    op.add_column('known_services', sa.Column('days_seen', sa.Integer(), nullable=False, server_default='127'))
+    op.alter_column('known_services', 'days_seen', server_default=None)
+    op.add_column('known_services', sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE known_services SET last_seen_at = discovered_at")
+    op.alter_column('known_services', 'last_seen_at', nullable=False)
+    op.create_index(op.f('ix_known_services_last_seen_at'), 'known_services', ['last_seen_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_known_services_last_seen_at'), table_name='known_services')
+    op.drop_column('known_services', 'last_seen_at')
+    op.drop_column('known_services', 'days_seen')
@@ -0,0 +1,41 @@
+"""task queue
+
+Revision ID: f4b7d2e6a913
+Revises: e2a9c4d71b58
+Create Date: 2026-10-18 16:05:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b7d2e6a913'
+down_revision = 'e2a9c4d71b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_queue',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('function', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('enqueued_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('queue_wait', sa.Float(), nullable=True),
+    sa.Column('duration', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_queue_queued', 'task_queue', ['enqueued_at'], unique=False,
+                    postgresql_where=sa.text("status = 'queued'"))
+    op.create_index(op.f('ix_task_queue_finished_at'), 'task_queue', ['finished_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_task_queue_finished_at'), table_name='task_queue')
+    op.drop_index('ix_task_queue_queued', table_name='task_queue')
+    op.drop_table('task_queue')
@@ -1,15 +1,30 @@
 # app/api/api_v1/routers/train.py
 from typing import List, Dict, Any
+import asyncio
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import structlog
+from app.core import config
 from app.core.auth import get_current_active_user
+from app.core.rail_time import normalise_crs
+from app.exceptions import TaskQueueFull, TrainServiceException
 from app.db.schemas import user_schema
 from app.db.session import get_db, SessionLocal
-from app.services.train_service import create_train_service
-from app.simple_queue import async_task
+from app.services.train_service import (
+    create_train_service,
+    board_cache,
+    board_flights,
+    known_service_cache,
+    reachability_index,
+)
+from app.services.journey_planner import journey_planner, plan_journeys
+from app.simple_queue import async_task, run_in_thread
 from app.core.state import app_state
+from datetime import datetime
 from time import time
+import pytz
 
 # Create module logger
 log = structlog.get_logger("api.train")
@@ -24,8 +39,27 @@ def get_background_db():
     finally:
         db.close()
 
-@async_task
-def get_train_routes_task(
+def routes_task_owner(origins, destinations, forceFetch, user_id):
+    """Admission caps how many route requests each user has queued."""
+    return user_id
+
+def routes_task_slot(origins, destinations, forceFetch, user_id):
+    """A user's newer request for the same journey replaces their older queued one."""
+    return (
+        tuple(sorted({normalise_crs(o) for o in origins})),
+        tuple(sorted({normalise_crs(d) for d in destinations})),
+    )
+
+def routes_task_key(origins, destinations, forceFetch, user_id):
+    """Identical route requests share a task whichever user makes them."""
+    return [
+        sorted({normalise_crs(o) for o in origins}),
+        sorted({normalise_crs(d) for d in destinations}),
+        bool(forceFetch),
+    ]
+
+@async_task(key=routes_task_key, owner=routes_task_owner, slot=routes_task_slot)
+async def get_train_routes_task(
     origins: List[str],
     destinations: List[str],
     forceFetch: bool,
@@ -46,8 +80,8 @@ def get_train_routes_task(
     try:
         db = next(db_generator)
         start_time = time()
-        train_service = create_train_service(db)
-        result = train_service.get_train_routes(origins, destinations, forceFetch)
+        train_service = await create_train_service(db)
+        result = await train_service.get_train_routes(origins, destinations, forceFetch)
         task_log.debug("api.train.task.debugoutput", result=result)
 
         duration = time() - start_time
@@ -98,6 +132,8 @@ async def read_train_routes(
             current_user.id
         )
 
+        handle = app_state.task_manager.issue_handle(task_id, current_user.id)
+
         request_log.info(
             "api.train.task.created",
             task_id=task_id
@@ -105,10 +141,31 @@ async def read_train_routes(
 
         return {
             "status": "pending",
-            "task_id": task_id,
-            "check_status_url": f"/train_routes/task_status/{task_id}"
+            "task_id": handle,
+            "check_status_url": f"/train_routes/task_status/{handle}",
+            "wait_url": f"/train_routes/task_status/{handle}/wait"
         }
 
+    except TaskQueueFull as e:
+        retry_after = app_state.task_manager.retry_after()
+        request_log.warning(
+            "api.train.task.rejected",
+            queue_depth=e.depth,
+            owner_limited=e.owner is not None,
+            retry_after=retry_after
+        )
+        # One user's own backlog is rate limiting; a full shared queue is overload
+        if e.owner is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="You already have route requests queued, try again shortly",
+                headers={"Retry-After": str(retry_after)}
+            )
+        raise HTTPException(
+            status_code=503,
+            detail="Too many route requests queued, try again shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
     except Exception as e:
         request_log.error(
             "api.train.task.creation.failed",
@@ -118,23 +175,112 @@ async def read_train_routes(
         )
         raise HTTPException(status_code=500, detail="Failed to start task")
 
-@r.get("/train_routes/task_status/{task_id}")
-async def get_task_status(
-    task_id: str,
-    current_user: user_schema.User = Depends(get_current_active_user)
+# Each stream runs inline with its own session, so this bounds their share of the pool
+stream_slots = asyncio.Semaphore(config.STREAM_MAX_CONCURRENT)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@r.get("/train_routes/stream")
+async def stream_train_routes(
+    origins: List[str] = Query(..., alias="origins[]"),
+    destinations: List[str] = Query(..., alias="destinations[]"),
+    forceFetch: bool = Query(False),
+    current_user: user_schema.User = Depends(get_current_active_user),
 ):
-    """Check status of a train routes task."""
+    """Stream the sorted routes found so far as Server-Sent Events.
+
+    A "routes" event follows each origin's known services and each batch of
+    fetched details, then "complete" carries the final list, or "error".
+    The work runs inline rather than on the task queue, and stops when the
+    client disconnects; identical upstream calls still coalesce in board_flights.
+    At most STREAM_MAX_CONCURRENT streams run at once; beyond that it is 503.
+    """
     request_log = log.bind(
         user_id=current_user.id,
-        task_id=task_id,
-        endpoint="get_task_status"
+        endpoint="stream_train_routes",
+        origins=origins,
+        destinations=destinations,
+        force_fetch=forceFetch
     )
+    if stream_slots.locked():
+        request_log.warning(
+            "api.train.stream.rejected",
+            limit=config.STREAM_MAX_CONCURRENT,
+            retry_after=config.STREAM_RETRY_AFTER
+        )
+        raise HTTPException(
+            status_code=503,
+            detail="Too many route streams open, try again shortly",
+            headers={"Retry-After": str(config.STREAM_RETRY_AFTER)}
+        )
+    # Not locked, so this takes a slot without waiting
+    await stream_slots.acquire()
+    updates: asyncio.Queue = asyncio.Queue()
 
-    request_log.debug("api.train.status.check.start")
+    async def run():
+        try:
+            db = SessionLocal()
+            try:
+                train_service = await create_train_service(db)
+                return await train_service.get_train_routes(
+                    origins, destinations, forceFetch, on_progress=updates.put
+                )
+            finally:
+                db.close()
+        finally:
+            stream_slots.release()
+
+    # Started here so the slot is released even if the body is never iterated
+    start_time = time()
+    task = asyncio.create_task(run())
+    task.add_done_callback(lambda _: updates.put_nowait(None))
+
+    async def events():
+        try:
+            while (services := await updates.get()) is not None:
+                request_log.debug("api.train.stream.update", routes_count=len(services))
+                yield _sse("routes", {"services": services, "complete": False})
+
+            try:
+                services = task.result()
+            except TrainServiceException as e:
+                request_log.error("api.train.stream.failed", error=str(e), status_code=e.status_code)
+                yield _sse("error", {"status_code": e.status_code, "detail": e.detail})
+                return
+            except Exception as e:
+                request_log.error(
+                    "api.train.stream.failed",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                yield _sse("error", {"status_code": 500, "detail": str(e)})
+                return
+
+            request_log.info(
+                "api.train.stream.completed",
+                duration=round(time() - start_time, 3),
+                routes_count=len(services)
+            )
+            yield _sse("complete", {"services": services, "complete": True})
+        finally:
+            # The client went away before the routes were done
+            if not task.done():
+                task.cancel()
 
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _task_status(handle: str, user_id: int, timeout: float, request_log) -> Dict[str, Any]:
+    """Shared body of the status and long-poll endpoints."""
     try:
-        result = await app_state.task_manager.get_result(task_id, timeout=0.1)
-        #request_log.debug(result)
+        task_id = app_state.task_manager.resolve_handle(handle, user_id)
+        request_log = request_log.bind(shared_task_id=task_id)
+        result = await app_state.task_manager.get_result(task_id, timeout=timeout)
 
         if result['status'] == 'completed':
             request_log.info(
@@ -154,21 +300,36 @@ async def get_task_status(
                 "status": "failed",
                 "error": result['result']
             }
+        elif result['status'] == 'expired':
+            request_log.info("api.train.status.check.expired")
+            return {
+                "status": "expired",
+                "task_id": handle
+            }
+        elif result['status'] == 'cancelled':
+            request_log.info("api.train.status.check.cancelled")
+            return {
+                "status": "cancelled",
+                "task_id": handle
+            }
 
         request_log.debug("api.train.status.check.pending")
         return {
             "status": "pending",
-            "task_id": task_id
+            "task_id": handle
         }
 
+    except KeyError:
+        request_log.info("api.train.status.check.unknown")
+        raise HTTPException(status_code=404, detail="Task not found")
     except TimeoutError:
         request_log.debug(
             "api.train.status.check.timeout",
-            timeout_value=0.1
+            timeout_value=timeout
         )
         return {
             "status": "pending",
-            "task_id": task_id
+            "task_id": handle
         }
     except Exception as e:
         request_log.error(
@@ -177,4 +338,81 @@ async def get_task_status(
             error_type=type(e).__name__,
             exc_info=True
         )
-        raise HTTPException(status_code=500, detail="Failed to check task status")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to check task status")
+
+@r.get("/train_routes/task_status/{task_id}")
+async def get_task_status(
+    task_id: str,
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    """Check status of a train routes task without waiting."""
+    request_log = log.bind(
+        user_id=current_user.id,
+        task_id=task_id,
+        endpoint="get_task_status"
+    )
+
+    request_log.debug("api.train.status.check.start")
+    return await _task_status(task_id, current_user.id, 0, request_log)
+
+@r.get("/train_routes/task_status/{task_id}/wait")
+async def wait_task_status(
+    task_id: str,
+    timeout: float = Query(config.TASK_LONG_POLL_MAX, gt=0),
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    """Long-poll a train routes task, returning as soon as it finishes or after timeout seconds."""
+    timeout = min(timeout, config.TASK_LONG_POLL_MAX)
+    request_log = log.bind(
+        user_id=current_user.id,
+        task_id=task_id,
+        endpoint="wait_task_status"
+    )
+
+    request_log.debug("api.train.status.wait.start", timeout=timeout)
+    return await _task_status(task_id, current_user.id, timeout, request_log)
+
+@r.get("/journeys/")
+async def read_journeys(
+    origins: List[str] = Query(..., alias="origins[]"),
+    destinations: List[str] = Query(..., alias="destinations[]"),
+    current_user: user_schema.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Plan direct and one-change journeys from known services, without upstream calls."""
+    request_log = log.bind(
+        user_id=current_user.id,
+        endpoint="read_journeys",
+        origins=origins,
+        destinations=destinations
+    )
+
+    try:
+        now = datetime.now(pytz.timezone('Europe/London'))
+        journeys = await run_in_thread(plan_journeys, db, origins, destinations, now)
+        request_log.info("api.train.journeys.completed", journeys_count=len(journeys))
+        return {"journeys": journeys}
+
+    except Exception as e:
+        request_log.error(
+            "api.train.journeys.failed",
+            error=str(e),
+            error_type=type(e).__name__,
+            exc_info=True
+        )
+        raise HTTPException(status_code=500, detail="Failed to plan journeys")
+
+@r.get("/stats")
+async def get_train_stats(
+    current_user: user_schema.User = Depends(get_current_active_user)
+):
+    """Report upstream cache, request coalescing and in-process index counters."""
+    return {
+        "board_cache": board_cache.stats(),
+        "board_flights": board_flights.stats(),
+        "known_services": known_service_cache.stats(),
+        "reachability": reachability_index.stats(),
+        "journey_graph": journey_planner.stats(),
+        "tasks": app_state.task_manager.stats() if app_state.task_manager else None,
+        "task_results": app_state.task_manager.result_stats() if app_state.task_manager else None,
+    }
@@ -8,3 +8,90 @@ API_V1_STR = "/api/v1"
 
 
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+
+# Train service upstream fetching
+TRAIN_CONCURRENT_FETCH = os.getenv("TRAIN_CONCURRENT_FETCH", "true").lower() == "true"
+TRAIN_FETCH_CONCURRENCY = int(os.getenv("TRAIN_FETCH_CONCURRENCY", "4"))
+
+# LDBWS SOAP client
+LDBWS_POOL_SIZE = int(os.getenv("LDBWS_POOL_SIZE", "100"))
+WSDL_CACHE_PATH = os.getenv("WSDL_CACHE_PATH", "/tmp/ldbws_wsdl_cache.db")
+WSDL_CACHE_TTL = int(os.getenv("WSDL_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Departure board cache (seconds)
+BOARD_CACHE_TTL = int(os.getenv("BOARD_CACHE_TTL", "30"))
+BOARD_CACHE_STALE_TTL = int(os.getenv("BOARD_CACHE_STALE_TTL", "60"))
+BOARD_CACHE_MAXSIZE = int(os.getenv("BOARD_CACHE_MAXSIZE", "1000"))
+
+# Favourite-origin prefetching (seconds between refreshes)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_PEAK_INTERVAL = int(os.getenv("PREFETCH_PEAK_INTERVAL", "30"))
+PREFETCH_OFFPEAK_INTERVAL = int(os.getenv("PREFETCH_OFFPEAK_INTERVAL", "120"))
+PREFETCH_NIGHT_INTERVAL = int(os.getenv("PREFETCH_NIGHT_INTERVAL", "900"))
+PREFETCH_MAX_ORIGINS = int(os.getenv("PREFETCH_MAX_ORIGINS", "50"))
+
+# Use per-destination filterCrs boards for queries with this many destinations or fewer
+BOARD_FILTER_MAX_DESTINATIONS = int(os.getenv("BOARD_FILTER_MAX_DESTINATIONS", "2"))
+
+# In-process KnownService cache, reloaded per origin after this many seconds
+KNOWN_SERVICE_CACHE_TTL = int(os.getenv("KNOWN_SERVICE_CACHE_TTL", "3600"))
+# ...keeping at most this many origins, least recently used dropped first
+KNOWN_SERVICE_CACHE_MAX_ORIGINS = int(os.getenv("KNOWN_SERVICE_CACHE_MAX_ORIGINS", "256"))
+
+# Reload each origin's terminus -> served stations index after this many seconds
+REACHABILITY_TTL = int(os.getenv("REACHABILITY_TTL", str(6 * 3600)))
+
+# known_services retention: rows not seen on a board for this many days are deleted
+KNOWN_SERVICE_RETENTION_DAYS = int(os.getenv("KNOWN_SERVICE_RETENTION_DAYS", "21"))
+KNOWN_SERVICE_COMPACT_ENABLED = os.getenv("KNOWN_SERVICE_COMPACT_ENABLED", "true").lower() == "true"
+KNOWN_SERVICE_COMPACT_INTERVAL = int(os.getenv("KNOWN_SERVICE_COMPACT_INTERVAL", str(6 * 3600)))
+KNOWN_SERVICE_COMPACT_BATCH = int(os.getenv("KNOWN_SERVICE_COMPACT_BATCH", "5000"))
+
+# Journey planner over known services (minutes, except the graph TTL in seconds)
+JOURNEY_GRAPH_TTL = int(os.getenv("JOURNEY_GRAPH_TTL", "600"))
+# Seconds between checks for an expired or invalidated graph to rebuild in the background
+JOURNEY_GRAPH_REFRESH_INTERVAL = int(os.getenv("JOURNEY_GRAPH_REFRESH_INTERVAL", "30"))
+JOURNEY_HORIZON = int(os.getenv("JOURNEY_HORIZON", "120"))
+JOURNEY_MIN_INTERCHANGE = int(os.getenv("JOURNEY_MIN_INTERCHANGE", "5"))
+JOURNEY_MAX_WAIT = int(os.getenv("JOURNEY_MAX_WAIT", "60"))
+JOURNEY_MAX_RESULTS = int(os.getenv("JOURNEY_MAX_RESULTS", "10"))
+
+# Task queue: "memory" for one process, or "postgres" to share tasks across workers and hosts
+TASK_BACKEND = os.getenv("TASK_BACKEND", "memory")
+# Idle postgres workers re-check the queue this often in case a NOTIFY was missed (seconds)
+TASK_POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", "5"))
+# Longest backoff between attempts to reconnect a lost LISTEN connection (seconds)
+TASK_LISTEN_RETRY_MAX = float(os.getenv("TASK_LISTEN_RETRY_MAX", "30"))
+# Seconds between result expiry runs, and after which a running task is assumed abandoned
+TASK_MAINTENANCE_INTERVAL = int(os.getenv("TASK_MAINTENANCE_INTERVAL", "60"))
+TASK_STALE_RUNNING = int(os.getenv("TASK_STALE_RUNNING", "600"))
+
+# Admission control: queued tasks beyond TASK_QUEUE_MAX, or beyond TASK_MAX_QUEUED_PER_USER
+# for one user, are refused with 503; a user's newer request for a journey replaces their queued one
+TASK_QUEUE_MAX = int(os.getenv("TASK_QUEUE_MAX", "100"))
+TASK_MAX_QUEUED_PER_USER = int(os.getenv("TASK_MAX_QUEUED_PER_USER", "3"))
+
+# Background task workers, and threads for their blocking DB work and lxml board parsing
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+THREAD_POOL_WORKERS = int(os.getenv("THREAD_POOL_WORKERS", "8"))
+
+# Task results are dropped after this many seconds, or sooner past the count or byte budget
+TASK_RESULT_TTL = int(os.getenv("TASK_RESULT_TTL", "300"))
+TASK_RESULT_MAX_ENTRIES = int(os.getenv("TASK_RESULT_MAX_ENTRIES", "1000"))
+TASK_RESULT_MAX_BYTES = int(os.getenv("TASK_RESULT_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Identical task calls within this many seconds share one task id
+TASK_DEDUP_WINDOW = int(os.getenv("TASK_DEDUP_WINDOW", "30"))
+# Per-user task handles are forgotten after this many seconds
+TASK_HANDLE_TTL = int(os.getenv("TASK_HANDLE_TTL", "3600"))
+TASK_HANDLE_MAX = int(os.getenv("TASK_HANDLE_MAX", "50000"))
+
+# Longest a task_status/{id}/wait request is held open (seconds)
+TASK_LONG_POLL_MAX = float(os.getenv("TASK_LONG_POLL_MAX", "30"))
+
+# Streamed route requests each hold a DB session; beyond this many at once they get 503
+STREAM_MAX_CONCURRENT = int(os.getenv("STREAM_MAX_CONCURRENT", "5"))
+STREAM_RETRY_AFTER = int(os.getenv("STREAM_RETRY_AFTER", "5"))
+
+# Board response parser: "zeep" object graphs or "lxml" streaming parse
+LDBWS_PARSER = os.getenv("LDBWS_PARSER", "zeep")
@@ -0,0 +1,65 @@
+# app/core/rail_time.py
+"""Station code and minute-of-day helpers shared by the train service and CRUD.
+
+Scheduled times are HH:MM strings in UK local time. Comparisons are done on
+minutes since midnight, relative to now, so windows that cross midnight
+order and filter correctly.
+"""
+from datetime import datetime
+from typing import List, Tuple
+
+MINUTES_PER_DAY = 1440
+# Times more than half a day ahead of now are treated as already departed
+HALF_DAY = MINUTES_PER_DAY // 2
+
+
+def normalise_crs(code: str) -> str:
+    """Upper-case a three letter station code."""
+    return code.strip().upper()
+
+
+def parse_hhmm(value: str) -> int:
+    """Minutes since midnight for an HH:MM string."""
+    return int(value[:2]) * 60 + int(value[3:5])
+
+
+def format_hhmm(minutes: int) -> str:
+    """HH:MM string for minutes since midnight, wrapping past 24h."""
+    minutes %= MINUTES_PER_DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def minute_of_day(moment: datetime) -> int:
+    return moment.hour * 60 + moment.minute
+
+
+def relative_minutes(target: int, now: int) -> int:
+    """Signed minutes from now until target, in [-720, 720)."""
+    return (target - now + HALF_DAY) % MINUTES_PER_DAY - HALF_DAY
+
+
+def window_ranges(start: int, window: int) -> List[Tuple[int, int]]:
+    """Inclusive minute ranges covering [start, start + window], split at midnight."""
+    start %= MINUTES_PER_DAY
+    end = start + window
+    if end < MINUTES_PER_DAY:
+        return [(start, end)]
+    return [(start, MINUTES_PER_DAY - 1), (0, end - MINUTES_PER_DAY)]
+
+
+# days_seen bitmask, Monday is bit 0
+ALL_DAYS = 0b1111111
+WEEKDAYS = 0b0011111
+SATURDAY = 0b0100000
+SUNDAY = 0b1000000
+
+
+def day_bit(moment: datetime) -> int:
+    """days_seen bit for the day of moment."""
+    return 1 << moment.weekday()
+
+
+def day_type_mask(moment: datetime) -> int:
+    """days_seen bits sharing a timetable with the day of moment."""
+    bit = day_bit(moment)
+    return bit if bit in (SATURDAY, SUNDAY) else WEEKDAYS
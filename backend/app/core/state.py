@@ -1,8 +1,14 @@
 # app/core/state.py
 from typing import Optional
 from app.simple_queue import AsyncTaskManager
+from app.pg_queue import LeaderLock
+from app.scheduler import FavouritePrefetcher, JourneyGraphRefresher, KnownServiceCompactor
 
 class AppState:
     task_manager: Optional[AsyncTaskManager] = None
+    prefetcher: Optional[FavouritePrefetcher] = None
+    compactor: Optional[KnownServiceCompactor] = None
+    journey_graph: Optional[JourneyGraphRefresher] = None
+    leader: Optional[LeaderLock] = None
 
 app_state = AppState()
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import List, Dict
 from fastapi import HTTPException
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
@@ -197,4 +197,30 @@ def set_profile_as_favourite(db: Session, profile_id: int, is_set: bool = True)
             error=str(e),
             error_type=type(e).__name__
         )
-        raise HTTPException(status_code=500, detail="Failed to update favourite profile")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to update favourite profile")
+
+
+def get_favourite_origins(db: Session) -> List[str]:
+    """Get the distinct origins across every user's favourite profile."""
+    try:
+        profiles = db.query(profile_model.Profile) \
+            .filter(profile_model.Profile.favourite.is_(True)) \
+            .all()
+
+        origins = sorted({
+            origin for profile in profiles for origin in profile.origins_list
+        })
+        log.debug(
+            "profile.favourite_origins.fetch.success",
+            profiles_count=len(profiles),
+            origins_count=len(origins)
+        )
+        return origins
+
+    except SQLAlchemyError as e:
+        log.error(
+            "profile.favourite_origins.fetch.failed",
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(status_code=500, detail="Failed to fetch favourite origins")
@@ -0,0 +1,238 @@
+from typing import Any, Dict, Optional
+from datetime import timedelta
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+import structlog
+from app.db.models.task_model import QueuedTask
+from app.exceptions import TaskQueueFull
+
+log = structlog.get_logger("task_crud")
+
+# NOTIFY channels: new work for idle workers, and finished task ids for waiters
+TASK_QUEUED_CHANNEL = "task_queued"
+TASK_DONE_CHANNEL = "task_done"
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("completed", "failed")
+
+
+def _notify(db: Session, channel: str, payload: str = "") -> None:
+    # Delivered when the surrounding transaction commits
+    db.execute(select(func.pg_notify(channel, payload)))
+
+
+def enqueue_task(
+        db: Session,
+        task_id: str,
+        function: str,
+        payload: Dict[str, Any],
+        max_queued: Optional[int] = None,
+        owner: Optional[str] = None,
+        max_per_owner: Optional[int] = None
+) -> bool:
+    """Queue a task, or requeue a finished one.
+
+    Returns False when the task is already queued or running, so the caller
+    shares it instead. Raises TaskQueueFull with max_queued tasks waiting,
+    or with max_per_owner of them queued by owner.
+    """
+    try:
+        full = None
+        if max_queued is not None:
+            depth = db.query(func.count()).filter(QueuedTask.status == "queued").scalar()
+            if depth >= max_queued:
+                full = TaskQueueFull(depth)
+        if full is None and owner is not None and max_per_owner is not None:
+            owned = db.query(func.count()).filter(
+                QueuedTask.status == "queued",
+                QueuedTask.owner == owner
+            ).scalar()
+            if owned >= max_per_owner:
+                full = TaskQueueFull(owned, owner=owner)
+        if full is not None:
+            status = db.query(QueuedTask.status).filter(QueuedTask.id == task_id).scalar()
+            db.rollback()
+            if status in ACTIVE_STATUSES:
+                return False
+            raise full
+
+        stmt = insert(QueuedTask).values(
+            id=task_id,
+            function=function,
+            payload=payload,
+            status="queued",
+            owner=owner,
+            enqueued_at=func.now()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[QueuedTask.id],
+            set_={
+                "function": stmt.excluded.function,
+                "payload": stmt.excluded.payload,
+                "status": "queued",
+                "owner": stmt.excluded.owner,
+                "result": None,
+                "enqueued_at": func.now(),
+                "started_at": None,
+                "finished_at": None,
+                "queue_wait": None,
+                "duration": None,
+            },
+            where=QueuedTask.status.notin_(ACTIVE_STATUSES)
+        ).returning(QueuedTask.id)
+
+        queued = db.execute(stmt).first() is not None
+        if queued:
+            _notify(db, TASK_QUEUED_CHANNEL)
+        db.commit()
+        return queued
+
+    except TaskQueueFull:
+        raise
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "task.enqueue.failed",
+            task_id=task_id,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def claim_task(db: Session) -> Optional[Any]:
+    """Mark the oldest queued task as running and return it, or None.
+
+    SKIP LOCKED lets any number of workers claim concurrently without
+    blocking on each other's rows.
+    """
+    try:
+        next_id = select(QueuedTask.id).where(
+            QueuedTask.status == "queued"
+        ).order_by(QueuedTask.enqueued_at).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+        row = db.execute(
+            update(QueuedTask)
+            .where(QueuedTask.id == next_id)
+            .values(
+                status="running",
+                started_at=func.now(),
+                queue_wait=func.extract("epoch", func.now() - QueuedTask.enqueued_at)
+            )
+            .returning(QueuedTask.id, QueuedTask.function, QueuedTask.payload, QueuedTask.queue_wait)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
+        return row
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "task.claim.failed",
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def finish_task(db: Session, task_id: str, record: Dict[str, Any]) -> None:
+    """Store a running task's result record and wake its waiters."""
+    try:
+        db.execute(
+            update(QueuedTask)
+            .where(QueuedTask.id == task_id, QueuedTask.status == "running")
+            .values(
+                status=record["status"],
+                result=record["result"],
+                duration=record.get("duration"),
+                finished_at=func.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        _notify(db, TASK_DONE_CHANNEL, task_id)
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "task.finish.failed",
+            task_id=task_id,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def get_task_record(db: Session, task_id: str) -> Optional[Dict[str, Any]]:
+    """Get a task's status and result record by id."""
+    try:
+        task = db.query(QueuedTask).filter(QueuedTask.id == task_id).first()
+        return task.to_record() if task is not None else None
+    except Exception as e:
+        log.error(
+            "task.fetch.failed",
+            task_id=task_id,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+    finally:
+        # Each poll should see other workers' commits
+        db.rollback()
+
+
+def expire_tasks(db: Session, result_ttl: int, tombstone_ttl: int) -> Dict[str, int]:
+    """Drop result payloads after result_ttl seconds, and the rows after tombstone_ttl."""
+    try:
+        expired = db.query(QueuedTask).filter(
+            QueuedTask.status.in_(FINISHED_STATUSES),
+            QueuedTask.finished_at < func.now() - timedelta(seconds=result_ttl)
+        ).update({"status": "expired", "result": None}, synchronize_session=False)
+        deleted = db.query(QueuedTask).filter(
+            QueuedTask.status == "expired",
+            QueuedTask.finished_at < func.now() - timedelta(seconds=tombstone_ttl)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return {"expired": expired, "deleted": deleted}
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "task.expire.failed",
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def requeue_stale_tasks(db: Session, timeout: int) -> int:
+    """Requeue tasks left running longer than timeout seconds by a worker that died."""
+    try:
+        count = db.query(QueuedTask).filter(
+            QueuedTask.status == "running",
+            QueuedTask.started_at < func.now() - timedelta(seconds=timeout)
+        ).update({"status": "queued", "started_at": None}, synchronize_session=False)
+        if count:
+            _notify(db, TASK_QUEUED_CHANNEL)
+        db.commit()
+        return count
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "task.requeue.failed",
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def count_tasks(db: Session) -> Dict[str, int]:
+    """Number of task rows per status."""
+    try:
+        return dict(
+            db.query(QueuedTask.status, func.count()).group_by(QueuedTask.status).all()
+        )
+    finally:
+        db.rollback()
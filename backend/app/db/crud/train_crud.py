@@ -1,43 +1,92 @@
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, cast, case, func, select, text
+from sqlalchemy.dialects.postgresql import JSONB, insert
 import structlog
-from app.db.models.train_model import KnownService
+from app.core.rail_time import day_bit, parse_hhmm
+from app.db.models.train_model import KnownService, ServiceCallingPoint
 
 log = structlog.get_logger("train_crud")
 
-def get_services_for_origin(
-        db: Session,
-        origin: str,
-        current_time: datetime,
-        window_minutes: int = 60
-) -> List[KnownService]:
-    """Get known services from an origin within time window."""
+
+def _seen_today_clause(seen_at: datetime):
+    """True for rows already marked seen on the day of seen_at."""
+    day_start = seen_at.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return and_(
+        KnownService.days_seen.op('&')(day_bit(seen_at)) != 0,
+        KnownService.last_seen_at >= day_start
+    )
+
+
+# Columns copied into in-process service records
+_SERVICE_ROW_COLUMNS = (
+    KnownService.service_id,
+    KnownService.origin,
+    KnownService.destination,
+    KnownService.destination_name,
+    KnownService.scheduled_departure,
+    KnownService.dep_min,
+    KnownService.operator,
+    KnownService.days_seen,
+)
+
+
+def get_origin_services(db: Session, origin: str) -> List[Any]:
+    """Get every known service from an origin as plain rows, for caching.
+
+    Rows carry their stops from the calling point index rather than the
+    calling_points JSON, which get_calling_points loads for matches only.
+    """
+    stops = select(func.array_agg(ServiceCallingPoint.crs)).where(
+        ServiceCallingPoint.service_id == KnownService.service_id
+    ).scalar_subquery()
     try:
-        start_time = current_time.strftime("%H:%M")
-        end_datetime = current_time + timedelta(minutes=window_minutes)
-        end_time = end_datetime.strftime("%H:%M")
+        return db.query(*_SERVICE_ROW_COLUMNS, stops.label('stops')).filter(
+            KnownService.origin == origin
+        ).all()
 
-        query = db.query(KnownService).filter(
-            KnownService.origin == origin,
+    except Exception as e:
+        log.error(
+            "train.services.fetch.failed",
+            origin=origin,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch train services: {str(e)}"
         )
 
-        # Handle time windows that cross midnight
-        if end_time > start_time:
-            query = query.filter(
-                KnownService.scheduled_departure.between(start_time, end_time)
-            )
-        else:
-            query = query.filter(
-                or_(
-                    KnownService.scheduled_departure >= start_time,
-                    KnownService.scheduled_departure <= end_time
-                )
-            )
 
-        return query.all()
+def get_calling_points(db: Session, service_ids: List[str]) -> Dict[str, List[dict]]:
+    """Map each of the given service ids to its calling points."""
+    if not service_ids:
+        return {}
+    try:
+        rows = db.query(KnownService.service_id, KnownService.calling_points).filter(
+            KnownService.service_id.in_(service_ids)
+        )
+        return {service_id: calling_points for service_id, calling_points in rows}
+
+    except Exception as e:
+        log.error(
+            "train.services.fetch.failed",
+            services=len(service_ids),
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch calling points: {str(e)}"
+        )
+
+
+def get_all_services(db: Session) -> List[Any]:
+    """Get every known service as plain rows, for the journey planner."""
+    try:
+        return db.query(*_SERVICE_ROW_COLUMNS, KnownService.calling_points).all()
 
     except Exception as e:
         log.error(
@@ -50,6 +99,38 @@ def get_services_for_origin(
             detail=f"Failed to fetch train services: {str(e)}"
         )
 
+
+def get_reachable_stations(db: Session, origin: str) -> Dict[str, Set[str]]:
+    """Map each terminus served from an origin to every station its services call at."""
+    try:
+        rows = db.query(
+            KnownService.destination,
+            ServiceCallingPoint.crs
+        ).join(
+            ServiceCallingPoint,
+            ServiceCallingPoint.service_id == KnownService.service_id
+        ).filter(
+            KnownService.origin == origin
+        ).distinct()
+
+        reachable: Dict[str, Set[str]] = {}
+        for terminus, crs in rows:
+            reachable.setdefault(terminus, set()).add(crs)
+        return reachable
+
+    except Exception as e:
+        log.error(
+            "train.reachability.fetch.failed",
+            origin=origin,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch reachable stations: {str(e)}"
+        )
+
+
 def create_or_update_service(
         db: Session,
         service_id: str,
@@ -61,6 +142,7 @@ def create_or_update_service(
         operator: str
 ) -> KnownService:
     """Create or update a known service."""
+    now = datetime.now()
     try:
         db_service = db.query(KnownService).filter(
             KnownService.service_id == service_id
@@ -71,8 +153,11 @@ def create_or_update_service(
             db_service.origin = origin
             db_service.destination = destination
             db_service.scheduled_departure = scheduled_departure
+            db_service.dep_min = parse_hhmm(scheduled_departure)
             db_service.calling_points = calling_points
             db_service.operator = operator
+            db_service.days_seen = db_service.days_seen | day_bit(now)
+            db_service.last_seen_at = now
         else:
             # Create new service
             db_service = KnownService(
@@ -81,12 +166,20 @@ def create_or_update_service(
                 destination=destination,
                 destination_name=destination_name,
                 scheduled_departure=scheduled_departure,
+                dep_min=parse_hhmm(scheduled_departure),
                 calling_points=calling_points,
                 operator=operator,
-                discovered_at=datetime.now()
+                discovered_at=now,
+                days_seen=day_bit(now),
+                last_seen_at=now
             )
             db.add(db_service)
 
+        db.flush()
+        _replace_calling_points(db, [{
+            'service_id': service_id,
+            'calling_points': calling_points
+        }])
         db.commit()
         db.refresh(db_service)
         return db_service
@@ -102,4 +195,202 @@ def create_or_update_service(
         raise HTTPException(
             status_code=500,
             detail=f"Failed to save service: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def _replace_calling_points(db: Session, services: List[dict]) -> None:
+    """Rewrite the calling point index rows of the given services."""
+    if not services:
+        return
+
+    db.query(ServiceCallingPoint).filter(
+        ServiceCallingPoint.service_id.in_([s['service_id'] for s in services])
+    ).delete(synchronize_session=False)
+
+    points = [
+        {
+            'service_id': service['service_id'],
+            'seq': seq,
+            'crs': point['crs'],
+            'scheduled_time': point.get('scheduled_time')
+        }
+        for service in services
+        for seq, point in enumerate(service['calling_points'] or [])
+    ]
+    if points:
+        # executemany keeps one cached statement; psycopg2 pages it into VALUES batches
+        db.execute(insert(ServiceCallingPoint), points)
+
+
+def bulk_upsert_services(
+        db: Session,
+        services: List[dict],
+        seen_at: Optional[datetime] = None
+) -> List[str]:
+    """Insert or update a batch of known services in one statement.
+
+    Each dict carries the KnownService columns. Rows whose calling points
+    and operator are unchanged, and which were already seen today, are left
+    alone. A change of calling points resets days_seen to today, so the
+    other day types revalidate. Only new or changed services have their
+    calling point index rewritten. Returns the service_ids actually written.
+    """
+    if not services:
+        return []
+
+    # ON CONFLICT cannot touch the same row twice in one statement
+    rows = {s['service_id']: s for s in services}
+    now = datetime.now()
+    seen_at = seen_at or now
+    last_seen_at = seen_at.replace(tzinfo=None)
+
+    try:
+        stmt = insert(KnownService).values([
+            {
+                **row,
+                'dep_min': parse_hhmm(row['scheduled_departure']),
+                'discovered_at': now,
+                'days_seen': day_bit(seen_at),
+                'last_seen_at': last_seen_at
+            }
+            for row in rows.values()
+        ])
+        # JSON has no equality operator, so compare as JSONB
+        changed = or_(
+            cast(KnownService.calling_points, JSONB).is_distinct_from(
+                cast(stmt.excluded.calling_points, JSONB)
+            ),
+            KnownService.operator.is_distinct_from(stmt.excluded.operator)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[KnownService.service_id],
+            set_={
+                'origin': stmt.excluded.origin,
+                'destination': stmt.excluded.destination,
+                'scheduled_departure': stmt.excluded.scheduled_departure,
+                'dep_min': stmt.excluded.dep_min,
+                'calling_points': stmt.excluded.calling_points,
+                'operator': stmt.excluded.operator,
+                'days_seen': case(
+                    (changed, stmt.excluded.days_seen),
+                    else_=KnownService.days_seen.op('|')(stmt.excluded.days_seen)
+                ),
+                'last_seen_at': stmt.excluded.last_seen_at,
+            },
+            where=or_(changed, ~_seen_today_clause(seen_at))
+        )
+        # RETURNING only sees the new row; a sibling CTE reads the rows as
+        # they were before the statement, which tells edits from seen bumps
+        previous = select(
+            KnownService.service_id,
+            KnownService.calling_points,
+            KnownService.operator
+        ).where(KnownService.service_id.in_(list(rows))).cte('previous')
+        upserted = stmt.returning(
+            KnownService.service_id,
+            KnownService.calling_points,
+            KnownService.operator
+        ).cte('upserted')
+        content_changed = or_(
+            previous.c.service_id.is_(None),
+            cast(previous.c.calling_points, JSONB).is_distinct_from(
+                cast(upserted.c.calling_points, JSONB)
+            ),
+            previous.c.operator.is_distinct_from(upserted.c.operator)
+        )
+        stmt = select(upserted.c.service_id, content_changed.label('changed')).select_from(
+            upserted.outerjoin(previous, previous.c.service_id == upserted.c.service_id)
+        )
+
+        result = db.execute(stmt).all()
+        written = [row.service_id for row in result]
+        _replace_calling_points(db, [rows[row.service_id] for row in result if row.changed])
+        db.commit()
+
+        log.info(
+            "train.services.upsert",
+            batch_size=len(rows),
+            written=len(written),
+            changed=sum(1 for row in result if row.changed),
+            unchanged=len(rows) - len(written)
+        )
+        return written
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "train.services.upsert.failed",
+            batch_size=len(rows),
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to save services: {str(e)}"
+        )
+
+
+def mark_services_seen(db: Session, service_ids: List[str], seen_at: datetime) -> int:
+    """Record that services appeared on a board; returns rows updated."""
+    if not service_ids:
+        return 0
+
+    try:
+        updated = db.query(KnownService).filter(
+            KnownService.service_id.in_(service_ids),
+            ~_seen_today_clause(seen_at)
+        ).update({
+            KnownService.days_seen: KnownService.days_seen.op('|')(day_bit(seen_at)),
+            KnownService.last_seen_at: seen_at.replace(tzinfo=None)
+        }, synchronize_session=False)
+        db.commit()
+        return updated
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "train.services.seen.failed",
+            count=len(service_ids),
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to mark services seen: {str(e)}"
+        )
+
+
+def delete_stale_services(db: Session, cutoff: datetime, batch_size: int = 5000) -> int:
+    """Delete services not seen since cutoff, in batches to keep locks short."""
+    deleted = 0
+    try:
+        while True:
+            stale_ids = db.query(KnownService.id).filter(
+                KnownService.last_seen_at < cutoff
+            ).limit(batch_size).subquery()
+            # Calling points go with them through ON DELETE CASCADE
+            count = db.query(KnownService).filter(
+                KnownService.id.in_(stale_ids.select())
+            ).delete(synchronize_session=False)
+            db.commit()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+    except Exception as e:
+        db.rollback()
+        log.error(
+            "train.services.compact.failed",
+            deleted=deleted,
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        raise
+
+
+def vacuum_known_services(db: Session) -> None:
+    """Reclaim space left by deleted services so the tables stay compact."""
+    # VACUUM cannot run inside a transaction block
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM (ANALYZE) known_services"))
+        conn.execute(text("VACUUM (ANALYZE) service_calling_points"))
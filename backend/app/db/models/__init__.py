@@ -1,4 +1,5 @@
 # app/db/models/__init__.py
 from .user_model import User
 from .profile_model import Profile
-from .train_model import KnownService
\ No newline at end of file
+from .train_model import KnownService, ServiceCallingPoint
+from .task_model import QueuedTask
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, String, DateTime, Float, JSON, Index, text
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+class QueuedTask(Base):
+    """A task in the shared Postgres queue, and its result once finished."""
+    __tablename__ = "task_queue"
+    __table_args__ = (
+        # Workers only ever scan queued rows, oldest first
+        Index("ix_task_queue_queued", "enqueued_at", postgresql_where=text("status = 'queued'")),
+        # Per-owner admission counts an owner's queued rows
+        Index("ix_task_queue_queued_owner", "owner", postgresql_where=text("status = 'queued'")),
+    )
+
+    id = Column(String(64), primary_key=True)
+    function = Column(String, nullable=False)  # task_registry name
+    payload = Column(JSON, nullable=False)  # {"args": [...], "kwargs": {...}}
+    status = Column(String(16), nullable=False)  # queued, running, completed, failed or expired
+    owner = Column(String(64))  # who queued it, for per-owner admission
+    result = Column(JSON)
+    enqueued_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True), index=True)
+    queue_wait = Column(Float)  # seconds
+    duration = Column(Float)  # seconds
+
+    def to_record(self):
+        """Result record in the shape AsyncTaskManager.get_result returns."""
+        return {
+            "status": self.status,
+            "result": self.result,
+            "duration": self.duration,
+            "queue_wait": self.queue_wait
+        }
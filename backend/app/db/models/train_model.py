@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
 from app.db.session import Base
 import structlog
 
@@ -7,16 +7,22 @@ log = structlog.get_logger("train_model")
 class KnownService(Base):
     """Known train services and their calling points."""
     __tablename__ = "known_services"
+    __table_args__ = (
+        Index("ix_known_services_origin_dep_min", "origin", "dep_min"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     service_id = Column(String, nullable=False, unique=True, index=True)
-    origin = Column(String(3), nullable=False, index=True)
+    origin = Column(String(3), nullable=False)
     destination = Column(String(3), nullable=False, index=True)
     destination_name = Column(String(30), nullable=False, index=True)
     scheduled_departure = Column(String(5), nullable=False)  # HH:MM format
+    dep_min = Column(Integer, nullable=False)  # scheduled_departure as minutes since midnight
     calling_points = Column(JSON)  # [{crs, station_name, scheduled_time}]
     operator = Column(String)
     discovered_at = Column(DateTime, nullable=False)
+    days_seen = Column(Integer, nullable=False)  # weekday bitmask, Monday is bit 0
+    last_seen_at = Column(DateTime, nullable=False, index=True)
 
     def to_dict(self):
         """Convert to dictionary for API response."""
@@ -28,4 +34,33 @@ class KnownService(Base):
             "scheduled_departure": self.scheduled_departure,
             "subsequent_calling_points": self.calling_points,
             "operator": self.operator
-        }
\ No newline at end of file
+        }
+
+    def to_row(self):
+        """Column values for a bulk insert."""
+        return {
+            "service_id": self.service_id,
+            "origin": self.origin,
+            "destination": self.destination,
+            "destination_name": self.destination_name,
+            "scheduled_departure": self.scheduled_departure,
+            "calling_points": self.calling_points,
+            "operator": self.operator
+        }
+
+
+class ServiceCallingPoint(Base):
+    """One stop of a known service, so destination matching can run in SQL."""
+    __tablename__ = "service_calling_points"
+    __table_args__ = (
+        Index("ix_service_calling_points_crs_service_id", "crs", "service_id"),
+    )
+
+    service_id = Column(
+        String,
+        ForeignKey("known_services.service_id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    seq = Column(Integer, primary_key=True)
+    crs = Column(String(3), nullable=False)
+    scheduled_time = Column(String(5))  # HH:MM format
@@ -4,3 +4,14 @@ class TrainServiceException(Exception):
         self.status_code = status_code
         self.detail = detail
 
+
+
+class TaskQueueFull(Exception):
+    def __init__(self, depth: int, owner=None):
+        self.depth = depth
+        # Set when the refusal is one owner's limit rather than the whole queue's
+        self.owner = owner
+        if owner is None:
+            super().__init__(f"Task queue is full ({depth} queued)")
+        else:
+            super().__init__(f"Too many tasks queued for {owner} ({depth} queued)")
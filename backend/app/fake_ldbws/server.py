@@ -0,0 +1,201 @@
+# app/fake_ldbws/server.py
+"""Local stand-in for OpenLDBWS, for offline development and load testing.
+
+Run it next to the backend and point WSDL at it:
+
+    uvicorn app.fake_ldbws.server:app --port 8081
+    WSDL=http://localhost:8081/OpenLDBWS/wsdl.aspx
+
+Boards come from recorded envelopes in FAKE_LDBWS_RECORDINGS, named
+<operation>_<crs>.xml, or from a seeded synthetic timetable otherwise.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import pytz
+import structlog
+from fastapi import FastAPI, Request, Response
+from lxml import etree
+from lxml.builder import ElementMaker
+from app.fake_ldbws.timetable import SyntheticTimetable
+
+log = structlog.get_logger("fake_ldbws")
+
+WSDL_PATH = Path(__file__).parent / "ldb.wsdl"
+SOAP_PATH = "/OpenLDBWS/ldb12.asmx"
+
+SOAP_NS = "http://schemas.xmlsoap.org/soap/envelope/"
+LDB_NS = "http://thalesgroup.com/RTTI/2021-11-01/ldb/"
+LT4_NS = "http://thalesgroup.com/RTTI/2015-11-27/ldb/types"
+LT5_NS = "http://thalesgroup.com/RTTI/2016-02-16/ldb/types"
+LT8_NS = "http://thalesgroup.com/RTTI/2021-11-01/ldb/types"
+
+OPERATIONS = {
+    "GetDepartureBoardRequest": "GetDepartureBoard",
+    "GetDepBoardWithDetailsRequest": "GetDepBoardWithDetails",
+}
+
+london_tz = pytz.timezone('Europe/London')
+
+SOAP = ElementMaker(namespace=SOAP_NS, nsmap={"soap": SOAP_NS})
+LDB = ElementMaker(namespace=LDB_NS, nsmap={None: LDB_NS})
+LT4 = ElementMaker(namespace=LT4_NS)
+LT5 = ElementMaker(namespace=LT5_NS)
+LT8 = ElementMaker(namespace=LT8_NS)
+RESULT_NSMAP = {"lt4": LT4_NS, "lt5": LT5_NS, "lt8": LT8_NS}
+
+
+class FakeSettings:
+    """Behaviour knobs, read from the environment at startup."""
+
+    def __init__(self):
+        self.latency_ms = float(os.getenv("FAKE_LDBWS_LATENCY_MS", "0"))
+        self.jitter_ms = float(os.getenv("FAKE_LDBWS_JITTER_MS", "0"))
+        self.error_rate = float(os.getenv("FAKE_LDBWS_ERROR_RATE", "0"))
+        self.recordings = os.getenv("FAKE_LDBWS_RECORDINGS")
+        self.token = os.getenv("FAKE_LDBWS_TOKEN")
+        self.seed = int(os.getenv("FAKE_LDBWS_SEED", "0"))
+
+
+def _location(code: str, name: str):
+    return LT4.location(LT4.locationName(name), LT4.crs(code))
+
+
+def _service(departure, origin: str, with_details: bool):
+    fields = [LT4.std(departure.std), LT4.etd(departure.etd)]
+    if departure.platform:
+        fields.append(LT4.platform(departure.platform))
+    fields += [LT4.operator(departure.operator), LT4.serviceType("train")]
+    if departure.is_cancelled:
+        fields.append(LT4.isCancelled("true"))
+    if departure.length:
+        fields.append(LT4.length(str(departure.length)))
+    if departure.delay_reason:
+        fields.append(LT4.delayReason(departure.delay_reason))
+    if departure.cancel_reason:
+        fields.append(LT4.cancelReason(departure.cancel_reason))
+    fields += [
+        LT4.serviceID(f"{origin}{departure.std.replace(':', '')}{departure.destination}"),
+        LT5.origin(_location(origin, origin)),
+        LT5.destination(_location(departure.destination, departure.destination_name)),
+    ]
+    if with_details:
+        fields.append(LT8.subsequentCallingPoints(LT8.callingPointList(
+            *[
+                LT8.callingPoint(LT8.locationName(p.name), LT8.crs(p.crs), LT8.st(p.st), LT8.et("On time"))
+                for p in departure.calling_points
+            ],
+            serviceType="train"
+        )))
+    return LT8.service(*fields)
+
+
+def build_board_response(operation: str, crs: str, departures, now: datetime) -> bytes:
+    """Render departures as an LDBWS board response envelope."""
+    with_details = operation == "GetDepBoardWithDetails"
+    result = etree.Element(f"{{{LDB_NS}}}GetStationBoardResult", nsmap=RESULT_NSMAP)
+    result.extend([
+        LT4.generatedAt(now.isoformat()),
+        LT4.locationName(crs),
+        LT4.crs(crs),
+        LT4.platformAvailable("true"),
+    ])
+    if departures:
+        result.append(LT8.trainServices(
+            *[_service(d, crs, with_details) for d in departures]
+        ))
+    envelope = SOAP.Envelope(SOAP.Body(
+        LDB(f"{operation}Response", result)
+    ))
+    return etree.tostring(envelope, xml_declaration=True, encoding="utf-8")
+
+
+def build_fault(message: str, code: str = "soap:Server") -> bytes:
+    envelope = SOAP.Envelope(SOAP.Body(SOAP.Fault(
+        etree.Element("faultcode"), etree.Element("faultstring")
+    )))
+    fault = envelope[0][0]
+    fault[0].text = code
+    fault[1].text = message
+    return etree.tostring(envelope, xml_declaration=True, encoding="utf-8")
+
+
+def _soap_response(content: bytes, status_code: int = 200) -> Response:
+    return Response(content=content, status_code=status_code, media_type="text/xml; charset=utf-8")
+
+
+def _param(request_element, name: str) -> Optional[str]:
+    for child in request_element:
+        if etree.QName(child).localname == name:
+            return child.text
+    return None
+
+
+def create_app(settings: Optional[FakeSettings] = None) -> FastAPI:
+    """Create the fake LDBWS application."""
+    settings = settings or FakeSettings()
+    timetable = SyntheticTimetable(seed=settings.seed)
+    rng = random.Random(settings.seed)
+    application = FastAPI(title="fake-ldbws", docs_url=None, openapi_url=None)
+    application.state.settings = settings
+    application.state.timetable = timetable
+    application.state.calls = {}
+
+    @application.get("/OpenLDBWS/wsdl.aspx")
+    async def wsdl(request: Request):
+        address = str(request.base_url).rstrip("/") + SOAP_PATH
+        content = WSDL_PATH.read_text().replace(
+            "http://localhost:8081/OpenLDBWS/ldb12.asmx", address
+        )
+        return Response(content=content, media_type="text/xml; charset=utf-8")
+
+    @application.post(SOAP_PATH)
+    async def soap(request: Request):
+        try:
+            envelope = etree.fromstring(await request.body())
+        except etree.XMLSyntaxError:
+            return _soap_response(build_fault("Malformed request", "soap:Client"), 500)
+
+        body = next(e for e in envelope if etree.QName(e).localname == "Body")
+        request_element = body[0]
+        operation = OPERATIONS.get(etree.QName(request_element).localname)
+        if operation is None:
+            return _soap_response(build_fault("Unsupported operation", "soap:Client"), 500)
+
+        if settings.token and settings.token.encode() not in etree.tostring(envelope):
+            return _soap_response(build_fault("Unauthorized", "soap:Client"), 401)
+
+        crs = (_param(request_element, "crs") or "").upper()
+        application.state.calls[operation] = application.state.calls.get(operation, 0) + 1
+
+        delay_ms = settings.latency_ms + rng.uniform(-1, 1) * settings.jitter_ms
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+        if settings.error_rate and rng.random() < settings.error_rate:
+            log.info("fake_ldbws.error.injected", operation=operation, crs=crs)
+            return _soap_response(build_fault("Injected failure"), 500)
+
+        if settings.recordings:
+            recorded = Path(settings.recordings) / f"{operation}_{crs}.xml"
+            if recorded.exists():
+                return _soap_response(recorded.read_bytes())
+
+        now = datetime.now(london_tz)
+        departures = timetable.departures(
+            crs,
+            now_minutes=now.hour * 60 + now.minute,
+            time_offset=int(_param(request_element, "timeOffset") or 0),
+            time_window=int(_param(request_element, "timeWindow") or 120),
+            num_rows=int(_param(request_element, "numRows") or 10),
+            filter_crs=_param(request_element, "filterCrs"),
+        )
+        return _soap_response(build_board_response(operation, crs, departures, now))
+
+    return application
+
+
+app = create_app()
@@ -0,0 +1,137 @@
+# app/fake_ldbws/timetable.py
+import random
+from typing import Dict, List, NamedTuple, Optional
+
+# Stations the synthetic network draws routes from: (crs, name)
+STATIONS = [
+    ("KGX", "London Kings Cross"), ("STP", "London St Pancras Intl"),
+    ("EUS", "London Euston"), ("PAD", "London Paddington"),
+    ("LST", "London Liverpool Street"), ("WAT", "London Waterloo"),
+    ("VIC", "London Victoria"), ("CHX", "London Charing Cross"),
+    ("FPK", "Finsbury Park"), ("SVG", "Stevenage"), ("HIT", "Hitchin"),
+    ("CBG", "Cambridge"), ("PBO", "Peterborough"), ("YRK", "York"),
+    ("NCL", "Newcastle"), ("EDB", "Edinburgh"), ("LDS", "Leeds"),
+    ("DON", "Doncaster"), ("SHF", "Sheffield"), ("LEI", "Leicester"),
+    ("NOT", "Nottingham"), ("BHM", "Birmingham New Street"),
+    ("MAN", "Manchester Piccadilly"), ("LIV", "Liverpool Lime Street"),
+    ("WAR", "Warrington Bank Quay"), ("CRE", "Crewe"), ("MKC", "Milton Keynes Central"),
+    ("RDG", "Reading"), ("SWI", "Swindon"), ("BRI", "Bristol Temple Meads"),
+    ("OXF", "Oxford"), ("BTN", "Brighton"), ("GTW", "Gatwick Airport"),
+    ("CLJ", "Clapham Junction"), ("SRA", "Stratford"), ("CHM", "Chelmsford"),
+    ("COL", "Colchester"), ("IPS", "Ipswich"), ("NRW", "Norwich"),
+]
+STATION_NAMES = dict(STATIONS)
+
+OPERATORS = ["Great Northern", "Thameslink", "London North Eastern Railway",
+             "East Midlands Railway", "Avanti West Coast", "Great Western Railway",
+             "Greater Anglia", "South Western Railway", "Southern", "Northern"]
+HEADWAYS = [10, 15, 20, 30, 60]
+
+
+class CallingPoint(NamedTuple):
+    crs: str
+    name: str
+    st: str
+
+
+class Departure(NamedTuple):
+    std: str
+    etd: str
+    platform: Optional[str]
+    operator: str
+    destination: str
+    destination_name: str
+    is_cancelled: bool
+    length: Optional[int]
+    delay_reason: Optional[str]
+    cancel_reason: Optional[str]
+    calling_points: List[CallingPoint]
+
+
+def _hhmm(minutes: int) -> str:
+    minutes %= 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class SyntheticTimetable:
+    """Deterministic repeating timetable for any station code.
+
+    Each origin gets a handful of routes with a fixed headway, calling
+    pattern and run times, all derived from (seed, crs). The same seed
+    always produces the same boards.
+    """
+
+    def __init__(self, seed: int = 0, delay_rate: float = 0.1, cancel_rate: float = 0.02):
+        self.seed = seed
+        self.delay_rate = delay_rate
+        self.cancel_rate = cancel_rate
+        self._routes: Dict[str, List[dict]] = {}
+
+    def routes(self, crs: str) -> List[dict]:
+        if crs not in self._routes:
+            rng = random.Random(f"{self.seed}:{crs}")
+            pool = [code for code, _ in STATIONS if code != crs]
+            routes = []
+            for _ in range(rng.randint(4, 8)):
+                stops = rng.sample(pool, rng.randint(2, 8))
+                routes.append({
+                    'stops': stops,
+                    'run_minutes': [rng.randint(3, 25) for _ in stops],
+                    'headway': rng.choice(HEADWAYS),
+                    'phase': rng.randrange(60),
+                    'operator': rng.choice(OPERATORS),
+                    'platform': str(rng.randint(1, 12)),
+                    'length': rng.choice([None, 4, 5, 8, 9, 12]),
+                })
+            self._routes[crs] = routes
+        return self._routes[crs]
+
+    def departures(
+            self,
+            crs: str,
+            now_minutes: int,
+            time_offset: int = 0,
+            time_window: int = 120,
+            num_rows: int = 10,
+            filter_crs: Optional[str] = None
+    ) -> List[Departure]:
+        """Departures from crs in [now + offset, now + offset + window], earliest first."""
+        start = now_minutes + time_offset
+        end = start + time_window
+        found = []
+        for index, route in enumerate(self.routes(crs)):
+            if filter_crs and filter_crs not in route['stops']:
+                continue
+            headway = route['headway']
+            first = start + (route['phase'] - start) % headway
+            for minute in range(first, end + 1, headway):
+                found.append((minute, index, route))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [self._departure(crs, minute, route) for minute, _, route in found[:num_rows]]
+
+    def _departure(self, crs: str, minute: int, route: dict) -> Departure:
+        rng = random.Random(f"{self.seed}:{crs}:{route['stops'][-1]}:{minute % 1440}")
+        is_cancelled = rng.random() < self.cancel_rate
+        delay = rng.randint(2, 15) if not is_cancelled and rng.random() < self.delay_rate else 0
+
+        calling_points = []
+        at = minute
+        for stop, run in zip(route['stops'], route['run_minutes']):
+            at += run
+            calling_points.append(CallingPoint(stop, STATION_NAMES[stop], _hhmm(at)))
+
+        destination = route['stops'][-1]
+        return Departure(
+            std=_hhmm(minute),
+            etd="Cancelled" if is_cancelled else (_hhmm(minute + delay) if delay else "On time"),
+            platform=None if is_cancelled else route['platform'],
+            operator=route['operator'],
+            destination=destination,
+            destination_name=STATION_NAMES[destination],
+            is_cancelled=is_cancelled,
+            length=route['length'],
+            delay_reason="This train has been delayed by a signalling problem" if delay else None,
+            cancel_reason="This train has been cancelled because of a shortage of train crew" if is_cancelled else None,
+            calling_points=calling_points,
+        )
@@ -1,6 +1,8 @@
 import os
 from fastapi import FastAPI
 from app.simple_queue import AsyncTaskManager
+from app.pg_queue import LeaderLock, PostgresTaskManager
+from app.scheduler import FavouritePrefetcher, JourneyGraphRefresher, KnownServiceCompactor
 from app.core.state import app_state
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api_v1.routers.users import users_router
@@ -9,7 +11,9 @@ from app.api.api_v1.routers.train import train_router
 from app.api.api_v1.routers.profile import profile_router
 from app.core import config
 import structlog
-from app.core.logging import setup_logging, LoggingRoute
+from app.core.logging import setup_logging
+from app.services.ldbws_client import init_soap_client, close_soap_client
+from app.simple_queue import run_in_thread
 
 setup_logging()
 log = structlog.get_logger("app.main")
@@ -62,8 +66,23 @@ async def startup_event():
     """Initialize application services on startup."""
     log.info("app.startup.begin")
     try:
-        app_state.task_manager = AsyncTaskManager()
+        if config.TASK_BACKEND == "postgres":
+            app_state.task_manager = PostgresTaskManager()
+            # Every worker process starts the background jobs, but only one runs them
+            app_state.leader = LeaderLock()
+        else:
+            app_state.task_manager = AsyncTaskManager()
         await app_state.task_manager.start()
+        # Download and parse the WSDL before the first user request needs it
+        await run_in_thread(init_soap_client)
+        if config.PREFETCH_ENABLED:
+            app_state.prefetcher = FavouritePrefetcher(leader=app_state.leader)
+            await app_state.prefetcher.start()
+        if config.KNOWN_SERVICE_COMPACT_ENABLED:
+            app_state.compactor = KnownServiceCompactor(leader=app_state.leader)
+            await app_state.compactor.start()
+        app_state.journey_graph = JourneyGraphRefresher()
+        await app_state.journey_graph.start()
         log.info("app.startup.completed")
     except Exception as e:
         log.error(
@@ -79,8 +98,17 @@ async def shutdown_event():
     """Cleanup application services on shutdown."""
     log.info("app.shutdown.begin")
     try:
+        if app_state.prefetcher:
+            await app_state.prefetcher.stop()
+        if app_state.compactor:
+            await app_state.compactor.stop()
+        if app_state.journey_graph:
+            await app_state.journey_graph.stop()
         if app_state.task_manager:
             await app_state.task_manager.stop()
+        if app_state.leader:
+            await run_in_thread(app_state.leader.release)
+        await close_soap_client()
         log.info("app.shutdown.completed")
     except Exception as e:
         log.error(
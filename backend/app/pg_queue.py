@@ -0,0 +1,372 @@
+# app/pg_queue.py
+"""Task manager backed by Postgres, so several processes and hosts share one queue.
+
+Tasks and their results live in the task_queue table. Workers claim rows with
+SELECT ... FOR UPDATE SKIP LOCKED. LISTEN/NOTIFY wakes idle workers when work
+is queued, and wakes get_result waiters when a task finishes. Handles are
+HMAC-signed rather than stored, so any process can resolve them. If the
+listening connection drops, workers and waiters poll until it reconnects.
+
+LeaderLock elects one process, via an advisory lock, for jobs that must not
+run in every worker, such as prefetching and compaction.
+"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+import zlib
+from time import time
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+import structlog
+from sqlalchemy.engine import make_url
+
+from app import simple_queue
+from app.core import config
+from app.core.security import SECRET_KEY
+from app.db.crud.task_crud import (
+    TASK_DONE_CHANNEL,
+    TASK_QUEUED_CHANNEL,
+    FINISHED_STATUSES,
+    claim_task,
+    count_tasks,
+    enqueue_task,
+    expire_tasks,
+    finish_task,
+    get_task_record,
+    requeue_stale_tasks,
+)
+from app.db.session import SessionLocal
+from app.simple_queue import AsyncTaskManager, run_in_thread, task_name, task_registry
+
+log = structlog.get_logger("async.pg_queue")
+
+
+def _libpq_dsn(dsn: Optional[str] = None) -> str:
+    """libpq wants a plain postgresql:// URL, without any SQLAlchemy driver suffix."""
+    url = make_url(dsn or config.SQLALCHEMY_DATABASE_URI).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class PostgresTaskManager(AsyncTaskManager):
+    def __init__(self, concurrency: int = None, session_factory=SessionLocal, dsn: str = None):
+        super().__init__(concurrency)
+        self.results = None
+        self.session_factory = session_factory
+        self.dsn = _libpq_dsn(dsn)
+        self._listener = None
+        self._listener_fd = None
+        self._reconnect_task = None
+        self._maintenance_task = None
+        self._wakeup = asyncio.Event()
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._counts: Dict[str, int] = {}
+        self.log = log.bind(component="task_manager", backend="postgres")
+
+    def _db_call(self, crud: Callable, *args):
+        db = self.session_factory()
+        try:
+            return crud(db, *args)
+        finally:
+            db.close()
+
+    async def start(self):
+        """Listen for queue notifications, then start workers and maintenance."""
+        if self._workers:
+            return
+        await self._listen()
+
+        simple_queue.task_backend = self
+        await super().start()
+        self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def stop(self):
+        """Stop workers and maintenance and close the listening connection."""
+        if simple_queue.task_backend is self:
+            simple_queue.task_backend = None
+        for task in (self._maintenance_task, self._reconnect_task):
+            if task:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._maintenance_task = self._reconnect_task = None
+        await super().stop()
+        self._drop_listener()
+
+    def _connect_listener(self):
+        listener = psycopg2.connect(self.dsn)
+        try:
+            listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute(f"LISTEN {TASK_QUEUED_CHANNEL}; LISTEN {TASK_DONE_CHANNEL};")
+        except Exception:
+            listener.close()
+            raise
+        return listener
+
+    async def _listen(self):
+        listener = await run_in_thread(self._connect_listener)
+        try:
+            asyncio.get_running_loop().add_reader(listener.fileno(), self._on_notify)
+        except Exception:
+            listener.close()
+            raise
+        self._listener, self._listener_fd = listener, listener.fileno()
+
+    def _drop_listener(self):
+        listener, self._listener = self._listener, None
+        if listener is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._listener_fd)
+        listener.close()
+
+    def _wake_waiters(self):
+        """Resolve every waiter so it re-reads its task, e.g. after missed NOTIFYs."""
+        waiters, self._waiters = self._waiters, {}
+        for waiter in waiters.values():
+            if not waiter.done():
+                waiter.set_result(None)
+        self._wakeup.set()
+
+    def _on_notify(self):
+        try:
+            self._listener.poll()
+        except psycopg2.Error as e:
+            self.log.warning(
+                "task_manager.listener.lost",
+                error=str(e),
+                error_type=type(e).__name__
+            )
+            self._drop_listener()
+            # Waiters fall back to polling until the listener is back
+            self._wake_waiters()
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+            return
+        while self._listener.notifies:
+            notify = self._listener.notifies.pop(0)
+            if notify.channel == TASK_QUEUED_CHANNEL:
+                self._wakeup.set()
+            elif notify.channel == TASK_DONE_CHANNEL:
+                waiter = self._waiters.pop(notify.payload, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+
+    async def _reconnect(self):
+        """Re-establish the listening connection with exponential backoff."""
+        delay = min(1.0, config.TASK_LISTEN_RETRY_MAX)
+        while self._listener is None:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Any failure, not just a refused connection, is retried
+                delay = min(delay * 2, config.TASK_LISTEN_RETRY_MAX)
+                self.log.warning(
+                    "task_manager.listener.reconnect.failed",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    retry_in=delay
+                )
+        self.log.info("task_manager.listener.reconnected")
+        # Anything queued or finished while disconnected sent no NOTIFY we saw
+        self._wake_waiters()
+
+    async def enqueue(self, task_id: str, func: Callable, args, kwargs, owner: Any = None) -> bool:
+        """Insert the task row; False if an identical task is already queued or running."""
+        payload = {"args": list(args), "kwargs": kwargs}
+        return await run_in_thread(
+            self._db_call, enqueue_task, task_id, task_name(func), payload, config.TASK_QUEUE_MAX,
+            None if owner is None else str(owner), config.TASK_MAX_QUEUED_PER_USER
+        )
+
+    async def _worker(self, worker_id: int = 0):
+        """Claim and run tasks from the shared queue until cancelled."""
+        worker_log = self.log.bind(worker=worker_id)
+        while True:
+            try:
+                row = await run_in_thread(self._db_call, claim_task)
+                if row is None:
+                    # Clear before re-checking so a NOTIFY in between is not lost
+                    self._wakeup.clear()
+                    row = await run_in_thread(self._db_call, claim_task)
+                if row is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), config.TASK_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                func = task_registry.get(row.function)
+                if func is None:
+                    worker_log.error("task_manager.task.unregistered", task_id=row.id, function=row.function)
+                    await self._complete(row.id, {
+                        'status': 'failed',
+                        'result': {'status_code': 500, 'detail': f"Unknown task {row.function}"}
+                    })
+                    continue
+
+                await self._run(
+                    row.id, func, row.payload["args"], row.payload["kwargs"], time() - float(row.queue_wait)
+                )
+
+            except asyncio.CancelledError:
+                worker_log.info("task_manager.worker.cancelled")
+                break
+
+            except Exception as e:
+                worker_log.error(
+                    "task_manager.worker.error",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                await asyncio.sleep(1)  # Prevent tight loop on repeated errors
+
+    async def _complete(self, task_id: str, record: Dict[str, Any]):
+        await run_in_thread(self._db_call, finish_task, task_id, record)
+
+    async def _load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return await run_in_thread(self._db_call, get_task_record, task_id)
+
+    async def get_result(self, task_id: str, timeout: float = None) -> Dict[str, Any]:
+        """Get a task's result from the shared table, waiting up to timeout seconds.
+
+        Raises KeyError for unknown tasks and TimeoutError if still running.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            waiter = self._waiters.get(task_id)
+            if waiter is None or waiter.done():
+                waiter = self._waiters[task_id] = loop.create_future()
+            # Loaded after registering the waiter, so a NOTIFY in between is not lost
+            record = await self._load(task_id)
+            if record is None:
+                self._waiters.pop(task_id, None)
+                raise KeyError(task_id)
+            if record['status'] in FINISHED_STATUSES + ("expired",):
+                return record
+
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("Task result not available within timeout")
+            # Nothing resolves the waiter while the listener is down, so poll
+            if self._listener is None:
+                remaining = min(remaining or config.TASK_POLL_INTERVAL, config.TASK_POLL_INTERVAL)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def issue_handle(self, task_id: str, user_id: int) -> str:
+        """Per-user handle carrying the task id and a signature over it."""
+        nonce = secrets.token_urlsafe(8)
+        return f"{nonce}.{task_id}.{self._sign(nonce, task_id, user_id)}"
+
+    def resolve_handle(self, handle: str, user_id: int) -> str:
+        try:
+            nonce, task_id, signature = handle.split(".")
+        except ValueError:
+            raise KeyError(handle)
+        if not hmac.compare_digest(signature, self._sign(nonce, task_id, user_id)):
+            raise KeyError(handle)
+        return task_id
+
+    @staticmethod
+    def _sign(nonce: str, task_id: str, user_id: int) -> str:
+        message = f"{nonce}.{task_id}.{user_id}".encode()
+        return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+    async def _maintain(self):
+        """Expire old results, requeue tasks abandoned by dead workers and refresh counts."""
+        while True:
+            try:
+                expired = await run_in_thread(
+                    self._db_call, expire_tasks, config.TASK_RESULT_TTL, config.TASK_HANDLE_TTL
+                )
+                requeued = await run_in_thread(
+                    self._db_call, requeue_stale_tasks, config.TASK_STALE_RUNNING
+                )
+                self._counts = await run_in_thread(self._db_call, count_tasks)
+                self._waiters = {k: w for k, w in self._waiters.items() if not w.done()}
+                if requeued or any(expired.values()):
+                    self.log.info("task_manager.maintenance.completed", requeued=requeued, **expired)
+                await asyncio.sleep(config.TASK_MAINTENANCE_INTERVAL)
+
+            except asyncio.CancelledError:
+                break
+
+            except Exception as e:
+                self.log.error(
+                    "task_manager.maintenance.error",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                await asyncio.sleep(config.TASK_MAINTENANCE_INTERVAL)
+
+    def result_stats(self) -> Dict[str, Any]:
+        return {"backend": "postgres", "by_status": self._counts}
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["queued"] = self._counts.get("queued", 0)
+        del stats["admission"]
+        return stats
+
+
+class LeaderLock:
+    """Session-level advisory lock that elects one process for singleton jobs.
+
+    The lock is held for as long as its connection lives, so a leader that
+    dies hands over to whichever process asks next.
+    """
+
+    def __init__(self, name: str = "app.background_jobs", dsn: str = None):
+        self.key = zlib.crc32(name.encode())
+        self.dsn = _libpq_dsn(dsn)
+        self._connection = None
+        self._held = False
+        self._lock = threading.Lock()
+        self.log = log.bind(component="leader_lock", key=self.key)
+
+    def held(self) -> bool:
+        """True while this process is leader, taking the lock if it is free."""
+        with self._lock:
+            try:
+                if self._connection is None:
+                    self._connection = psycopg2.connect(self.dsn)
+                    self._connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with self._connection.cursor() as cursor:
+                    if self._held:
+                        # A live session still holds its lock
+                        cursor.execute("SELECT 1")
+                    else:
+                        cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                        self._held = cursor.fetchone()[0]
+                        if self._held:
+                            self.log.info("leader_lock.acquired")
+                return self._held
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self.log.warning(
+                    "leader_lock.lost",
+                    error=str(e),
+                    error_type=type(e).__name__
+                )
+                self._close()
+                return False
+
+    def release(self):
+        """Give up leadership by closing the lock's session."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._held = False
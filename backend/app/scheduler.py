@@ -0,0 +1,244 @@
+# app/scheduler.py
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+import pytz
+import structlog
+from time import time
+from app.core import config
+from app.db.crud.profile_crud import get_favourite_origins
+from app.db.crud.train_crud import delete_stale_services, vacuum_known_services
+from app.db.session import SessionLocal
+from app.services.journey_planner import journey_planner, load_timetable
+from app.services.train_service import create_train_service, known_service_cache
+from app.simple_queue import run_in_thread
+
+# Create module logger
+log = structlog.get_logger("async.scheduler")
+
+london_tz = pytz.timezone('Europe/London')
+
+# Weekday commuter peaks as (start hour, end hour)
+PEAK_HOURS = ((6, 10), (16, 19))
+NIGHT_HOURS = (0, 5)
+
+
+async def is_leader(leader) -> bool:
+    """With no leader lock every process runs the job; otherwise only the holder."""
+    return leader is None or await run_in_thread(leader.held)
+
+
+def prefetch_interval(now: datetime) -> int:
+    """Seconds to wait before the next prefetch, based on London time of day."""
+    hour = now.hour
+    if NIGHT_HOURS[0] <= hour < NIGHT_HOURS[1]:
+        return config.PREFETCH_NIGHT_INTERVAL
+    if now.weekday() < 5 and any(start <= hour < end for start, end in PEAK_HOURS):
+        return config.PREFETCH_PEAK_INTERVAL
+    return config.PREFETCH_OFFPEAK_INTERVAL
+
+
+class FavouritePrefetcher:
+    """Keep boards and KnownService details warm for favourite-profile origins."""
+
+    def __init__(self, leader=None):
+        self._worker_task: Optional[asyncio.Task] = None
+        # Shared by processes on one database so only one of them runs cycles
+        self.leader = leader
+        self.log = log.bind(component="prefetcher")
+
+    async def start(self):
+        """Start the prefetch loop."""
+        if self._worker_task is None:
+            self._worker_task = asyncio.create_task(self._worker())
+            self.log.info("prefetcher.worker.started")
+
+    async def stop(self):
+        """Stop the prefetch loop."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+            self.log.info("prefetcher.worker.stopped")
+
+    async def _worker(self):
+        """Refresh favourite origins on a rolling, time-of-day interval."""
+        while True:
+            try:
+                if await is_leader(self.leader):
+                    await self.run_once()
+                await asyncio.sleep(prefetch_interval(datetime.now(london_tz)))
+
+            except asyncio.CancelledError:
+                self.log.info("prefetcher.worker.cancelled")
+                break
+
+            except Exception as e:
+                self.log.error(
+                    "prefetcher.worker.error",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                await asyncio.sleep(config.PREFETCH_OFFPEAK_INTERVAL)
+
+    async def run_once(self) -> List[str]:
+        """Prefetch every distinct favourite origin once."""
+        start_time = time()
+        db = SessionLocal()
+        try:
+            origins = await run_in_thread(get_favourite_origins, db)
+            origins = origins[:config.PREFETCH_MAX_ORIGINS]
+            if not origins:
+                return origins
+
+            train_service = await create_train_service(db)
+            upstream_calls = await train_service.prefetch_origins(origins)
+
+            self.log.info(
+                "prefetcher.cycle.completed",
+                origins_count=len(origins),
+                upstream_calls=upstream_calls,
+                duration=round(time() - start_time, 3)
+            )
+            return origins
+        finally:
+            db.close()
+
+
+class KnownServiceCompactor:
+    """Delete known services that have not appeared on a board for a while."""
+
+    def __init__(self, leader=None):
+        self._worker_task: Optional[asyncio.Task] = None
+        # Shared by processes on one database so only one of them runs cycles
+        self.leader = leader
+        self.log = log.bind(component="compactor")
+
+    async def start(self):
+        """Start the compaction loop."""
+        if self._worker_task is None:
+            self._worker_task = asyncio.create_task(self._worker())
+            self.log.info("compactor.worker.started")
+
+    async def stop(self):
+        """Stop the compaction loop."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+            self.log.info("compactor.worker.stopped")
+
+    async def _worker(self):
+        """Compact on a fixed interval."""
+        while True:
+            try:
+                if await is_leader(self.leader):
+                    await self.run_once()
+                await asyncio.sleep(config.KNOWN_SERVICE_COMPACT_INTERVAL)
+
+            except asyncio.CancelledError:
+                self.log.info("compactor.worker.cancelled")
+                break
+
+            except Exception as e:
+                self.log.error(
+                    "compactor.worker.error",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                await asyncio.sleep(config.KNOWN_SERVICE_COMPACT_INTERVAL)
+
+    async def run_once(self) -> int:
+        """Delete stale services and vacuum if anything was removed."""
+        start_time = time()
+        # last_seen_at is stored as naive London time
+        cutoff = datetime.now(london_tz).replace(tzinfo=None) - timedelta(
+            days=config.KNOWN_SERVICE_RETENTION_DAYS
+        )
+        db = SessionLocal()
+        try:
+            deleted = await run_in_thread(
+                delete_stale_services, db, cutoff, config.KNOWN_SERVICE_COMPACT_BATCH
+            )
+            if deleted:
+                known_service_cache.clear()
+                journey_planner.invalidate()
+                await run_in_thread(vacuum_known_services, db)
+
+            self.log.info(
+                "compactor.cycle.completed",
+                deleted=deleted,
+                cutoff=cutoff.isoformat(),
+                duration=round(time() - start_time, 3)
+            )
+            return deleted
+        finally:
+            db.close()
+
+
+class JourneyGraphRefresher:
+    """Rebuild the journey graph in the background once it expires.
+
+    The graph is held per process, so every process runs this, leader or not.
+    """
+
+    def __init__(self):
+        self._worker_task: Optional[asyncio.Task] = None
+        self.log = log.bind(component="journey_graph")
+
+    async def start(self):
+        """Start the refresh loop."""
+        if self._worker_task is None:
+            self._worker_task = asyncio.create_task(self._worker())
+            self.log.info("journey_graph.worker.started")
+
+    async def stop(self):
+        """Stop the refresh loop."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+            self.log.info("journey_graph.worker.stopped")
+
+    async def _worker(self):
+        """Check for an expired graph on a fixed interval."""
+        while True:
+            try:
+                await self.run_once()
+                await asyncio.sleep(config.JOURNEY_GRAPH_REFRESH_INTERVAL)
+
+            except asyncio.CancelledError:
+                self.log.info("journey_graph.worker.cancelled")
+                break
+
+            except Exception as e:
+                self.log.error(
+                    "journey_graph.worker.error",
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    exc_info=True
+                )
+                await asyncio.sleep(config.JOURNEY_GRAPH_REFRESH_INTERVAL)
+
+    async def run_once(self) -> bool:
+        """Rebuild the graph if it is missing, expired or invalidated."""
+        if not journey_planner.stale():
+            return False
+        db = SessionLocal()
+        try:
+            # Requests keep planning on the old graph until this swaps it out
+            await run_in_thread(journey_planner.refresh, lambda: load_timetable(db))
+            return True
+        finally:
+            db.close()
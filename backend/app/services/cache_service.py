@@ -1,18 +1,73 @@
 from cachetools import TTLCache
+from typing import Any, Dict, Hashable, Optional, Tuple
 import threading
-import json
+import time
+
 
 class CacheService:
-    def __init__(self, ttl_seconds=120):  # 2 minutes TTL as per your Redis setup
-        self.cache = TTLCache(maxsize=1000, ttl=ttl_seconds)
+    """Thread-safe TTL cache of parsed objects with an optional stale period.
+
+    Entries are fresh for ttl_seconds, then stale for stale_seconds more,
+    after which they are evicted. Stale entries are still returned by
+    get_entry so callers can serve them while refreshing in the background.
+    """
+
+    def __init__(self, ttl_seconds=120, stale_seconds=0, maxsize=1000, timer=time.monotonic):
+        self.ttl = ttl_seconds
+        self.stale_ttl = stale_seconds
+        self._timer = timer
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl_seconds + stale_seconds, timer=timer)
         self._lock = threading.Lock()
-    
-    def get(self, key):
-        value = self.cache.get(key)
-        if value:
-            return json.loads(value)
-        return None
-    
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def get_entry(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """Return (value, is_stale); value is None on a miss."""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+
+            value, stored_at = entry
+            is_stale = self._timer() - stored_at >= self.ttl
+            if is_stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, is_stale
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value only while it is fresh."""
+        value, is_stale = self.get_entry(key)
+        return None if is_stale else value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh value without touching the hit/miss counters."""
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None or self._timer() - entry[1] >= self.ttl:
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self.cache[key] = (value, self._timer())
+
     def setex(self, key, expiry, value):
+        # Kept for Redis-style callers; the TTL is configured per cache
+        self.set(key, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.cache.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
         with self._lock:
-            self.cache[key] = value
+            return {
+                "size": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+            }
@@ -0,0 +1,55 @@
+# app/services/detail_planner.py
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, NamedTuple
+
+# GetDepBoardWithDetails returns at most 10 services over at most 120 minutes
+MAX_DETAIL_ROWS = 10
+MAX_DETAIL_WINDOW = 120
+
+
+class DetailCall(NamedTuple):
+    offset: int
+    window: int
+    num_rows: int
+
+
+def plan_detail_calls(
+        board_offsets: Iterable[int],
+        wanted_offsets: Iterable[int],
+        max_rows: int = MAX_DETAIL_ROWS,
+        max_window: int = MAX_DETAIL_WINDOW
+) -> List[DetailCall]:
+    """Pick the fewest detail calls whose results cover every wanted departure.
+
+    Offsets are minutes from now. A call (offset, window, num_rows) is assumed
+    to return the first num_rows departures of the board that leave within
+    [offset, offset + window], known or not. Starting each call at the
+    earliest uncovered departure and stretching it as far as the row limit
+    allows is optimal for this kind of interval cover.
+    """
+    board = sorted(board_offsets)
+    wanted = sorted(set(wanted_offsets))
+    calls = []
+
+    i = 0
+    while i < len(wanted):
+        start = wanted[i]
+        first = bisect_left(board, start)
+        rows = board[first:first + max_rows]
+
+        # Stop short of a minute that would only partly fit into the rows
+        end = rows[-1] if rows else start
+        overflow = first + max_rows
+        if overflow < len(board) and board[overflow] == end and end > start:
+            end -= 1
+        end = min(end, start + max_window)
+
+        # Shrink the window to the last wanted departure it actually covers
+        last = bisect_right(wanted, end) - 1
+        end = wanted[last]
+        num_rows = min(max_rows, bisect_right(board, end) - first) or 1
+
+        calls.append(DetailCall(offset=start, window=end - start, num_rows=num_rows))
+        i = last + 1
+
+    return calls
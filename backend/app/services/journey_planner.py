@@ -0,0 +1,392 @@
+# app/services/journey_planner.py
+"""One-change journey planning over known services.
+
+Planning is round based in the style of RAPTOR. Round one finds trains that
+call at an origin and then at a destination. Round two boards a train at an
+origin and changes, at the same station or across London, onto a train that
+reaches a destination. Everything runs on an in-memory timetable graph built
+from known_services, so queries make no SOAP calls.
+"""
+from bisect import bisect_left
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import threading
+import time
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.core.rail_time import (
+    day_type_mask,
+    format_hhmm,
+    minute_of_day,
+    normalise_crs,
+    parse_hhmm,
+    relative_minutes,
+)
+from app.db.crud.train_crud import get_all_services
+from app.services.known_service_cache import ServiceRecord
+
+log = structlog.get_logger("service.journey")
+
+# Approximate cross-London transfer times in minutes, walking or by Underground
+LONDON_INTERCHANGES = {
+    ("KGX", "STP"): 5,
+    ("EUS", "KGX"): 12,
+    ("EUS", "STP"): 12,
+    ("KGX", "LST"): 20,
+    ("STP", "LST"): 20,
+    ("KGX", "MOG"): 15,
+    ("LST", "MOG"): 10,
+    ("LST", "FST"): 10,
+    ("CST", "LBG"): 10,
+    ("CHX", "WAT"): 10,
+    ("LBG", "WAT"): 15,
+    ("PAD", "MYB"): 15,
+    ("EUS", "MYB"): 15,
+    ("PAD", "EUS"): 20,
+    ("PAD", "KGX"): 25,
+    ("VIC", "WAT"): 20,
+    ("VIC", "CHX"): 20,
+    ("LBG", "STP"): 20,
+    ("BFR", "STP"): 15,
+    ("BFR", "LBG"): 10,
+}
+
+
+def _footpaths(pairs: Dict[Tuple[str, str], int]) -> Dict[str, List[Tuple[str, int]]]:
+    paths: Dict[str, List[Tuple[str, int]]] = {}
+    for (a, b), minutes in pairs.items():
+        paths.setdefault(a, []).append((b, minutes))
+        paths.setdefault(b, []).append((a, minutes))
+    return paths
+
+
+FOOTPATHS = _footpaths(LONDON_INTERCHANGES)
+
+
+class Trip(NamedTuple):
+    service_id: str
+    operator: Optional[str]
+    terminus: str
+    terminus_name: str
+    dep_min: int
+    days_seen: int
+    stops: Tuple[str, ...]  # origin first, in calling order
+    offsets: Tuple[int, ...]  # minutes after leaving the origin
+
+
+class Leg(NamedTuple):
+    trip: int
+    board: int  # stop positions on the trip
+    alight: int
+    board_time: int  # minutes relative to the query time
+    alight_time: int
+
+
+class TimetableGraph:
+    """Trips and a station -> (trip, stop position) index, built once and shared."""
+
+    def __init__(self, records: Iterable[ServiceRecord]):
+        self.trips: List[Trip] = []
+        self.calls: Dict[str, List[Tuple[int, int]]] = {}
+        self.names: Dict[str, str] = {}
+
+        for record in records:
+            stops, offsets = [record.origin], [0]
+            for point in record.calling_points:
+                if not point.get("scheduled_time") or not point.get("crs"):
+                    continue
+                offset = (parse_hhmm(point["scheduled_time"]) - record.dep_min) % 1440
+                # Skip out-of-order times rather than invent an overnight journey
+                if offset < offsets[-1]:
+                    continue
+                stops.append(point["crs"])
+                offsets.append(offset)
+                if point.get("station_name"):
+                    self.names.setdefault(point["crs"], point["station_name"])
+            if len(stops) < 2:
+                continue
+
+            self.names.setdefault(record.destination, record.destination_name)
+            index = len(self.trips)
+            self.trips.append(Trip(
+                service_id=record.service_id,
+                operator=record.operator,
+                terminus=record.destination,
+                terminus_name=record.destination_name,
+                dep_min=record.dep_min,
+                days_seen=record.days_seen,
+                stops=tuple(stops),
+                offsets=tuple(offsets),
+            ))
+            for position, crs in enumerate(stops):
+                self.calls.setdefault(crs, []).append((index, position))
+
+    def __len__(self) -> int:
+        return len(self.trips)
+
+    def plan(
+            self,
+            origins: List[str],
+            destinations: List[str],
+            now_minute: int,
+            day_mask: Optional[int] = None,
+            horizon: int = 120,
+            min_interchange: int = 5,
+            max_wait: int = 60,
+            max_results: int = 10
+    ) -> List[List[Leg]]:
+        """Pareto-optimal journeys leaving an origin within the horizon.
+
+        A journey is kept unless another one leaves no earlier and arrives
+        strictly sooner. Each is a list of one or two legs.
+        """
+        targets = set(destinations) - set(origins)
+        rel_dep: Dict[int, int] = {}
+
+        def at(trip: int, position: int) -> int:
+            if trip not in rel_dep:
+                rel_dep[trip] = relative_minutes(self.trips[trip].dep_min, now_minute)
+            return rel_dep[trip] + self.trips[trip].offsets[position]
+
+        def runs_today(trip: int) -> bool:
+            return day_mask is None or bool(self.trips[trip].days_seen & day_mask)
+
+        # Stop positions at which each trip calls at a destination
+        target_positions: Dict[int, List[int]] = {}
+        for crs in targets:
+            for trip, position in self.calls.get(crs, ()):
+                if runs_today(trip):
+                    target_positions.setdefault(trip, []).append(position)
+        for positions in target_positions.values():
+            positions.sort()
+
+        def first_target_after(trip: int, position: int) -> Optional[int]:
+            positions = target_positions.get(trip, ())
+            index = bisect_left(positions, position + 1)
+            return positions[index] if index < len(positions) else None
+
+        # Round two boarding points: every stop before a trip's last destination call
+        boardings: Dict[str, List[Tuple[int, int, int, int]]] = {}
+        for trip, positions in target_positions.items():
+            for position in range(positions[-1]):
+                board_time = at(trip, position)
+                if board_time < 0:
+                    continue
+                alight = first_target_after(trip, position)
+                boardings.setdefault(self.trips[trip].stops[position], []).append(
+                    (board_time, at(trip, alight), trip, position)
+                )
+        for events in boardings.values():
+            events.sort()
+
+        best_by_departure: Dict[Tuple[int, int], List[Leg]] = {}
+        for origin in origins:
+            for trip, position in self.calls.get(origin, ()):
+                depart = at(trip, position)
+                if not 0 <= depart <= horizon or not runs_today(trip):
+                    continue
+
+                best: Optional[List[Leg]] = None
+                alight = first_target_after(trip, position)
+                if alight is not None:
+                    best = [Leg(trip, position, alight, depart, at(trip, alight))]
+
+                stops = self.trips[trip].stops
+                last = alight if alight is not None else len(stops) - 1
+                for change_at in range(position + 1, last + 1):
+                    arrive = at(trip, change_at)
+                    station = stops[change_at]
+                    for next_station, transfer in [(station, min_interchange)] + FOOTPATHS.get(station, []):
+                        events = boardings.get(next_station)
+                        if not events:
+                            continue
+                        earliest = arrive + transfer
+                        index = bisect_left(events, (earliest,))
+                        while index < len(events) and events[index][0] <= earliest + max_wait:
+                            board_time, arrival, next_trip, next_position = events[index]
+                            index += 1
+                            if next_trip == trip or not runs_today(next_trip):
+                                continue
+                            if best is None or arrival < best[-1].alight_time:
+                                best = [
+                                    Leg(trip, position, change_at, depart, arrive),
+                                    Leg(
+                                        next_trip,
+                                        next_position,
+                                        first_target_after(next_trip, next_position),
+                                        board_time,
+                                        arrival,
+                                    ),
+                                ]
+
+                if best is not None:
+                    key = (depart, trip)
+                    if key not in best_by_departure or \
+                            best[-1].alight_time < best_by_departure[key][-1].alight_time:
+                        best_by_departure[key] = best
+
+        # Latest departure first; keep journeys that beat every later one
+        journeys = sorted(
+            best_by_departure.values(),
+            key=lambda legs: (-legs[0].board_time, legs[-1].alight_time, len(legs))
+        )
+        kept, soonest = [], None
+        for legs in journeys:
+            if soonest is None or legs[-1].alight_time < soonest:
+                kept.append(legs)
+                soonest = legs[-1].alight_time
+        kept.sort(key=lambda legs: (legs[0].board_time, legs[-1].alight_time))
+        return kept[:max_results]
+
+    def describe(self, legs: List[Leg], now_minute: int) -> dict:
+        """Render a journey for the API."""
+        rendered = []
+        for leg in legs:
+            trip = self.trips[leg.trip]
+            board, alight = trip.stops[leg.board], trip.stops[leg.alight]
+            rendered.append({
+                "service_id": trip.service_id,
+                "operator": trip.operator,
+                "origin": board,
+                "origin_name": self.names.get(board, board),
+                "destination": alight,
+                "destination_name": self.names.get(alight, alight),
+                "terminus": trip.terminus,
+                "terminus_name": trip.terminus_name,
+                "scheduled_departure": format_hhmm(now_minute + leg.board_time),
+                "scheduled_arrival": format_hhmm(now_minute + leg.alight_time),
+            })
+
+        interchanges = [
+            {
+                "from": first["destination"],
+                "to": second["origin"],
+                "minutes": legs[i + 1].board_time - legs[i].alight_time,
+            }
+            for i, (first, second) in enumerate(zip(rendered, rendered[1:]))
+        ]
+        return {
+            "scheduled_departure": rendered[0]["scheduled_departure"],
+            "scheduled_arrival": rendered[-1]["scheduled_arrival"],
+            "duration_minutes": legs[-1].alight_time - legs[0].board_time,
+            "changes": len(legs) - 1,
+            "legs": rendered,
+            "interchanges": interchanges,
+        }
+
+
+class JourneyPlanner:
+    """Holds the timetable graph; refresh() rebuilds it once ttl_seconds pass.
+
+    Only the very first graph is built on the request path. Later rebuilds
+    run in the background and are swapped in whole, so requests keep
+    planning on the old graph until the new one is ready.
+    """
+
+    def __init__(self, ttl_seconds=600, timer=time.monotonic):
+        self.ttl = ttl_seconds
+        self._timer = timer
+        self._graph: Optional[TimetableGraph] = None
+        self._built_at = 0.0
+        self._invalidated = False
+        # Held only to swap or read the graph, never while building one
+        self._lock = threading.Lock()
+        # One build at a time
+        self._build_lock = threading.Lock()
+
+    def graph(self, load: Callable[[], Iterable[ServiceRecord]]) -> TimetableGraph:
+        with self._lock:
+            if self._graph is not None:
+                return self._graph
+        with self._build_lock:
+            # Another request may have built it while this one waited
+            with self._lock:
+                if self._graph is not None:
+                    return self._graph
+            return self._build(load)
+
+    def stale(self) -> bool:
+        with self._lock:
+            return (
+                self._graph is None
+                or self._invalidated
+                or self._timer() - self._built_at >= self.ttl
+            )
+
+    def refresh(self, load: Callable[[], Iterable[ServiceRecord]]) -> TimetableGraph:
+        """Build a new graph and swap it in."""
+        with self._build_lock:
+            return self._build(load)
+
+    def _build(self, load: Callable[[], Iterable[ServiceRecord]]) -> TimetableGraph:
+        start_time = time.time()
+        graph = TimetableGraph(load())
+        with self._lock:
+            self._graph = graph
+            self._built_at = self._timer()
+            self._invalidated = False
+        log.info(
+            "journey.graph.built",
+            trips=len(graph),
+            stations=len(graph.calls),
+            elapsed_ms=int((time.time() - start_time) * 1000)
+        )
+        return graph
+
+    def invalidate(self) -> None:
+        """Rebuild at the next refresh; the current graph is served until then."""
+        with self._lock:
+            self._invalidated = True
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._graph is None:
+                return {"built": False}
+            return {
+                "built": True,
+                "trips": len(self._graph),
+                "stations": len(self._graph.calls),
+                "age_seconds": int(self._timer() - self._built_at),
+                "invalidated": self._invalidated,
+            }
+
+
+journey_planner = JourneyPlanner(ttl_seconds=config.JOURNEY_GRAPH_TTL)
+
+
+def load_timetable(db: Session) -> List[ServiceRecord]:
+    """Every known service, as the journey graph is built from them."""
+    return [ServiceRecord.from_row(r) for r in get_all_services(db)]
+
+
+def plan_journeys(
+        db: Session,
+        origins: List[str],
+        destinations: List[str],
+        now: datetime
+) -> List[dict]:
+    """Plan direct and one-change journeys from known services."""
+    start_time = time.time()
+    graph = journey_planner.graph(lambda: load_timetable(db))
+    now_minute = minute_of_day(now)
+    journeys = graph.plan(
+        [normalise_crs(o) for o in origins],
+        [normalise_crs(d) for d in destinations],
+        now_minute,
+        day_mask=day_type_mask(now),
+        horizon=config.JOURNEY_HORIZON,
+        min_interchange=config.JOURNEY_MIN_INTERCHANGE,
+        max_wait=config.JOURNEY_MAX_WAIT,
+        max_results=config.JOURNEY_MAX_RESULTS
+    )
+    log.info(
+        "journey.plan.complete",
+        origins=origins,
+        destinations=destinations,
+        journeys_found=len(journeys),
+        elapsed_ms=int((time.time() - start_time) * 1000)
+    )
+    return [graph.describe(legs, now_minute) for legs in journeys]
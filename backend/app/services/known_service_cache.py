@@ -0,0 +1,177 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import threading
+import time
+
+from app.core.rail_time import window_ranges
+
+
+class ServiceRecord(NamedTuple):
+    """Lightweight, immutable copy of a KnownService row."""
+    service_id: str
+    origin: str
+    destination: str
+    destination_name: str
+    scheduled_departure: str
+    dep_min: int
+    operator: Optional[str]
+    days_seen: int
+    # None until loaded, for rows whose stops came from the calling point index
+    calling_points: Optional[Tuple[dict, ...]]
+    stops: FrozenSet[str]
+
+    @classmethod
+    def from_row(cls, row) -> "ServiceRecord":
+        calling_points = getattr(row, "calling_points", None)
+        if calling_points is None:
+            stops = frozenset(row.stops or ())
+        else:
+            calling_points = tuple(calling_points)
+            stops = frozenset(cp["crs"] for cp in calling_points)
+        return cls(
+            service_id=row.service_id,
+            origin=row.origin,
+            destination=row.destination,
+            destination_name=row.destination_name,
+            scheduled_departure=row.scheduled_departure,
+            dep_min=row.dep_min,
+            operator=row.operator,
+            days_seen=row.days_seen,
+            calling_points=calling_points,
+            stops=stops,
+        )
+
+    def serves(self, destinations: Iterable[str]) -> bool:
+        return not self.stops.isdisjoint(destinations)
+
+    def to_dict(self) -> dict:
+        """Same shape as KnownService.to_dict, as a fresh dict."""
+        return {
+            "service_id": self.service_id,
+            "origin": self.origin,
+            "destination": self.destination,
+            "destination_name": self.destination_name,
+            "scheduled_departure": self.scheduled_departure,
+            "subsequent_calling_points": [dict(cp) for cp in self.calling_points],
+            "operator": self.operator
+        }
+
+
+class _OriginEntry(NamedTuple):
+    dep_mins: List[int]
+    records: List[ServiceRecord]
+    loaded_at: float
+    calling_points: Dict[str, Tuple[dict, ...]]  # filled in as services match
+
+
+class KnownServiceCache:
+    """Thread-safe read-through cache of every known service per origin.
+
+    Records are kept sorted by departure minute, so a window lookup is two
+    bisects. Calling points are loaded only for services that match, by
+    with_calling_points. Writes invalidate an origin; entries also expire
+    after ttl_seconds so rows changed by other processes are picked up, and
+    the least recently used origin is dropped beyond max_origins.
+    """
+
+    def __init__(self, ttl_seconds=3600, timer=time.monotonic, max_origins=256):
+        self.ttl = ttl_seconds
+        self.max_origins = max_origins
+        self._timer = timer
+        self._origins: "OrderedDict[str, _OriginEntry]" = OrderedDict()
+        # Bumped on invalidation so a load racing a write is not stored
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.calling_point_loads = 0
+
+    def window(
+            self,
+            origin: str,
+            start_minute: int,
+            window_minutes: int,
+            load: Callable[[], Iterable[ServiceRecord]],
+            day_mask: Optional[int] = None
+    ) -> List[ServiceRecord]:
+        """Records departing in [start, start + window], loading the origin on a miss."""
+        entry = self._entry(origin, load)
+        found = []
+        for start, end in window_ranges(start_minute, window_minutes):
+            lo = bisect_left(entry.dep_mins, start)
+            hi = bisect_right(entry.dep_mins, end)
+            found.extend(entry.records[lo:hi])
+        if day_mask is not None:
+            found = [r for r in found if r.days_seen & day_mask]
+        return found
+
+    def _entry(self, origin: str, load: Callable[[], Iterable[ServiceRecord]]) -> _OriginEntry:
+        with self._lock:
+            entry = self._origins.get(origin)
+            if entry is not None and self._timer() - entry.loaded_at < self.ttl:
+                self.hits += 1
+                self._origins.move_to_end(origin)
+                return entry
+            generation = self._generations.get(origin, 0)
+
+        # Query outside the lock; concurrent loads of one origin are harmless
+        records = sorted(load(), key=lambda r: r.dep_min)
+        entry = _OriginEntry([r.dep_min for r in records], records, self._timer(), {})
+        with self._lock:
+            self.loads += 1
+            if self._generations.get(origin, 0) == generation:
+                self._origins[origin] = entry
+                self._origins.move_to_end(origin)
+                while len(self._origins) > self.max_origins:
+                    self._origins.popitem(last=False)
+        return entry
+
+    def with_calling_points(
+            self,
+            origin: str,
+            records: List[ServiceRecord],
+            load: Callable[[List[str]], Dict[str, list]]
+    ) -> List[ServiceRecord]:
+        """records with calling points filled in, loading those not cached yet."""
+        with self._lock:
+            entry = self._origins.get(origin)
+            cached = dict(entry.calling_points) if entry is not None else {}
+        missing = [
+            r.service_id for r in records
+            if r.calling_points is None and r.service_id not in cached
+        ]
+        if missing:
+            loaded = {sid: tuple(points or ()) for sid, points in load(missing).items()}
+            cached.update(loaded)
+            with self._lock:
+                self.calling_point_loads += 1
+                # A write since the window was read replaced the entry; skip storing
+                if entry is not None and self._origins.get(origin) is entry:
+                    entry.calling_points.update(loaded)
+        return [
+            r if r.calling_points is not None
+            else r._replace(calling_points=cached.get(r.service_id, ()))
+            for r in records
+        ]
+
+    def invalidate(self, origin: str) -> None:
+        with self._lock:
+            self._origins.pop(origin, None)
+            self._generations[origin] = self._generations.get(origin, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for origin in self._origins:
+                self._generations[origin] = self._generations.get(origin, 0) + 1
+            self._origins.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "origins": len(self._origins),
+                "services": sum(len(e.records) for e in self._origins.values()),
+                "hits": self.hits,
+                "loads": self.loads,
+                "calling_point_loads": self.calling_point_loads,
+            }
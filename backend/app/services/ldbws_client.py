@@ -0,0 +1,133 @@
+# app/services/ldbws_client.py
+import logging
+import os
+import threading
+from typing import Optional
+import httpx
+import structlog
+from zeep import AsyncClient, Settings, xsd
+from zeep.cache import SqliteCache
+from zeep.transports import AsyncTransport
+from zeep.plugins import HistoryPlugin
+from app.core import config
+from app.services.ldbws_parser import raise_for_fault
+from app.simple_queue import run_in_thread
+
+log = structlog.get_logger("service.ldbws")
+
+TOKEN_NAMESPACE = "http://thalesgroup.com/RTTI/2013-11-28/Token/types"
+
+_client: Optional[AsyncClient] = None
+_lock = threading.Lock()
+
+
+def _auth_header():
+    """Build the LDBWS AccessToken SOAP header."""
+    header = xsd.Element(
+        f'{{{TOKEN_NAMESPACE}}}AccessToken',
+        xsd.ComplexType([
+            xsd.Element(
+                f'{{{TOKEN_NAMESPACE}}}TokenValue',
+                xsd.String()),
+        ])
+    )
+    return header(TokenValue=os.getenv('LDB_TOKEN'))
+
+
+def build_soap_client() -> AsyncClient:
+    """Build an async zeep client with pooled connections and an on-disk WSDL cache."""
+    # Configure Zeep logging
+    zeep_logger = logging.getLogger('zeep')
+    zeep_logger.setLevel(logging.WARNING)  # Only show warnings and errors
+
+    # One pooled httpx client shared by every coroutine calling LDBWS
+    operation_client = httpx.AsyncClient(
+        timeout=10,
+        limits=httpx.Limits(
+            max_connections=config.LDBWS_POOL_SIZE,
+            max_keepalive_connections=config.LDBWS_POOL_SIZE
+        )
+    )
+
+    # WSDL and XSD documents survive restarts in a local sqlite file
+    cache = SqliteCache(
+        path=config.WSDL_CACHE_PATH,
+        timeout=config.WSDL_CACHE_TTL
+    )
+    transport = AsyncTransport(
+        client=operation_client,
+        wsdl_client=httpx.Client(timeout=10),
+        cache=cache
+    )
+
+    settings = Settings(strict=False, xml_huge_tree=True)
+
+    client = AsyncClient(
+        wsdl=os.getenv('WSDL'),
+        settings=settings,
+        transport=transport,
+        plugins=[HistoryPlugin()]
+    )
+    client.set_default_soapheaders([_auth_header()])
+    return client
+
+
+def get_soap_client() -> AsyncClient:
+    """Return the process-wide SOAP client, building it on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = build_soap_client()
+                log.info("ldbws.client.created", wsdl_cache=config.WSDL_CACHE_PATH)
+    return _client
+
+
+async def ensure_soap_client() -> AsyncClient:
+    """Return the shared SOAP client, building it in a thread if startup warmup failed."""
+    if _client is not None:
+        return _client
+    # Building fetches and parses the WSDL, which would block the event loop
+    return await run_in_thread(get_soap_client)
+
+
+def init_soap_client() -> Optional[AsyncClient]:
+    """Warm the shared SOAP client at startup; failures fall back to lazy init."""
+    try:
+        return get_soap_client()
+    except Exception as e:
+        log.warning(
+            "ldbws.client.warmup.failed",
+            error=str(e),
+            error_type=type(e).__name__
+        )
+        return None
+
+
+async def close_soap_client() -> None:
+    """Close pooled connections held by the shared SOAP client."""
+    global _client
+    if _client is not None:
+        await _client.transport.aclose()
+        _client = None
+        log.info("ldbws.client.closed")
+
+
+async def call_raw(client: AsyncClient, operation: str, **kwargs) -> bytes:
+    """Send an LDBWS operation and return the response XML without parsing it.
+
+    This reaches into zeep internals (the service proxy's _binding,
+    _binding_options and _merge_soap_headers), so the zeep==4.2.1 pin in
+    requirements.txt is load-bearing; test_call_raw_zeep_internals guards it.
+    """
+    service = client.service
+    kwargs['_soapheaders'] = service[operation]._merge_soap_headers(None)
+    envelope, headers = service._binding._create(
+        operation, (), kwargs, client=client, options=service._binding_options
+    )
+    response = await client.transport.post_xml(
+        service._binding_options['address'], envelope, headers
+    )
+    if response.status_code != 200:
+        raise_for_fault(response.content, response.status_code)
+    return response.content
@@ -0,0 +1,114 @@
+# app/services/ldbws_parser.py
+"""Parse LDBWS board responses straight from XML into the service's flat dicts.
+
+This skips building zeep's object graph, and the output matches what
+TrainService builds from zeep objects. Elements are matched by local
+name, so the parser does not depend on the RTTI schema version namespaces.
+"""
+from io import BytesIO
+from typing import Iterator, List, Optional
+from lxml import etree
+from zeep.exceptions import Fault, TransportError
+
+_FAULT_XPATH = etree.XPath("//*[local-name()='Fault']/*[local-name()='faultstring' or local-name()='Reason']")
+
+
+def _local(tag) -> str:
+    return etree.QName(tag).localname
+
+
+def _child(element, name: str):
+    for child in element:
+        if isinstance(child.tag, str) and _local(child.tag) == name:
+            return child
+    return None
+
+
+def _text(element, name: str) -> Optional[str]:
+    child = _child(element, name)
+    return child.text if child is not None else None
+
+
+def _bool(element, name: str) -> Optional[bool]:
+    value = _text(element, name)
+    return None if value is None else value.strip() in ("true", "1")
+
+
+def _int(element, name: str) -> Optional[int]:
+    value = _text(element, name)
+    return None if value is None else int(value)
+
+
+def _first_location(service, name: str):
+    locations = _child(service, name)
+    return _child(locations, "location") if locations is not None else None
+
+
+def _train_services(content: bytes) -> Iterator:
+    """Yield each trainServices/service element, freeing them as we go."""
+    for _, element in etree.iterparse(
+            BytesIO(content), events=("end",), tag="{*}service", huge_tree=True
+    ):
+        parent = element.getparent()
+        if parent is not None and _local(parent.tag) == "trainServices":
+            yield element
+            element.clear(keep_tail=True)
+
+
+def raise_for_fault(content: bytes, status_code: int) -> None:
+    """Raise the SOAP fault carried by a non-200 response."""
+    try:
+        reasons = _FAULT_XPATH(etree.fromstring(content))
+    except etree.XMLSyntaxError:
+        reasons = []
+    if reasons:
+        raise Fault("".join(reasons[0].itertext()).strip())
+    raise TransportError(
+        "Server returned HTTP status %d" % status_code,
+        status_code=status_code,
+        content=content
+    )
+
+
+def parse_departure_board(content: bytes) -> List[dict]:
+    """Parse a GetDepartureBoard response."""
+    services = []
+    for s in _train_services(content):
+        destination = _first_location(s, "destination")
+        services.append({
+            'destination': _text(destination, "crs"),
+            'destination_name': _text(destination, "locationName"),
+            'std': _text(s, "std"),
+            'etd': _text(s, "etd"),
+            'platform': _text(s, "platform"),
+            'is_cancelled': _bool(s, "isCancelled"),
+            'delay_reason': _text(s, "delayReason"),
+            'cancel_reason': _text(s, "cancelReason"),
+            'length': _int(s, "length")
+        })
+    return services
+
+
+def parse_departure_board_with_details(content: bytes) -> List[dict]:
+    """Parse a GetDepBoardWithDetails response."""
+    services = []
+    for s in _train_services(content):
+        destination = _first_location(s, "destination")
+        subsequent = _child(s, "subsequentCallingPoints")
+        point_list = _child(subsequent, "callingPointList") if subsequent is not None else None
+        services.append({
+            'destination': _text(destination, "crs"),
+            'destination_name': _text(destination, "locationName"),
+            'scheduled_departure': _text(s, "std"),
+            'operator': _text(s, "operator"),
+            'calling_points': [
+                {
+                    'crs': _text(p, "crs"),
+                    'station_name': _text(p, "locationName"),
+                    'scheduled_time': _text(p, "st")
+                }
+                for p in (point_list if point_list is not None else [])
+                if isinstance(p.tag, str) and _local(p.tag) == "callingPoint"
+            ]
+        })
+    return services
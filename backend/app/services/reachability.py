@@ -0,0 +1,87 @@
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+import threading
+import time
+
+
+class ReachabilityIndex:
+    """Thread-safe map of (origin, terminus) to every station served between them.
+
+    An origin is loaded from the database on first use and reloaded once
+    ttl_seconds have passed, so timetable changes written to known_services
+    are picked up. In between, newly stored services are added with record.
+    A terminus the index has never seen is reported as unknown, not
+    unreachable. A route whose last detail fetch is older than ttl_seconds
+    is reported as unknown once, so one departure per terminus is fetched
+    each ttl and new stopping patterns are found.
+    """
+
+    def __init__(self, ttl_seconds=21600, timer=time.monotonic):
+        self.ttl = ttl_seconds
+        self._timer = timer
+        self._stations: Dict[Tuple[str, str], Set[str]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._probed_at: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.skips = 0
+        self.probes = 0
+
+    def ensure_loaded(self, origin: str, load: Callable[[], Dict[str, Set[str]]]) -> None:
+        """Load an origin's termini with load() unless already fresh."""
+        with self._lock:
+            loaded_at = self._loaded_at.get(origin)
+            if loaded_at is not None and self._timer() - loaded_at < self.ttl:
+                return
+
+        # Query outside the lock; a concurrent duplicate load is harmless
+        termini = load()
+        with self._lock:
+            now = self._timer()
+            for key in [k for k in self._stations if k[0] == origin]:
+                del self._stations[key]
+            for terminus, stations in termini.items():
+                self._stations[(origin, terminus)] = set(stations) | {terminus}
+                # A reload must not reset the probe clock, or it never runs
+                self._probed_at.setdefault((origin, terminus), now)
+            self._loaded_at[origin] = now
+            self.loads += 1
+
+    def record(self, origin: str, terminus: str, stations: Iterable[str]) -> None:
+        """Add the stations of a newly fetched service."""
+        with self._lock:
+            self._stations.setdefault((origin, terminus), {terminus}).update(stations)
+            self._probed_at[(origin, terminus)] = self._timer()
+
+    def can_reach(self, origin: str, terminus: str, destinations: Iterable[str]) -> Optional[bool]:
+        """Whether any service to terminus serves a destination; None if unknown."""
+        with self._lock:
+            stations = self._stations.get((origin, terminus))
+            if stations is None:
+                return None
+            if not stations.isdisjoint(destinations):
+                return True
+            now = self._timer()
+            probed_at = self._probed_at.get((origin, terminus))
+            if probed_at is None or now - probed_at >= self.ttl:
+                # Claim the probe so only this caller's departure is fetched
+                self._probed_at[(origin, terminus)] = now
+                self.probes += 1
+                return None
+            self.skips += 1
+            return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stations.clear()
+            self._loaded_at.clear()
+            self._probed_at.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "origins": len(self._loaded_at),
+                "routes": len(self._stations),
+                "loads": self.loads,
+                "skips": self.skips,
+                "probes": self.probes,
+            }
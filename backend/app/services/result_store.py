@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import json
+import threading
+import time
+
+
+class ResultStore:
+    """Task result records bounded by count, approximate bytes and age.
+
+    Records are evicted oldest first once any limit is exceeded. Evicted ids
+    are remembered in a bounded tombstone set so callers can tell an expired
+    result from a task id that never existed.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=1000, max_bytes=64 * 1024 * 1024,
+                 max_tombstones=None, timer=time.monotonic):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_tombstones = max_tombstones or max_entries * 10
+        self._timer = timer
+        self._records: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (record, size, stored_at)
+        self._tombstones: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _size(record: Dict[str, Any]) -> int:
+        return len(json.dumps(record, default=str))
+
+    def set(self, task_id: str, record: Dict[str, Any]) -> None:
+        size = self._size(record)
+        with self._lock:
+            self._drop(task_id)
+            self._tombstones.pop(task_id, None)
+            self._records[task_id] = (record, size, self._timer())
+            self.bytes += size
+            self._expire()
+            while self._records and (
+                    len(self._records) > self.max_entries or self.bytes > self.max_bytes):
+                self._evict(next(iter(self._records)))
+                self.evicted += 1
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._expire()
+            entry = self._records.get(task_id)
+            return entry[0] if entry else None
+
+    def is_expired(self, task_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return task_id in self._tombstones
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._records)
+
+    def _drop(self, task_id: str) -> bool:
+        entry = self._records.pop(task_id, None)
+        if entry is None:
+            return False
+        self.bytes -= entry[1]
+        return True
+
+    def _evict(self, task_id: str) -> None:
+        self._drop(task_id)
+        self._tombstones[task_id] = None
+        while len(self._tombstones) > self.max_tombstones:
+            self._tombstones.popitem(last=False)
+
+    def _expire(self) -> None:
+        # Records are kept in insertion order, so the oldest are at the front
+        cutoff = self._timer() - self.ttl
+        while self._records:
+            task_id, (_, _, stored_at) = next(iter(self._records.items()))
+            if stored_at > cutoff:
+                break
+            self._evict(task_id)
+            self.expired += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire()
+            return {
+                "size": len(self._records),
+                "bytes": self.bytes,
+                "tombstones": len(self._tombstones),
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,39 @@
+from datetime import date
+from typing import Iterable, List, Set
+import threading
+
+
+class SeenTracker:
+    """Remember which services were already marked seen today.
+
+    Boards list the same services on every request; this keeps the
+    last_seen_at/days_seen writes to one per service per day.
+    """
+
+    def __init__(self):
+        self._day = None
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _roll(self, day: date) -> None:
+        if day != self._day:
+            self._day = day
+            self._seen = set()
+
+    def unmarked(self, day: date, service_ids: Iterable[str]) -> List[str]:
+        """Return the ids not yet marked for day, and mark them."""
+        with self._lock:
+            self._roll(day)
+            fresh = [s for s in dict.fromkeys(service_ids) if s not in self._seen]
+            self._seen.update(fresh)
+            return fresh
+
+    def mark(self, day: date, service_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._roll(day)
+            self._seen.update(service_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._day = None
+            self._seen = set()
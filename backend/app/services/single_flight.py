@@ -0,0 +1,46 @@
+# app/services/single_flight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import structlog
+
+log = structlog.get_logger("service.single_flight")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight fetch.
+
+    Every caller receives the same result object, so results must be treated
+    as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.log = log.bind(component=name)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await func(), or the already running call for key if there is one."""
+        future = self._inflight.get(key)
+        if future is None:
+            self.started += 1
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            self.log.debug("single_flight.coalesced", key=key)
+
+        # Shield so one cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
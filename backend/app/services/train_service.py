@@ -1,29 +1,102 @@
 # app/services/train_service.py
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Awaitable, Optional, Callable, Set, Tuple
+import asyncio
+import contextvars
 import time
 import pytz
-import logging
-import requests
 import structlog
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from zeep import Client, Settings, xsd, Transport
-from zeep.plugins import HistoryPlugin
+from zeep import AsyncClient
+from app.core import config
+from app.core.rail_time import (
+    day_type_mask,
+    minute_of_day,
+    normalise_crs,
+    parse_hhmm,
+    relative_minutes,
+)
 from app.db.models.train_model import KnownService
 from app.db.crud.train_crud import (
-    get_services_for_origin,
+    get_calling_points,
+    get_origin_services,
+    get_reachable_stations,
+    mark_services_seen,
     create_or_update_service,
+    bulk_upsert_services,
+)
+from app.services.cache_service import CacheService
+from app.services.detail_planner import DetailCall, plan_detail_calls
+from app.services.ldbws_client import ensure_soap_client, call_raw
+from app.services.ldbws_parser import (
+    parse_departure_board,
+    parse_departure_board_with_details,
 )
-import os
+from app.services.known_service_cache import KnownServiceCache, ServiceRecord
+from app.services.reachability import ReachabilityIndex
+from app.services.seen_tracker import SeenTracker
+from app.services.single_flight import SingleFlight
+from app.simple_queue import run_in_thread
 log = structlog.get_logger("service.train")
 
+# Re-plan detail calls for services a response missed, at most this many times
+DETAIL_PLAN_ROUNDS = 3
+
+# Identical board requests from concurrent users share one upstream call
+board_flights = SingleFlight("ldbws.board")
+
+# Parsed boards are served from memory for a short while, then revalidated
+board_cache = CacheService(
+    ttl_seconds=config.BOARD_CACHE_TTL,
+    stale_seconds=config.BOARD_CACHE_STALE_TTL,
+    maxsize=config.BOARD_CACHE_MAXSIZE
+)
+
+# Known services per origin, sorted by departure minute; writes invalidate
+known_service_cache = KnownServiceCache(
+    ttl_seconds=config.KNOWN_SERVICE_CACHE_TTL,
+    max_origins=config.KNOWN_SERVICE_CACHE_MAX_ORIGINS
+)
+
+# Known services already marked seen today
+seen_tracker = SeenTracker()
+
+# Termini whose services never call at a requested destination need no details
+reachability_index = ReachabilityIndex(ttl_seconds=config.REACHABILITY_TTL)
+
+# Background board revalidations, referenced until done so they are not collected mid-flight
+revalidation_tasks: Set[asyncio.Task] = set()
+
+# Set inside revalidation tasks so their upstream calls are not billed to a request
+_revalidating = contextvars.ContextVar("revalidating", default=False)
+
 class TrainService:
-    def __init__(self, db: Session, soap_client: Client):
+    def __init__(
+            self,
+            db: Session,
+            soap_client: AsyncClient,
+            concurrent: bool = config.TRAIN_CONCURRENT_FETCH,
+            max_concurrency: int = config.TRAIN_FETCH_CONCURRENCY,
+            parser: str = config.LDBWS_PARSER
+    ):
         self.db = db
         self.soap_client = soap_client
+        self.concurrent = concurrent
+        self.max_concurrency = max(1, max_concurrency)
+        # 'zeep' builds zeep objects; 'lxml' parses the raw XML directly
+        self.parser = parser
+        # SOAP requests actually sent by this instance, for benchmarking
+        self.upstream_calls = 0
+        # ...and those sent by background revalidations it started
+        self.revalidation_calls = 0
         self.london_tz = pytz.timezone('Europe/London')
 
+    def _count_upstream_call(self) -> None:
+        if _revalidating.get():
+            self.revalidation_calls += 1
+        else:
+            self.upstream_calls += 1
+
     @staticmethod
     def _generate_service_id(origin: str, destination: str, departure_time: str) -> str:
         return f"{origin}-{destination}-{departure_time.replace(':', '')}"
@@ -41,77 +114,110 @@ class TrainService:
             log.error("Error getting latest time", error=str(e))
             return None
 
-    def get_train_routes(self, origins: List[str], destinations: List[str], force_fetch: bool = False) -> List[dict]:
-        """Get train routes between origins and destinations."""
+    async def _map(
+            self,
+            func: Callable,
+            items: List[Any],
+            semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[Any]:
+        """Await func over items, concurrently when concurrent fetching is enabled.
+
+        A shared semaphore bounds these calls together with other maps using it.
+        """
+        if not self.concurrent or (semaphore is None and len(items) < 2):
+            return [await func(item) for item in items]
+
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(item):
+            async with semaphore:
+                return await func(item)
+
+        return list(await asyncio.gather(*(bounded(item) for item in items)))
+
+    @staticmethod
+    def _merge_realtime(service_dict: dict, departure: dict) -> dict:
+        service_dict.update({
+            'estimated_departure': departure['etd'],
+            'platform': departure['platform'],
+            'is_cancelled': departure['is_cancelled'],
+            'delay_reason': departure['delay_reason'],
+            'cancel_reason': departure['cancel_reason'],
+            'coaches': departure['length'],
+        })
+        return service_dict
+
+    @staticmethod
+    def _sort_by_departure(services: List[dict], now: datetime) -> List[dict]:
+        # Order relative to now so departures after midnight sort last
+        now_min = minute_of_day(now)
+        return sorted(
+            services,
+            key=lambda x: relative_minutes(parse_hhmm(x['scheduled_departure']), now_min)
+        )
+
+    async def get_train_routes(
+            self,
+            origins: List[str],
+            destinations: List[str],
+            force_fetch: bool = False,
+            on_progress: Optional[Callable[[List[dict]], Awaitable[None]]] = None
+    ) -> List[dict]:
+        """Get train routes between origins and destinations.
+
+        on_progress, if given, is awaited with the sorted results so far each
+        time an origin's known services or a batch of fetched details add to them.
+        """
         now = datetime.now(self.london_tz)
         start_time = time.time()
         result_services = []
+        self.upstream_calls = 0
+        origins = [normalise_crs(o) for o in origins]
+        destinations = [normalise_crs(d) for d in destinations]
 
         log.info(
             "train.routes.fetch.start",
             origins=origins,
             destinations=destinations,
-            force_fetch=force_fetch
+            force_fetch=force_fetch,
+            concurrent=self.concurrent
         )
 
-        for origin in origins:
-            origin_start = time.time()
-            # Get latest departure board always
-            departures = self._get_departure_board(origin)
-            if not departures:
-                continue
-
-            log.info(
-                "train.departures.fetched",
-                origin=origin,
-                count=len(departures),
-                elapsed_ms=int((time.time() - origin_start) * 1000)
-            )
-
-            # Get known services for this origin
-            db_start = time.time()
-            known_services = [] if force_fetch else get_services_for_origin(
-                self.db,
-                origin=origin,
-                current_time=now,
-                window_minutes=60
-            )
-            log.info(
-                "train.db.fetch",
-                origin=origin,
-                cached_services=len(known_services),
-                elapsed_ms=int((time.time() - db_start) * 1000)
+        use_cache = not force_fetch
+        # Board and detail fetches for every origin share concurrency bounds
+        board_slots = asyncio.Semaphore(self.max_concurrency)
+        detail_slots = asyncio.Semaphore(self.max_concurrency)
+        # The DB session is not thread safe, so lookups and stores stay serial
+        db_lock = asyncio.Lock()
+
+        async def add_services(services: List[dict]):
+            result_services.extend(services)
+            if on_progress and services:
+                await on_progress(self._sort_by_departure(result_services, now))
+
+        async def match_origin(origin: str):
+            # Each origin is matched and its details fetched as soon as its
+            # own boards are in, without waiting for slower origins
+            board_keys = [
+                (origin, filter_crs)
+                for filter_crs in self._board_filters(origin, destinations, use_cache)
+            ]
+            boards = await self._map(
+                lambda key: self._get_departure_board(key[0], filter_crs=key[1], use_cache=use_cache),
+                board_keys,
+                semaphore=board_slots
             )
+            origin_boards = [(key, board) for key, board in zip(board_keys, boards) if board]
+            departures = self._merge_boards([board for _, board in origin_boards])
+            if not departures:
+                return
 
-            known_service_map = {
-                self._generate_service_id(s.origin, s.destination, s.scheduled_departure): s
-                for s in known_services
-            }
-
-            services_to_fetch = []
-            for departure in departures:
-                service_id = self._generate_service_id(
-                    origin,
-                    departure['destination'],
-                    departure['std']
+            async with db_lock:
+                matched, services_to_fetch = await run_in_thread(
+                    self._match_known_services,
+                    origin, departures, destinations, now, force_fetch
                 )
-
-                if service_id in known_service_map and not force_fetch:
-                    # We have cached data for this service
-                    known_service = known_service_map[service_id]
-                    if self._service_serves_destinations(known_service, destinations):
-                        service_dict = known_service.to_dict()
-                        service_dict.update({
-                            'estimated_departure': departure['etd'],
-                            'platform': departure['platform'],
-                            'is_cancelled': departure['is_cancelled'],
-                            'delay_reason': departure['delay_reason'],
-                            'cancel_reason': departure['cancel_reason'],
-                            'coaches': departure['length'],
-                        })
-                        result_services.append(service_dict)
-                else:
-                    services_to_fetch.append(departure)
+            await add_services(matched)
 
             if services_to_fetch:
                 log.info(
@@ -120,92 +226,384 @@ class TrainService:
                     services_to_fetch=len(services_to_fetch),
                     force_fetch=force_fetch
                 )
-                for i in range(0, len(services_to_fetch), 10):
-                    batch = services_to_fetch[i:i + 10]
-                    first_departure = batch[0]['std']
+                # Plan each unknown departure against the first board listing it
+                unassigned = {(d['std'], d['destination']) for d in services_to_fetch}
+                pending = {}
+                for key, board in origin_boards:
+                    missing = [d for d in board if (d['std'], d['destination']) in unassigned]
+                    if missing:
+                        unassigned -= {(d['std'], d['destination']) for d in missing}
+                        pending[key] = (board, missing)
+                await self._fetch_details(
+                    pending, destinations, use_cache=use_cache, on_batch=add_services,
+                    semaphore=detail_slots, db_lock=db_lock
+                )
+
+        await self._map(match_origin, origins)
+
+        total_duration = int((time.time() - start_time) * 1000)
+        log.info(
+            "train.routes.fetch.complete",
+            origins=origins,
+            services_found=len(result_services),
+            upstream_calls=self.upstream_calls,
+            total_elapsed_ms=total_duration
+        )
 
-                    details_start = time.time()
+        return self._sort_by_departure(result_services, now)
+
+    async def prefetch_origins(self, origins: List[str]) -> int:
+        """Refresh cached boards and store details for unknown services."""
+        now = datetime.now(self.london_tz)
+        self.upstream_calls = 0
+        boards = await self._map(
+            lambda origin: self._get_departure_board(origin, use_cache=False),
+            origins
+        )
 
-                    details = self._get_departure_board_with_details(
-                        origin,
-                        time_offset=self._calculate_offset(first_departure),
-                        time_window=30  # Small window to catch this batch
+        pending = {}
+        for origin, departures in zip(origins, boards):
+            if not departures:
+                continue
+            _, services_to_fetch = await run_in_thread(
+                self._match_known_services, origin, departures, [], now, False
+            )
+            if services_to_fetch:
+                pending[(origin, None)] = (departures, services_to_fetch)
+
+        await self._fetch_details(pending, [], use_cache=True)
+        return self.upstream_calls
+
+    def _match_known_services(
+            self,
+            origin: str,
+            departures: List[dict],
+            destinations: List[str],
+            now: datetime,
+            force_fetch: bool
+    ) -> Tuple[List[dict], List[dict]]:
+        """Split departures into cached matches and services needing details."""
+        if force_fetch:
+            return [], list(departures)
+
+        db_start = time.time()
+        # Services never seen on today's day type are revalidated upstream
+        known = known_service_cache.window(
+            origin,
+            start_minute=minute_of_day(now),
+            window_minutes=60,
+            load=lambda: [ServiceRecord.from_row(r) for r in get_origin_services(self.db, origin)],
+            day_mask=day_type_mask(now)
+        )
+        known_ids = {r.service_id for r in known}
+        # Stops come from the calling point index; the JSON is loaded for matches only
+        serving = {
+            r.service_id: r for r in known_service_cache.with_calling_points(
+                origin,
+                [r for r in known if r.serves(destinations)],
+                load=lambda service_ids: get_calling_points(self.db, service_ids)
+            )
+        }
+        log.info(
+            "train.db.fetch",
+            origin=origin,
+            cached_services=len(known_ids),
+            serving_services=len(serving),
+            elapsed_ms=int((time.time() - db_start) * 1000)
+        )
+
+        if destinations:
+            reachability_index.ensure_loaded(
+                origin, lambda: get_reachable_stations(self.db, origin)
+            )
+
+        matched = []
+        services_to_fetch = []
+        seen = []
+        unreachable = 0
+        for departure in departures:
+            service_id = self._generate_service_id(
+                origin,
+                departure['destination'],
+                departure['std']
+            )
+
+            if service_id in known_ids:
+                seen.append(service_id)
+                if service_id in serving:
+                    matched.append(
+                        self._merge_realtime(serving[service_id].to_dict(), departure)
                     )
+            elif destinations and reachability_index.can_reach(
+                    origin, departure['destination'], destinations) is False:
+                unreachable += 1
+            else:
+                services_to_fetch.append(departure)
 
-                    details_duration = int((time.time() - details_start) * 1000)
+        if unreachable:
+            log.info(
+                "train.details.skipped_unreachable",
+                origin=origin,
+                skipped=unreachable
+            )
+
+        # Keeps last_seen_at current for retention, one write per service per day
+        mark_services_seen(self.db, seen_tracker.unmarked(now.date(), seen), now)
+
+        return matched, services_to_fetch
+
+    async def _fetch_details(
+            self,
+            pending: Dict[Tuple[str, Optional[str]], Tuple[List[dict], List[dict]]],
+            destinations: List[str],
+            use_cache: bool = True,
+            on_batch: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+            semaphore: Optional[asyncio.Semaphore] = None,
+            db_lock: Optional[asyncio.Lock] = None
+    ) -> List[dict]:
+        """Fetch calling points for unknown departures with as few calls as possible.
+
+        pending maps each (origin, filter crs) board to (full board, departures
+        needing details). Calls are planned per board, and anything a response
+        missed is re-planned for the next round. on_batch is awaited with each
+        board's matches as they are stored. Concurrent callers pass a shared
+        semaphore for the calls and a shared db_lock for the stores.
+        """
+        db_lock = db_lock or asyncio.Lock()
+        matched = []
+        for round_number in range(DETAIL_PLAN_ROUNDS):
+            jobs = []
+            for board_key, (board, missing) in pending.items():
+                board_offsets = [self._calculate_offset(d['std']) for d in board]
+                wanted_offsets = [self._calculate_offset(d['std']) for d in missing]
+                jobs.extend(
+                    (board_key, call)
+                    for call in plan_detail_calls(board_offsets, wanted_offsets)
+                )
+            if not jobs:
+                break
 
-                    log.info(
-                        "train.details.fetched",
+            results = await self._map(
+                lambda job: self._fetch_detail_call(job, use_cache=use_cache),
+                jobs,
+                semaphore=semaphore
+            )
+
+            # Overlapping calls can return the same service more than once
+            details_by_board = {}
+            for (board_key, _), details in zip(jobs, results):
+                seen = details_by_board.setdefault(board_key, {})
+                for detail in details:
+                    seen[(detail['scheduled_departure'], detail['destination'])] = detail
+
+            still_pending = {}
+            for board_key, (board, missing) in pending.items():
+                origin = board_key[0]
+                details = details_by_board.get(board_key, {})
+                async with db_lock:
+                    stored = await run_in_thread(
+                        self._store_details, origin, missing, list(details.values()), destinations
+                    )
+                matched.extend(stored)
+                if on_batch:
+                    await on_batch(stored)
+                remaining = [
+                    d for d in missing if (d['std'], d['destination']) not in details
+                ]
+                # Give up on an origin once a round makes no progress
+                if remaining and len(remaining) < len(missing):
+                    still_pending[board_key] = (board, remaining)
+                elif remaining:
+                    log.warning(
+                        "train.details.unresolved",
                         origin=origin,
-                        batch_start=i,
-                        batch_size=len(batch),
-                        details_found=len(details),
-                        elapsed_ms=details_duration
+                        missing=len(remaining),
+                        round=round_number
                     )
 
-                    for detail in details:
-                        # Store in DB
-                        service = create_or_update_service(
-                            self.db,
-                            service_id=self._generate_service_id(
-                                origin,
-                                detail['destination'],
-                                detail['scheduled_departure']
-                            ),
-                            origin=origin,
-                            destination=detail['destination'],
-                            destination_name=detail['destination_name'],
-                            scheduled_departure=detail['scheduled_departure'],
-                            calling_points=detail['calling_points'],
-                            operator=detail['operator']
-                        )
-
-                        if self._service_serves_destinations(service, destinations):
-                            # Find matching real-time data
-                            departure = next(
-                                (d for d in batch
-                                 if d['std'] == detail['scheduled_departure'] and
-                                 d['destination'] == detail['destination']),
-                                None
-                            )
-                            log.info(batch, detail)
-                            if departure:
-                                service_dict = service.to_dict()
-                                service_dict.update({
-                                    'estimated_departure': departure['etd'],
-                                    'platform': departure['platform'],
-                                    'is_cancelled': departure['is_cancelled'],
-                                    'delay_reason': departure['delay_reason'],
-                                    'cancel_reason': departure['cancel_reason'],
-                                    'coaches': departure['length'],
-                                })
-                                result_services.append(service_dict)
-
-            total_duration = int((time.time() - start_time) * 1000)
-            log.info(
-                "train.routes.fetch.complete",
-                origins=origins,
-                services_found=len(result_services),
-                total_elapsed_ms=total_duration
+            pending = still_pending
+
+        return matched
+
+    async def _fetch_detail_call(
+            self,
+            job: Tuple[Tuple[str, Optional[str]], DetailCall],
+            use_cache: bool = True
+    ) -> List[dict]:
+        """Run one planned GetDepBoardWithDetails call."""
+        (origin, filter_crs), call = job
+        details_start = time.time()
+
+        details = await self._get_departure_board_with_details(
+            origin,
+            time_offset=call.offset,
+            time_window=call.window,
+            num_rows=call.num_rows,
+            filter_crs=filter_crs,
+            use_cache=use_cache
+        )
+
+        log.info(
+            "train.details.fetched",
+            origin=origin,
+            filter_crs=filter_crs,
+            time_offset=call.offset,
+            time_window=call.window,
+            num_rows=call.num_rows,
+            details_found=len(details),
+            elapsed_ms=int((time.time() - details_start) * 1000)
+        )
+        return details
+
+    def _store_details(
+            self,
+            origin: str,
+            batch: List[dict],
+            details: List[dict],
+            destinations: List[str]
+    ) -> List[dict]:
+        """Persist fetched details and return those serving the destinations."""
+        services = [
+            KnownService(
+                service_id=self._generate_service_id(
+                    origin,
+                    detail['destination'],
+                    detail['scheduled_departure']
+                ),
+                origin=origin,
+                destination=detail['destination'],
+                destination_name=detail['destination_name'],
+                scheduled_departure=detail['scheduled_departure'],
+                calling_points=detail['calling_points'],
+                operator=detail['operator']
+            )
+            for detail in details
+        ]
+        # One INSERT ... ON CONFLICT and one commit for the whole batch
+        now = datetime.now(self.london_tz)
+        bulk_upsert_services(self.db, [service.to_row() for service in services], seen_at=now)
+        if services:
+            known_service_cache.invalidate(origin)
+        seen_tracker.mark(now.date(), [service.service_id for service in services])
+        for service in services:
+            reachability_index.record(
+                origin,
+                service.destination,
+                [cp['crs'] for cp in service.calling_points]
             )
 
-        return sorted(result_services, key=lambda x: x['scheduled_departure'])
+        matched = []
+        for service in services:
+            if self._service_serves_destinations(service, destinations):
+                # Find matching real-time data
+                departure = next(
+                    (d for d in batch
+                     if d['std'] == service.scheduled_departure and
+                     d['destination'] == service.destination),
+                    None
+                )
+                if departure:
+                    matched.append(self._merge_realtime(service.to_dict(), departure))
+
+        return matched
+
+    async def _cached(self, cache_key: tuple, flight_key: tuple, fetch: Callable, use_cache: bool) -> List[dict]:
+        """Serve from the board cache, revalidating stale entries in the background."""
 
+        async def load():
+            value = await fetch()
+            board_cache.set(cache_key, value)
+            return value
+
+        if use_cache:
+            value, is_stale = board_cache.get_entry(cache_key)
+            if value is not None:
+                if is_stale and flight_key not in board_flights:
+                    task = asyncio.ensure_future(self._revalidate(cache_key, flight_key, load))
+                    revalidation_tasks.add(task)
+                    task.add_done_callback(revalidation_tasks.discard)
+                return value
+
+        return await board_flights.do(flight_key, load)
+
+    @staticmethod
+    async def _revalidate(cache_key: tuple, flight_key: tuple, load: Callable) -> None:
+        # Only affects this task's copy of the context
+        _revalidating.set(True)
+        try:
+            await board_flights.do(flight_key, load)
+            log.debug("train.board.cache.revalidated", key=cache_key)
+        except Exception as e:
+            log.warning(
+                "train.board.cache.revalidate.failed",
+                key=cache_key,
+                error=str(e),
+                error_type=type(e).__name__
+            )
+
+    @staticmethod
+    def _board_key(origin: str, filter_crs: Optional[str] = None) -> tuple:
+        return ("GetDepartureBoard", origin, 0, 60, filter_crs)
 
-    def _get_departure_board(self, origin: str) -> List[dict]:
+    @staticmethod
+    def _filter_params(filter_crs: Optional[str]) -> dict:
+        """LDBWS arguments restricting a board to services calling at filter_crs."""
+        return {'filterCrs': filter_crs, 'filterType': 'to'} if filter_crs else {}
+
+    def _board_filters(self, origin: str, destinations: List[str], use_cache: bool) -> List[Optional[str]]:
+        """Choose per-destination filtered boards or one unfiltered board for origin."""
+        if not destinations or len(set(destinations)) > config.BOARD_FILTER_MAX_DESTINATIONS:
+            return [None]
+        # A warm unfiltered board costs no calls at all
+        if use_cache and board_cache.peek(self._board_key(origin)) is not None:
+            return [None]
+        return sorted(set(destinations) - {origin}) or [None]
+
+    @staticmethod
+    def _merge_boards(boards: List[List[dict]]) -> List[dict]:
+        """Merge filtered boards, keeping the first copy of each departure."""
+        if len(boards) == 1:
+            return boards[0]
+        merged = {}
+        for board in boards:
+            for departure in board:
+                merged.setdefault((departure['std'], departure['destination']), departure)
+        return list(merged.values())
+
+    async def _get_departure_board(
+            self,
+            origin: str,
+            filter_crs: Optional[str] = None,
+            use_cache: bool = True
+    ) -> List[dict]:
+        """Get real-time data from cache or a shared in-flight call."""
+        key = self._board_key(origin, filter_crs)
+        return await self._cached(
+            key, key, lambda: self._fetch_departure_board(origin, filter_crs), use_cache
+        )
+
+    async def _fetch_departure_board(self, origin: str, filter_crs: Optional[str] = None) -> List[dict]:
         """Get real-time data with fast endpoint."""
         start_time = time.time()
-        log.info("train.board.fetch.start", origin=origin)
-        response = self.soap_client.service.GetDepartureBoard(
+        log.info("train.board.fetch.start", origin=origin, filter_crs=filter_crs)
+        self._count_upstream_call()
+        params = dict(
             numRows=150,
             crs=origin,
             timeOffset=0,
-            timeWindow=60
+            timeWindow=60,
+            **self._filter_params(filter_crs)
         )
+        if self.parser == 'lxml':
+            content = await call_raw(self.soap_client, 'GetDepartureBoard', **params)
+            # lxml parsing of large boards is CPU bound, so keep it off the event loop
+            services = await run_in_thread(parse_departure_board, content)
+        else:
+            response = await self.soap_client.service.GetDepartureBoard(**params)
+            services = self._board_from_response(response)
         elapsed_ms = int((time.time() - start_time) * 1000)
 
-
-        if not response or not response.trainServices:
+        if not services:
             log.warning(
                 "train.board.empty",
                 origin=origin,
@@ -213,7 +611,22 @@ class TrainService:
             )
             return []
 
-        services = [
+        log.info(
+            "train.board.fetch.success",
+            origin=origin,
+            services_found=len(services),
+            elapsed_ms=elapsed_ms
+        )
+
+        return services
+
+    @staticmethod
+    def _board_from_response(response: Any) -> List[dict]:
+        """Flatten a zeep GetDepartureBoard response."""
+        if not response or not response.trainServices:
+            return []
+
+        return [
             {
                 'destination': s.destination.location[0].crs,
                 'destination_name': s.destination.location[0].locationName,
@@ -228,35 +641,63 @@ class TrainService:
             for s in response.trainServices.service
         ]
 
-        log.info(
-            "train.board.fetch.success",
-            origin=origin,
-            services_found=len(services),
-            elapsed_ms=elapsed_ms
+    async def _get_departure_board_with_details(
+            self,
+            origin: str,
+            time_offset: int,
+            time_window: int,
+            num_rows: int = 10,
+            filter_crs: Optional[str] = None,
+            use_cache: bool = True
+    ) -> List[dict]:
+        """Get calling points data from cache or a shared in-flight call."""
+        # Offsets move with the clock, so cache on the absolute window start
+        window_start = datetime.now(self.london_tz) + timedelta(minutes=time_offset)
+        return await self._cached(
+            ("GetDepBoardWithDetails", origin, window_start.strftime("%H:%M"), time_window, num_rows, filter_crs),
+            ("GetDepBoardWithDetails", origin, time_offset, time_window, num_rows, filter_crs),
+            lambda: self._fetch_departure_board_with_details(
+                origin, time_offset, time_window, num_rows, filter_crs
+            ),
+            use_cache
         )
 
-        return services
-
-    def _get_departure_board_with_details(self, origin: str, time_offset: int, time_window: int) -> List[dict]:
+    async def _fetch_departure_board_with_details(
+            self,
+            origin: str,
+            time_offset: int,
+            time_window: int,
+            num_rows: int = 10,
+            filter_crs: Optional[str] = None
+    ) -> List[dict]:
         """Get calling points data with detailed endpoint."""
         start_time = time.time()
         log.info(
             "train.details.fetch.start",
             origin=origin,
             time_offset=time_offset,
-            time_window=time_window
+            time_window=time_window,
+            filter_crs=filter_crs
         )
 
-        response = self.soap_client.service.GetDepBoardWithDetails(
-            numRows=10,
+        self._count_upstream_call()
+        params = dict(
+            numRows=num_rows,
             crs=origin,
             timeOffset=time_offset,
-            timeWindow=time_window
+            timeWindow=time_window,
+            **self._filter_params(filter_crs)
         )
+        if self.parser == 'lxml':
+            content = await call_raw(self.soap_client, 'GetDepBoardWithDetails', **params)
+            services = await run_in_thread(parse_departure_board_with_details, content)
+        else:
+            response = await self.soap_client.service.GetDepBoardWithDetails(**params)
+            services = self._details_from_response(response)
 
         elapsed_ms = int((time.time() - start_time) * 1000)
 
-        if not response or not response.trainServices:
+        if not services:
             log.warning(
                 "train.details.empty",
                 origin=origin,
@@ -265,7 +706,23 @@ class TrainService:
             )
             return []
 
-        services = [
+        log.info(
+            "train.details.fetch.success",
+            origin=origin,
+            time_offset=time_offset,
+            services_found=len(services),
+            elapsed_ms=elapsed_ms
+        )
+
+        return services
+
+    @staticmethod
+    def _details_from_response(response: Any) -> List[dict]:
+        """Flatten a zeep GetDepBoardWithDetails response."""
+        if not response or not response.trainServices:
+            return []
+
+        return [
             {
                 'destination': s.destination.location[0].crs,
                 'destination_name': s.destination.location[0].locationName,
@@ -283,29 +740,10 @@ class TrainService:
             for s in response.trainServices.service
         ]
 
-        log.info(
-            "train.details.fetch.success",
-            origin=origin,
-            time_offset=time_offset,
-            services_found=len(services),
-            elapsed_ms=elapsed_ms
-        )
-
-        return services
-
     def _calculate_offset(self, target_time: str) -> int:
         """Calculate minutes offset needed to include target time."""
-        now = datetime.now(self.london_tz)
-        current_time = now.strftime("%H:%M")
-
-        # Convert both to minutes since midnight
-        current_mins = int(current_time.split(":")[0]) * 60 + int(current_time.split(":")[1])
-        target_mins = int(target_time.split(":")[0]) * 60 + int(target_time.split(":")[1])
-
-        # Calculate difference
-        diff = target_mins - current_mins
-        return max(0, diff)
-
+        now_min = minute_of_day(datetime.now(self.london_tz))
+        return max(0, relative_minutes(parse_hhmm(target_time), now_min))
 
     def _store_service(self, service: Any) -> Optional[KnownService]:
         """Store a service in the database."""
@@ -339,38 +777,6 @@ class TrainService:
             return None
 
 
-def create_train_service(db: Session) -> TrainService:
-    """Create and configure train service instance with controlled logging."""
-    # Configure Zeep logging
-    zeep_logger = logging.getLogger('zeep')
-    zeep_logger.setLevel(logging.WARNING)  # Only show warnings and errors
-
-    # Configure transport with timeout
-    session = requests.Session()
-    session.verify = True
-    transport = Transport(session=session, timeout=10)
-
-    # Configure Zeep settings
-    settings = Settings(strict=False, xml_huge_tree=True)
-    history = HistoryPlugin()
-
-    client = Client(
-        wsdl=os.getenv('WSDL'),
-        settings=settings,
-        transport=transport,
-        plugins=[history]
-    )
-
-    # Add authentication header
-    header = xsd.Element(
-        '{http://thalesgroup.com/RTTI/2013-11-28/Token/types}AccessToken',
-        xsd.ComplexType([
-            xsd.Element(
-                '{http://thalesgroup.com/RTTI/2013-11-28/Token/types}TokenValue',
-                xsd.String()),
-        ])
-    )
-    header_value = header(TokenValue=os.getenv('LDB_TOKEN'))
-    client.set_default_soapheaders([header_value])
-
-    return TrainService(db=db, soap_client=client)
+async def create_train_service(db: Session) -> TrainService:
+    """Create a train service instance backed by the shared SOAP client."""
+    return TrainService(db=db, soap_client=await ensure_soap_client())
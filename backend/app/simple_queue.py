@@ -1,122 +1,249 @@
-import os
 import asyncio
-from typing import List, Any, Dict, Tuple, Callable
-from functools import wraps
+import hashlib
+import json
+import math
+import secrets
+from collections import OrderedDict
+from typing import List, Any, Dict, Set, Callable
+from functools import wraps, partial
 from asyncio import Queue
 from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 import structlog
 from time import time
-from app.exceptions import TrainServiceException
+from app.core import config
+from app.exceptions import TaskQueueFull, TrainServiceException
+from app.services.result_store import ResultStore
 
 # Create module logger
 log = structlog.get_logger("async.queue")
 
 # Initialize task queue and thread pool
 task_queue: Queue = Queue()
-thread_pool = ThreadPoolExecutor(max_workers=3)
+thread_pool = ThreadPoolExecutor(max_workers=config.THREAD_POOL_WORKERS)
+
+# Completion future per queued task, resolved by the worker with its result record
+task_futures: Dict[str, asyncio.Future] = {}
+
+# Functions decorated with async_task, by task_name, so any process can run them
+task_registry: Dict[str, Callable] = {}
+
+# Manager that takes over enqueueing from the in-process queue (see app.pg_queue)
+task_backend = None
+
+
+def task_name(func: Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+class Admission:
+    """Bounds the queued (not yet running) tasks, overall and per owner.
+
+    An owner's newer request for the same slot (one journey, say) replaces
+    their older queued one, and a task left with no owners is cancelled
+    before it runs. Over max_queued overall, or max_per_owner for a single
+    owner, new tasks are refused with TaskQueueFull.
+    """
+
+    def __init__(self, max_queued: int = 100, max_per_owner: int = 3, max_cancelled: int = 10000):
+        self.max_queued = max_queued
+        self.max_per_owner = max_per_owner
+        self.max_cancelled = max_cancelled
+        self.owners: Dict[str, Set[Any]] = {}  # queued task id -> owners waiting on it
+        self.by_owner: Dict[Any, Dict[str, Any]] = {}  # owner -> {queued task id: slot}, oldest first
+        self._cancelled: "OrderedDict[str, None]" = OrderedDict()
+        self.rejected = 0
+        self.rejected_owner = 0
+        self.replaced = 0
+        self.cancelled = 0
+
+    def depth(self) -> int:
+        return len(self.owners)
+
+    def _superseded(self, owner: Any, slot: Any, keep: str) -> List[str]:
+        """The owner's other queued tasks for the same slot, which keep replaces."""
+        if owner is None or slot is None:
+            return []
+        return [t for t, s in self.by_owner.get(owner, {}).items() if s == slot and t != keep]
+
+    def _detach(self, owner: Any, task_ids: List[str]) -> List[str]:
+        """Drop owner from task_ids; return those nobody is waiting on any more."""
+        cancelled = []
+        for task_id in task_ids:
+            del self.by_owner[owner][task_id]
+            owners = self.owners[task_id]
+            owners.discard(owner)
+            if not owners:
+                del self.owners[task_id]
+                self._cancelled[task_id] = None
+                cancelled.append(task_id)
+        self.cancelled += len(cancelled)
+        if not self.by_owner[owner]:
+            del self.by_owner[owner]
+        while len(self._cancelled) > self.max_cancelled:
+            self._cancelled.popitem(last=False)
+        self.replaced += len(task_ids)
+        return cancelled
+
+    def admit(self, task_id: str, owner: Any = None, slot: Any = None) -> List[str]:
+        """Admit a new queued task; returns the task ids it cancelled."""
+        superseded = self._superseded(owner, slot, task_id)
+        freed = sum(1 for t in superseded if self.owners[t] == {owner})
+        if self.depth() - freed >= self.max_queued:
+            self.rejected += 1
+            raise TaskQueueFull(self.depth())
+        if owner is not None:
+            queued = len(self.by_owner.get(owner, {})) - len(superseded)
+            if queued >= self.max_per_owner:
+                self.rejected_owner += 1
+                raise TaskQueueFull(queued, owner=owner)
+
+        cancelled = self._detach(owner, superseded) if superseded else []
+        self._cancelled.pop(task_id, None)
+        self.owners[task_id] = set() if owner is None else {owner}
+        if owner is not None:
+            self.by_owner.setdefault(owner, {})[task_id] = slot
+        return cancelled
+
+    def attach(self, task_id: str, owner: Any = None, slot: Any = None) -> List[str]:
+        """Add an owner to a task that is already queued or running; returns cancelled ids."""
+        if owner is None:
+            return []
+        superseded = self._superseded(owner, slot, task_id)
+        cancelled = self._detach(owner, superseded) if superseded else []
+        if task_id in self.owners and owner not in self.owners[task_id]:
+            self.owners[task_id].add(owner)
+            self.by_owner.setdefault(owner, {})[task_id] = slot
+        return cancelled
+
+    def start(self, task_id: str) -> bool:
+        """Move a task from queued to running; False if it was cancelled."""
+        owners = self.owners.pop(task_id, None)
+        if owners is None:
+            return False
+        for owner in owners:
+            del self.by_owner[owner][task_id]
+            if not self.by_owner[owner]:
+                del self.by_owner[owner]
+        return True
+
+    def was_cancelled(self, task_id: str) -> bool:
+        return task_id in self._cancelled
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": self.depth(),
+            "max_queued": self.max_queued,
+            "max_per_owner": self.max_per_owner,
+            "rejected": self.rejected,
+            "rejected_owner": self.rejected_owner,
+            "replaced": self.replaced,
+            "cancelled": self.cancelled,
+        }
+
+
+admission = Admission(config.TASK_QUEUE_MAX, config.TASK_MAX_QUEUED_PER_USER)
+
+
+def _cancel(task_ids: List[str]) -> None:
+    """Wake anyone waiting on tasks that admission cancelled, and unqueue them."""
+    if not task_ids:
+        return
+    for task_id in task_ids:
+        future = task_futures.pop(task_id, None)
+        if future is not None and not future.done():
+            future.set_result({'status': 'cancelled', 'result': None})
+
+    # asyncio.Queue cannot remove entries, so requeue everything else in order
+    cancelled = set(task_ids)
+    kept = []
+    while not task_queue.empty():
+        entry = task_queue.get_nowait()
+        task_queue.task_done()
+        if entry[0] not in cancelled:
+            kept.append(entry)
+    for entry in kept:
+        task_queue.put_nowait(entry)
 
 
 async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
-    """Run a synchronous function in the thread pool."""
-    return await asyncio.get_event_loop().run_in_executor(
+    """Run a synchronous function in the thread pool.
+
+    A thread cannot be interrupted, so a cancelled caller still waits for it
+    before unwinding; cleanup such as closing a Session never races the work.
+    """
+    future = asyncio.get_event_loop().run_in_executor(
         thread_pool,
-        func,
-        *args
+        partial(func, *args, **kwargs)
     )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait([future])
+            except asyncio.CancelledError:
+                pass
+        if not future.cancelled():
+            # Mark any exception retrieved; the cancellation is what propagates
+            future.exception()
+        raise
 
 
 class AsyncTaskManager:
-    def __init__(self):
-        self.tasks: Dict[str, Dict] = {}
-        self.results: Dict[str, Dict] = {}
-        self._worker_task = None
+    def __init__(self, concurrency: int = None):
+        self.results = ResultStore(
+            ttl_seconds=config.TASK_RESULT_TTL,
+            max_entries=config.TASK_RESULT_MAX_ENTRIES,
+            max_bytes=config.TASK_RESULT_MAX_BYTES
+        )
+        self._handles = TTLCache(maxsize=config.TASK_HANDLE_MAX, ttl=config.TASK_HANDLE_TTL)
+        self.concurrency = config.TASK_WORKERS if concurrency is None else concurrency
+        self._workers: List[asyncio.Task] = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
         self.log = log.bind(component="task_manager")
 
     async def start(self):
-        """Start the task worker."""
-        if self._worker_task is None:
-            self._worker_task = asyncio.create_task(self._worker())
-            self.log.info("task_manager.worker.started")
+        """Start the task workers."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._worker(n)) for n in range(self.concurrency)
+            ]
+            self.log.info("task_manager.worker.started", workers=self.concurrency)
 
     async def stop(self):
-        """Stop the task worker."""
-        if self._worker_task:
-            self._worker_task.cancel()
-            try:
-                await self._worker_task
-            except asyncio.CancelledError:
-                pass
-            self._worker_task = None
+        """Stop the task workers."""
+        if self._workers:
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
             self.log.info("task_manager.worker.stopped")
 
-    async def _worker(self):
-        """Main worker loop processing tasks from the queue."""
+    async def _worker(self, worker_id: int = 0):
+        """Worker loop; each of the pool's workers runs one task at a time."""
+        worker_log = self.log.bind(worker=worker_id)
         while True:
             try:
-                task_id, func, args, kwargs = await task_queue.get()
-                task_log = self.log.bind(
-                    task_id=task_id,
-                    function=func.__name__
-                )
-
-                start_time = time()
-                task_log.info("task_manager.task.started")
-
+                task_id, func, args, kwargs, enqueued_at = await task_queue.get()
                 try:
-                    # Run the synchronous function in a thread pool
-                    result = await run_in_thread(func, *args, **kwargs)
-                    duration = time() - start_time
-
-                    self.results[task_id] = {
-                        'status': 'completed',
-                        'result': result,
-                        'duration': duration
-                    }
-
-                    task_log.info(
-                        "task_manager.task.completed",
-                        duration=round(duration, 3)
-                    )
-
-                except TrainServiceException as e:
-                    self.results[task_id] = {
-                        'status': 'failed',
-                        'result': {
-                            'status_code': e.status_code,
-                            'detail': e.detail
-                        }
-                    }
-                    task_log.error(
-                        "task_manager.task.failed",
-                        error=str(e),
-                        error_type="TrainServiceException",
-                        status_code=e.status_code
-                    )
-
-                except Exception as e:
-                    self.results[task_id] = {
-                        'status': 'failed',
-                        'result': {
-                            'status_code': 500,
-                            'detail': str(e)
-                        }
-                    }
-                    task_log.error(
-                        "task_manager.task.failed",
-                        error=str(e),
-                        error_type=type(e).__name__,
-                        exc_info=True
-                    )
-
+                    if admission.start(task_id):
+                        await self._run(task_id, func, args, kwargs, enqueued_at)
+                    else:
+                        worker_log.debug("task_manager.task.skipped_cancelled", task_id=task_id)
                 finally:
                     task_queue.task_done()
 
             except asyncio.CancelledError:
-                self.log.info("task_manager.worker.cancelled")
+                worker_log.info("task_manager.worker.cancelled")
                 break
 
             except Exception as e:
-                self.log.error(
+                worker_log.error(
                     "task_manager.worker.error",
                     error=str(e),
                     error_type=type(e).__name__,
@@ -124,44 +251,225 @@ class AsyncTaskManager:
                 )
                 await asyncio.sleep(1)  # Prevent tight loop on repeated errors
 
+    async def _run(self, task_id: str, func: Callable, args, kwargs, enqueued_at: float):
+        """Run one task and record its result, timing queue wait and run separately."""
+        start_time = time()
+        queue_wait = start_time - enqueued_at
+        task_log = self.log.bind(
+            task_id=task_id,
+            function=func.__name__
+        )
+        task_log.info("task_manager.task.started", queue_wait=round(queue_wait, 3))
+
+        self.running += 1
+        self.total_wait += queue_wait
+        try:
+            if asyncio.iscoroutinefunction(func):
+                # Async tasks share the event loop with every other task
+                result = await func(*args, **kwargs)
+            else:
+                # Run the synchronous function in a thread pool
+                result = await run_in_thread(func, *args, **kwargs)
+            duration = time() - start_time
+
+            self.completed += 1
+            await self._complete(task_id, {
+                'status': 'completed',
+                'result': result,
+                'duration': duration,
+                'queue_wait': queue_wait
+            })
+
+            task_log.info(
+                "task_manager.task.completed",
+                duration=round(duration, 3),
+                queue_wait=round(queue_wait, 3)
+            )
+
+        except TrainServiceException as e:
+            self.failed += 1
+            await self._complete(task_id, {
+                'status': 'failed',
+                'result': {
+                    'status_code': e.status_code,
+                    'detail': e.detail
+                }
+            })
+            task_log.error(
+                "task_manager.task.failed",
+                error=str(e),
+                error_type="TrainServiceException",
+                status_code=e.status_code
+            )
+
+        except Exception as e:
+            self.failed += 1
+            await self._complete(task_id, {
+                'status': 'failed',
+                'result': {
+                    'status_code': 500,
+                    'detail': str(e)
+                }
+            })
+            task_log.error(
+                "task_manager.task.failed",
+                error=str(e),
+                error_type=type(e).__name__,
+                exc_info=True
+            )
+
+        finally:
+            self.running -= 1
+            self.total_run += time() - start_time
+
+    def result_stats(self) -> Dict[str, Any]:
+        return self.results.stats()
+
+    def retry_after(self) -> int:
+        """Seconds until a worker is likely to free a queue slot."""
+        finished = self.completed + self.failed
+        avg_run = self.total_run / finished if finished else 1.0
+        return max(1, math.ceil(avg_run / max(1, self.concurrency)))
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "workers": len(self._workers),
+            "queued": admission.depth(),
+            "admission": admission.stats(),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_queue_wait_ms": round(self.total_wait / finished * 1000, 1) if finished else 0,
+            "avg_run_ms": round(self.total_run / finished * 1000, 1) if finished else 0,
+        }
+
+    def issue_handle(self, task_id: str, user_id: int) -> str:
+        """Unguessable per-user handle for a possibly shared task."""
+        handle = secrets.token_urlsafe(16)
+        self._handles[handle] = (task_id, user_id)
+        return handle
+
+    def resolve_handle(self, handle: str, user_id: int) -> str:
+        """Task id behind a handle; KeyError if unknown or issued to another user."""
+        task_id, owner = self._handles.get(handle, (None, None))
+        if task_id is None or owner != user_id:
+            raise KeyError(handle)
+        return task_id
+
+    async def _complete(self, task_id: str, record: Dict[str, Any]):
+        """Store a task's result record and wake everyone awaiting it."""
+        self.results.set(task_id, record)
+        future = task_futures.pop(task_id, None)
+        if future is not None and not future.done():
+            future.set_result(record)
+
     async def get_result(self, task_id: str, timeout: float = None) -> Dict[str, Any]:
-        """Get task result with optional timeout."""
+        """Get task result, waiting up to timeout seconds for it to complete.
+
+        Evicted results come back with status "expired". Raises KeyError
+        for unknown tasks and TimeoutError if still running.
+        """
         log_ctx = self.log.bind(task_id=task_id, timeout=timeout)
 
-        start_time = asyncio.get_event_loop().time()
-        while timeout is None or (asyncio.get_event_loop().time() - start_time) < timeout:
-            if task_id in self.results:
-                result = self.results[task_id]
-                log_ctx.debug(
-                    "task_manager.result.retrieved",
-                    status=result['status']
-                )
-                return result
-            await asyncio.sleep(0.1)
+        # A rerun of the same content key supersedes any result from an earlier run
+        future = task_futures.get(task_id)
+        result = None if future is not None else self.results.get(task_id)
+        if result is None:
+            if future is None:
+                if self.results.is_expired(task_id):
+                    log_ctx.debug("task_manager.result.expired")
+                    return {'status': 'expired', 'result': None}
+                if admission.was_cancelled(task_id):
+                    return {'status': 'cancelled', 'result': None}
+                raise KeyError(task_id)
+            if timeout is not None and timeout <= 0:
+                raise TimeoutError("Task result not available within timeout")
+            try:
+                # shield so one waiter timing out does not cancel the future for others
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                log_ctx.debug("task_manager.result.timeout")
+                raise TimeoutError("Task result not available within timeout")
 
-        log_ctx.warning("task_manager.result.timeout")
-        raise TimeoutError("Task result not available within timeout")
+        log_ctx.debug(
+            "task_manager.result.retrieved",
+            status=result['status']
+        )
+        return result
 
 
-def async_task(func: Callable) -> Callable:
-    """Decorator to convert a function into an async task."""
+def task_key(func: Callable, key: Any) -> str:
+    """Content-addressed task id for a function and its canonical arguments."""
+    bucket = int(time() // config.TASK_DEDUP_WINDOW)
+    payload = json.dumps([task_name(func), key, bucket], sort_keys=True, default=str)
+    return f"task_{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+
+def async_task(
+        func: Callable = None,
+        *,
+        key: Callable = None,
+        owner: Callable = None,
+        slot: Callable = None
+) -> Callable:
+    """Decorator to convert a function into an async task.
+
+    Task ids hash key(*args, **kwargs) (all arguments by default) and a
+    TASK_DEDUP_WINDOW time bucket, so an identical call made while one is
+    queued or running attaches to it instead of queueing duplicate work.
+    owner(*args, **kwargs) names who is waiting, for per-owner admission,
+    and an owner's newer task in the same slot(*args, **kwargs) replaces
+    their queued one. Raises TaskQueueFull when the queue, or the owner's
+    share of it, is at capacity.
+    """
+    if func is None:
+        return partial(async_task, key=key, owner=owner, slot=slot)
+
+    task_registry[task_name(func)] = func
 
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        task_id = f"task_{id(func)}_{id(args)}_{id(kwargs)}"
+        task_id = task_key(func, key(*args, **kwargs) if key else [args, kwargs])
 
         task_log = log.bind(
             task_id=task_id,
             function=func.__name__
         )
 
+        waiting = owner(*args, **kwargs) if owner else None
+        if task_backend is not None:
+            queued = await task_backend.enqueue(task_id, func, args, kwargs, owner=waiting)
+            task_log.debug("task_manager.task.queued" if queued else "task_manager.task.deduplicated")
+            return task_id
+
+        waiting_slot = slot(*args, **kwargs) if slot else None
+        if task_id in task_futures:
+            _cancel(admission.attach(task_id, waiting, waiting_slot))
+            task_log.debug("task_manager.task.deduplicated")
+            return task_id
+
+        try:
+            cancelled = admission.admit(task_id, waiting, waiting_slot)
+        except TaskQueueFull as e:
+            task_log.warning(
+                "task_manager.task.rejected",
+                queue_depth=admission.depth(),
+                owner_limited=e.owner is not None
+            )
+            raise
+        if cancelled:
+            task_log.info("task_manager.task.replaced", cancelled=cancelled)
+        _cancel(cancelled)
+
         task_log.debug(
             "task_manager.task.queued",
             args_count=len(args),
             kwargs_count=len(kwargs)
         )
 
-        await task_queue.put((task_id, func, args, kwargs))
+        task_futures[task_id] = asyncio.get_running_loop().create_future()
+        await task_queue.put((task_id, func, args, kwargs, time()))
         return task_id
 
-    return wrapper
\ No newline at end of file
+    return wrapper
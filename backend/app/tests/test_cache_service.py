@@ -0,0 +1,45 @@
+from app.services.cache_service import CacheService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_go_stale_then_expire():
+    clock = FakeClock()
+    cache = CacheService(ttl_seconds=30, stale_seconds=60, timer=clock)
+    board = [{"std": "10:00"}]
+    cache.set("KGX", board)
+
+    assert cache.get_entry("KGX") == (board, False)
+
+    clock.now = 45
+    assert cache.get_entry("KGX") == (board, True)
+    assert cache.get("KGX") is None
+
+    clock.now = 91
+    assert cache.get_entry("KGX") == (None, False)
+
+
+def test_stats_count_hits_misses_and_stale():
+    clock = FakeClock()
+    cache = CacheService(ttl_seconds=30, stale_seconds=60, timer=clock)
+    cache.get_entry("KGX")
+    cache.set("KGX", [])
+    cache.get_entry("KGX")
+    clock.now = 40
+    cache.get_entry("KGX")
+
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "stale_hits": 1}
+
+
+def test_values_are_stored_as_parsed_objects():
+    cache = CacheService()
+    board = [{"std": "10:00"}]
+    cache.set("KGX", board)
+
+    assert cache.get("KGX") is board
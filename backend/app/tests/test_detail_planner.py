@@ -0,0 +1,62 @@
+from app.services.detail_planner import DetailCall, plan_detail_calls
+
+
+def _covered(board, calls):
+    """Departures each planned call would return, per the planner's model."""
+    covered = set()
+    for call in calls:
+        in_window = sorted(
+            (offset, i) for i, offset in enumerate(board)
+            if call.offset <= offset <= call.offset + call.window
+        )
+        covered.update(i for _, i in in_window[:call.num_rows])
+    return covered
+
+
+def test_single_call_when_ten_rows_cover_everything():
+    board = [1, 3, 4, 8, 12, 20, 31, 45]
+    calls = plan_detail_calls(board, board)
+
+    assert calls == [DetailCall(offset=1, window=44, num_rows=8)]
+
+
+def test_splits_on_row_limit_not_fixed_slices():
+    board = list(range(0, 40, 2))  # 20 departures
+    wanted = board[3:15]
+
+    calls = plan_detail_calls(board, wanted)
+
+    assert calls == [
+        DetailCall(offset=6, window=18, num_rows=10),
+        DetailCall(offset=26, window=2, num_rows=2),
+    ]
+    wanted_idx = {board.index(o) for o in wanted}
+    assert wanted_idx <= _covered(board, calls)
+
+
+def test_skips_gaps_between_wanted_departures():
+    board = list(range(0, 100, 5))
+    wanted = [5, 90]
+
+    calls = plan_detail_calls(board, wanted)
+
+    assert calls == [
+        DetailCall(offset=5, window=0, num_rows=1),
+        DetailCall(offset=90, window=0, num_rows=1),
+    ]
+
+
+def test_does_not_split_a_minute_across_the_row_limit():
+    board = [0] * 9 + [5, 5, 5]
+    calls = plan_detail_calls(board, [0, 5])
+
+    assert calls == [
+        DetailCall(offset=0, window=0, num_rows=9),
+        DetailCall(offset=5, window=0, num_rows=3),
+    ]
+
+
+def test_window_is_capped():
+    calls = plan_detail_calls([0, 119, 200], [0, 200], max_window=120)
+
+    assert [c.offset for c in calls] == [0, 200]
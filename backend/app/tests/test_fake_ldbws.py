@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from zeep import AsyncClient
+from zeep.exceptions import Fault
+from zeep.transports import AsyncTransport
+
+from app.fake_ldbws.server import FakeSettings, WSDL_PATH, create_app
+from app.fake_ldbws.timetable import SyntheticTimetable
+from app.services.train_service import TrainService
+
+
+def _settings(**overrides):
+    settings = FakeSettings()
+    settings.latency_ms = settings.jitter_ms = settings.error_rate = 0
+    settings.recordings = settings.token = None
+    settings.seed = 1
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    return settings
+
+
+def _service(fake_app, parser="zeep"):
+    transport = AsyncTransport(client=httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_app),
+        base_url="http://localhost:8081",
+    ))
+    client = AsyncClient(str(WSDL_PATH), transport=transport)
+    return TrainService(db=None, soap_client=client, parser=parser)
+
+
+def test_wsdl_address_follows_host():
+    client = TestClient(create_app(_settings()))
+    response = client.get("/OpenLDBWS/wsdl.aspx")
+    assert response.status_code == 200
+    assert "http://testserver/OpenLDBWS/ldb12.asmx" in response.text
+
+
+def test_timetable_is_deterministic():
+    first = SyntheticTimetable(seed=3).departures("KGX", 600, 0, 120, 10)
+    second = SyntheticTimetable(seed=3).departures("KGX", 600, 0, 120, 10)
+    assert first == second
+    assert len(first) == 10
+    assert [d.std for d in first] == sorted(d.std for d in first)
+
+
+@pytest.mark.parametrize("parser", ["zeep", "lxml"])
+def test_board_round_trip(parser):
+    service = _service(create_app(_settings()), parser)
+    board = asyncio.run(service._fetch_departure_board("KGX"))
+    assert board
+    assert all(row["destination"] and row["std"] for row in board)
+
+    destination = board[0]["destination"]
+    details = asyncio.run(service._fetch_departure_board_with_details(
+        "KGX", 0, 120, 10, destination
+    ))
+    assert details
+    assert all(
+        destination in [p["crs"] for p in row["calling_points"]] for row in details
+    )
+
+
+def test_parsers_agree():
+    fake_app = create_app(_settings())
+    zeep_board = asyncio.run(_service(fake_app, "zeep")._fetch_departure_board("KGX"))
+    lxml_board = asyncio.run(_service(fake_app, "lxml")._fetch_departure_board("KGX"))
+    assert zeep_board == lxml_board
+
+
+def test_injected_errors_are_soap_faults():
+    service = _service(create_app(_settings(error_rate=1)))
+    with pytest.raises(Fault):
+        asyncio.run(service._fetch_departure_board("KGX"))
+
+
+def test_recordings_take_precedence(tmp_path):
+    recorded = (
+        WSDL_PATH.parent.parent / "tests" / "fixtures" / "ldbws" / "GetDepartureBoard_KGX.xml"
+    )
+    (tmp_path / "GetDepartureBoard_KGX.xml").write_bytes(recorded.read_bytes())
+    fake_app = create_app(_settings(recordings=str(tmp_path)))
+    board = asyncio.run(_service(fake_app)._fetch_departure_board("KGX"))
+    synthetic = asyncio.run(_service(create_app(_settings()))._fetch_departure_board("KGX"))
+    assert board != synthetic
+    assert fake_app.state.calls == {"GetDepartureBoard": 1}
+
+
+def test_call_raw_zeep_internals():
+    """call_raw relies on private zeep attributes; fail loudly if an upgrade moves them."""
+    import zeep
+
+    client = AsyncClient(str(WSDL_PATH))
+    service = client.service
+    operation = service["GetDepartureBoard"]
+    missing = [
+        name for name, present in [
+            ("ServiceProxy._binding._create", callable(getattr(getattr(service, "_binding", None), "_create", None))),
+            ("ServiceProxy._binding_options['address']", "address" in getattr(service, "_binding_options", {})),
+            ("OperationProxy._merge_soap_headers", callable(getattr(operation, "_merge_soap_headers", None))),
+            ("AsyncTransport.post_xml", callable(getattr(client.transport, "post_xml", None))),
+        ] if not present
+    ]
+    assert not missing, f"zeep {zeep.__version__} no longer provides {missing}; update ldbws_client.call_raw"
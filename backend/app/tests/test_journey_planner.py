@@ -0,0 +1,143 @@
+import threading
+from types import SimpleNamespace
+
+from app.core.rail_time import SATURDAY, WEEKDAYS, format_hhmm
+from app.services.journey_planner import JourneyPlanner, TimetableGraph
+from app.services.known_service_cache import ServiceRecord
+
+
+def _record(service_id, origin, calls, days_seen=WEEKDAYS):
+    """calls is [(crs, minute_of_day)], the first being the departure from origin."""
+    (_, dep_min), rest = calls[0], calls[1:]
+    return ServiceRecord.from_row(SimpleNamespace(
+        service_id=service_id,
+        origin=origin,
+        destination=rest[-1][0],
+        destination_name=rest[-1][0].title(),
+        scheduled_departure=format_hhmm(dep_min),
+        dep_min=dep_min,
+        operator="Test Rail",
+        days_seen=days_seen,
+        calling_points=[
+            {"crs": crs, "station_name": crs.title(), "scheduled_time": format_hhmm(m)}
+            for crs, m in rest
+        ],
+    ))
+
+
+def _summary(graph, journeys, now):
+    return [
+        [(leg["service_id"], leg["origin"], leg["destination"]) for leg in graph.describe(j, now)["legs"]]
+        for j in journeys
+    ]
+
+
+NOW = 600  # 10:00
+
+
+def test_direct_journey():
+    graph = TimetableGraph([_record("d1", "KGX", [("KGX", 610), ("SVG", 630), ("CBG", 660)])])
+
+    journeys = graph.plan(["KGX"], ["SVG"], NOW)
+
+    assert _summary(graph, journeys, NOW) == [[("d1", "KGX", "SVG")]]
+    described = graph.describe(journeys[0], NOW)
+    assert described["scheduled_departure"] == "10:10"
+    assert described["scheduled_arrival"] == "10:30"
+    assert described["changes"] == 0
+
+
+def test_one_change_respects_minimum_interchange():
+    graph = TimetableGraph([
+        _record("a", "KGX", [("KGX", 610), ("SVG", 640)]),
+        _record("too_tight", "SVG", [("SVG", 642), ("NMP", 700)]),
+        _record("b", "SVG", [("SVG", 650), ("NMP", 720)]),
+    ])
+
+    journeys = graph.plan(["KGX"], ["NMP"], NOW, min_interchange=5)
+
+    assert _summary(graph, journeys, NOW) == [[("a", "KGX", "SVG"), ("b", "SVG", "NMP")]]
+    described = graph.describe(journeys[0], NOW)
+    assert described["changes"] == 1
+    assert described["interchanges"] == [{"from": "SVG", "to": "SVG", "minutes": 10}]
+
+
+def test_change_across_london_uses_footpath():
+    graph = TimetableGraph([
+        _record("in", "CBG", [("CBG", 610), ("KGX", 660)]),
+        _record("out", "STP", [("STP", 668), ("LEI", 740)]),
+    ])
+
+    journeys = graph.plan(["CBG"], ["LEI"], NOW)
+
+    assert _summary(graph, journeys, NOW) == [[("in", "CBG", "KGX"), ("out", "STP", "LEI")]]
+
+
+def test_dominated_journeys_are_dropped():
+    graph = TimetableGraph([
+        _record("slow", "KGX", [("KGX", 610), ("YRK", 760)]),
+        _record("fast", "KGX", [("KGX", 620), ("YRK", 730)]),
+        _record("later", "KGX", [("KGX", 640), ("YRK", 750)]),
+    ])
+
+    journeys = graph.plan(["KGX"], ["YRK"], NOW)
+
+    assert _summary(graph, journeys, NOW) == [[("fast", "KGX", "YRK")], [("later", "KGX", "YRK")]]
+
+
+def test_horizon_day_type_and_midnight():
+    graph = TimetableGraph([
+        _record("past", "KGX", [("KGX", 590), ("CBG", 640)]),
+        _record("saturday", "KGX", [("KGX", 615), ("CBG", 660)], days_seen=SATURDAY),
+        _record("late", "KGX", [("KGX", 1430), ("CBG", 15)]),
+    ])
+
+    assert graph.plan(["KGX"], ["CBG"], NOW, day_mask=WEEKDAYS) == []
+    journeys = graph.plan(["KGX"], ["CBG"], 1420, day_mask=WEEKDAYS)
+    assert graph.describe(journeys[0], 1420)["scheduled_arrival"] == "00:15"
+    assert graph.describe(journeys[0], 1420)["duration_minutes"] == 25
+
+
+def test_planner_serves_the_old_graph_until_refreshed():
+    clock = SimpleNamespace(now=0.0)
+    planner = JourneyPlanner(ttl_seconds=60, timer=lambda: clock.now)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [_record("d1", "KGX", [("KGX", 610), ("CBG", 660)])]
+
+    first = planner.graph(load)
+    assert planner.graph(load) is first and not planner.stale()
+
+    # Expiry only marks the graph for the background refresh
+    clock.now = 61
+    assert planner.graph(load) is first and planner.stale()
+    assert len(loads) == 1
+
+    second = planner.refresh(load)
+    assert planner.graph(load) is second and not planner.stale()
+    planner.invalidate()
+    assert planner.graph(load) is second and planner.stale()
+    assert len(loads) == 2
+    assert planner.stats()["trips"] == 1
+
+
+def test_requests_are_not_blocked_by_a_rebuild():
+    planner = JourneyPlanner(ttl_seconds=60)
+    first = planner.graph(lambda: [_record("d1", "KGX", [("KGX", 610), ("CBG", 660)])])
+    building, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        building.set()
+        release.wait(5)
+        return [_record("d2", "KGX", [("KGX", 620), ("CBG", 670)])]
+
+    rebuild = threading.Thread(target=planner.refresh, args=(slow_load,))
+    rebuild.start()
+    assert building.wait(5)
+
+    assert planner.graph(slow_load) is first
+    release.set()
+    rebuild.join(5)
+    assert planner.graph(slow_load) is not first
@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+
+from app.core.rail_time import SATURDAY, WEEKDAYS
+from app.services.known_service_cache import KnownServiceCache, ServiceRecord
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(service_id, dep_min, stops=("CBG",), days_seen=WEEKDAYS):
+    return ServiceRecord.from_row(SimpleNamespace(
+        service_id=service_id,
+        origin="KGX",
+        destination=stops[-1],
+        destination_name=stops[-1].title(),
+        scheduled_departure=f"{dep_min // 60:02d}:{dep_min % 60:02d}",
+        dep_min=dep_min,
+        operator="Test Rail",
+        days_seen=days_seen,
+        calling_points=[{"crs": s, "station_name": s.title(), "scheduled_time": None} for s in stops],
+    ))
+
+
+def _ids(records):
+    return [r.service_id for r in records]
+
+
+def test_window_bisects_and_wraps_midnight():
+    cache = KnownServiceCache()
+    records = [_record("a", 1430), _record("b", 5), _record("c", 600), _record("d", 661)]
+
+    assert _ids(cache.window("KGX", 600, 60, lambda: records)) == ["c"]
+    assert _ids(cache.window("KGX", 1420, 60, lambda: records)) == ["a", "b"]
+    assert cache.stats() == {
+        "origins": 1, "services": 4, "hits": 1, "loads": 1, "calling_point_loads": 0
+    }
+
+
+def test_window_filters_day_type():
+    cache = KnownServiceCache()
+    records = [_record("weekday", 600), _record("saturday", 610, days_seen=SATURDAY)]
+
+    assert _ids(cache.window("KGX", 600, 60, lambda: records, day_mask=SATURDAY)) == ["saturday"]
+
+
+def test_invalidate_and_ttl_reload():
+    clock = FakeClock()
+    cache = KnownServiceCache(ttl_seconds=60, timer=clock)
+    loads = []
+
+    def load():
+        loads.append(clock.now)
+        return [_record("a", 600)]
+
+    cache.window("KGX", 600, 60, load)
+    cache.window("KGX", 600, 60, load)
+    cache.invalidate("KGX")
+    cache.window("KGX", 600, 60, load)
+    clock.now = 61
+    cache.window("KGX", 600, 60, load)
+    assert loads == [0.0, 0.0, 61]
+
+
+def test_load_racing_a_write_is_not_cached():
+    cache = KnownServiceCache()
+
+    def load():
+        cache.invalidate("KGX")
+        return [_record("old", 600)]
+
+    assert _ids(cache.window("KGX", 600, 60, load)) == ["old"]
+    assert cache.stats()["origins"] == 0
+
+
+def test_least_recently_used_origin_is_dropped():
+    cache = KnownServiceCache(max_origins=2)
+    for origin in ("KGX", "STP", "KGX", "EUS"):
+        cache.window(origin, 600, 60, lambda: [_record("a", 600)])
+
+    assert cache.stats()["origins"] == 2
+    cache.window("KGX", 600, 60, lambda: [])
+    assert cache.stats()["hits"] == 2
+
+
+def test_calling_points_load_once_for_index_rows():
+    cache = KnownServiceCache()
+    row = SimpleNamespace(
+        service_id="KGX-CBG-1000", origin="KGX", destination="CBG", destination_name="Cbg",
+        scheduled_departure="10:00", dep_min=600, operator=None, days_seen=WEEKDAYS,
+        stops=["FPK", "CBG"],
+    )
+    loads = []
+
+    def load(service_ids):
+        loads.append(service_ids)
+        return {sid: [{"crs": "CBG", "station_name": "Cbg", "scheduled_time": None}] for sid in service_ids}
+
+    records = cache.window("KGX", 600, 60, lambda: [ServiceRecord.from_row(row)])
+    assert records[0].calling_points is None and records[0].serves(["FPK"])
+
+    for _ in range(2):
+        filled = cache.with_calling_points("KGX", records, load)
+        assert filled[0].to_dict()["subsequent_calling_points"][0]["crs"] == "CBG"
+    assert loads == [["KGX-CBG-1000"]]
+
+
+def test_record_matches_known_service_dict():
+    record = _record("KGX-CBG-1000", 600)
+    assert record.serves(["CBG", "EDB"])
+    assert not record.serves(["EDB"])
+    assert record.to_dict()["subsequent_calling_points"][0]["crs"] == "CBG"
+    assert record.to_dict() is not record.to_dict()
@@ -0,0 +1,161 @@
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from zeep import AsyncClient, Client, Settings
+from zeep.exceptions import Fault, TransportError
+from zeep.transports import AsyncTransport
+
+from app.fake_ldbws.server import WSDL_PATH
+from app.services.ldbws_client import call_raw
+from app.services.ldbws_parser import (
+    parse_departure_board,
+    parse_departure_board_with_details,
+    raise_for_fault,
+)
+from app.services.train_service import TrainService
+
+FIXTURES = Path(__file__).parent / "fixtures" / "ldbws"
+WSDL = str(WSDL_PATH)
+
+
+def _fixture(name):
+    return (FIXTURES / name).read_bytes()
+
+
+def _zeep_parse(operation, content):
+    """Parse a recorded response the way the zeep client would."""
+    client = Client(
+        WSDL, settings=Settings(strict=False, xml_huge_tree=True)
+    )
+    binding = client.service._binding
+    response = SimpleNamespace(
+        status_code=200,
+        headers={"Content-Type": "text/xml; charset=utf-8"},
+        content=content,
+        encoding="utf-8",
+    )
+    return binding.process_reply(client, binding.get(operation), response)
+
+
+def test_parse_departure_board():
+    services = parse_departure_board(_fixture("GetDepartureBoard_KGX.xml"))
+
+    assert services == [
+        {
+            "destination": "EDB",
+            "destination_name": "Edinburgh",
+            "std": "08:30",
+            "etd": "On time",
+            "platform": "1",
+            "is_cancelled": None,
+            "delay_reason": None,
+            "cancel_reason": None,
+            "length": 9,
+        },
+        {
+            "destination": "CBG",
+            "destination_name": "Cambridge",
+            "std": "08:36",
+            "etd": "08:41",
+            "platform": "9",
+            "is_cancelled": None,
+            "delay_reason": "This train has been delayed by a late running train being in front of this one",
+            "cancel_reason": None,
+            "length": None,
+        },
+        {
+            "destination": "PBO",
+            "destination_name": "Peterborough",
+            "std": "08:48",
+            "etd": "Cancelled",
+            "platform": None,
+            "is_cancelled": True,
+            "delay_reason": None,
+            "cancel_reason": "This train has been cancelled because of a shortage of train crew",
+            "length": 8,
+        },
+    ]
+
+
+def test_parse_departure_board_with_details():
+    services = parse_departure_board_with_details(_fixture("GetDepBoardWithDetails_KGX.xml"))
+
+    assert [s["scheduled_departure"] for s in services] == ["08:30", "08:36"]
+    assert services[0] == {
+        "destination": "EDB",
+        "destination_name": "Edinburgh",
+        "scheduled_departure": "08:30",
+        "operator": "London North Eastern Railway",
+        "calling_points": [
+            {"crs": "PBO", "station_name": "Peterborough", "scheduled_time": "09:15"},
+            {"crs": "YRK", "station_name": "York", "scheduled_time": "10:21"},
+            {"crs": "EDB", "station_name": "Edinburgh", "scheduled_time": "12:49"},
+        ],
+    }
+    assert [p["crs"] for p in services[1]["calling_points"]] == ["FPK", "SVG", "CBG"]
+
+
+def test_parse_empty_board():
+    content = _fixture("GetDepartureBoard_KGX.xml")
+    start = content.index(b"<lt8:trainServices>")
+    end = content.index(b"</lt8:trainServices>") + len(b"</lt8:trainServices>")
+
+    assert parse_departure_board(content[:start] + content[end:]) == []
+
+
+def test_raise_for_fault():
+    with pytest.raises(Fault, match="Invalid crs code supplied"):
+        raise_for_fault(_fixture("Fault.xml"), 500)
+
+    with pytest.raises(TransportError):
+        raise_for_fault(b"Service Unavailable", 503)
+
+
+@pytest.mark.parametrize(
+    "fixture",
+    ["GetDepartureBoard_KGX.xml", "GetDepBoardWithDetails_KGX.xml"],
+)
+def test_matches_zeep_output(fixture):
+    content = _fixture(fixture)
+    if fixture.startswith("GetDepartureBoard"):
+        expected = TrainService._board_from_response(_zeep_parse("GetDepartureBoard", content))
+        assert parse_departure_board(content) == expected
+    else:
+        expected = TrainService._details_from_response(_zeep_parse("GetDepBoardWithDetails", content))
+        assert parse_departure_board_with_details(content) == expected
+
+
+def test_lxml_engine_fetches_raw_board():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=_fixture("GetDepartureBoard_KGX.xml"))
+
+    async def run():
+        transport = AsyncTransport(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = AsyncClient(WSDL, transport=transport)
+        service = TrainService(db=None, soap_client=client, parser="lxml")
+        return await service._fetch_departure_board("KGX", filter_crs="CBG")
+
+    services = asyncio.run(run())
+
+    assert [s["destination"] for s in services] == ["EDB", "CBG", "PBO"]
+    assert b"<ns0:filterCrs>CBG</ns0:filterCrs>" in requests[0].content
+    assert "GetDepartureBoard" in requests[0].headers["SOAPAction"]
+
+
+def test_call_raw_raises_soap_faults():
+    def handler(request):
+        return httpx.Response(500, content=_fixture("Fault.xml"))
+
+    async def run():
+        transport = AsyncTransport(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        client = AsyncClient(WSDL, transport=transport)
+        return await call_raw(client, "GetDepartureBoard", numRows=10, crs="XXX")
+
+    with pytest.raises(Fault):
+        asyncio.run(run())
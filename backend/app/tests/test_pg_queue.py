@@ -0,0 +1,204 @@
+import asyncio
+
+import psycopg2
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import simple_queue
+from app.core import config
+from app.db.crud.task_crud import enqueue_task
+from app.db.models import QueuedTask
+from app.exceptions import TaskQueueFull
+from app.pg_queue import LeaderLock, PostgresTaskManager, _libpq_dsn
+from app.simple_queue import async_task
+
+runs = []
+
+
+@async_task(key=lambda value, user_id: value)
+async def double(value, user_id):
+    runs.append(value)
+    await asyncio.sleep(0.05)
+    return value * 2
+
+
+@async_task
+def explode():
+    raise ValueError("boom")
+
+
+@pytest.fixture
+def session_factory():
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+    engine = create_engine(url)
+    yield sessionmaker(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.query(QueuedTask).delete()
+        db.commit()
+    engine.dispose()
+    runs.clear()
+
+
+def test_tasks_are_shared_between_managers(session_factory):
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+
+    async def scenario():
+        # Two managers stand in for two processes sharing the database
+        submitter = PostgresTaskManager(concurrency=1, session_factory=session_factory, dsn=url)
+        worker = PostgresTaskManager(concurrency=2, session_factory=session_factory, dsn=url)
+        await worker.start()
+        await submitter.start()
+        try:
+            first = await double(21, 1)
+            second = await double(21, 2)
+            failing = await explode()
+            result = await submitter.get_result(first, timeout=5)
+            failed = await worker.get_result(failing, timeout=5)
+            return first, second, result, failed
+        finally:
+            await submitter.stop()
+            await worker.stop()
+
+    first, second, result, failed = asyncio.run(scenario())
+
+    assert first == second
+    assert runs == [21]
+    assert result["status"] == "completed" and result["result"] == 42
+    assert result["queue_wait"] is not None
+    assert failed["status"] == "failed" and failed["result"]["detail"] == "boom"
+    assert simple_queue.task_backend is None
+
+
+def test_get_result_unknown_and_pending(session_factory):
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+
+    async def scenario():
+        manager = PostgresTaskManager(concurrency=1, session_factory=session_factory, dsn=url)
+        with pytest.raises(KeyError):
+            await manager.get_result("task_missing", timeout=0)
+
+        # Queued but no workers running
+        simple_queue.task_backend = manager
+        try:
+            task_id = await double(5, 1)
+        finally:
+            simple_queue.task_backend = None
+        with pytest.raises(TimeoutError):
+            await manager.get_result(task_id, timeout=0.05)
+
+    asyncio.run(scenario())
+
+
+def test_enqueue_refuses_when_queue_is_full(session_factory):
+    with session_factory() as db:
+        assert enqueue_task(db, "task_a", "f", {"args": [], "kwargs": {}}, max_queued=1)
+        # Already queued, so shared rather than refused
+        assert not enqueue_task(db, "task_a", "f", {"args": [], "kwargs": {}}, max_queued=1)
+        with pytest.raises(TaskQueueFull):
+            enqueue_task(db, "task_b", "f", {"args": [], "kwargs": {}}, max_queued=1)
+
+
+def test_enqueue_caps_each_owner(session_factory):
+    payload = {"args": [], "kwargs": {}}
+    with session_factory() as db:
+        assert enqueue_task(db, "task_a", "f", payload, 5, owner="1", max_per_owner=1)
+        # Sharing an active task is never refused
+        assert not enqueue_task(db, "task_a", "f", payload, 5, owner="1", max_per_owner=1)
+        with pytest.raises(TaskQueueFull) as refused:
+            enqueue_task(db, "task_b", "f", payload, 5, owner="1", max_per_owner=1)
+        assert refused.value.owner == "1"
+        assert enqueue_task(db, "task_c", "f", payload, 5, owner="2", max_per_owner=1)
+
+
+def test_handles_are_signed_per_user():
+    manager = PostgresTaskManager(concurrency=1)
+    handle = manager.issue_handle("task_abc", user_id=1)
+
+    assert manager.resolve_handle(handle, 1) == "task_abc"
+    with pytest.raises(KeyError):
+        manager.resolve_handle(handle, 2)
+    with pytest.raises(KeyError):
+        manager.resolve_handle("not-a-handle", 1)
+
+
+def test_lost_listener_polls_then_reconnects(session_factory, monkeypatch):
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+    monkeypatch.setattr(config, "TASK_POLL_INTERVAL", 0.1)
+    monkeypatch.setattr(config, "TASK_LISTEN_RETRY_MAX", 0.2)
+
+    async def scenario():
+        manager = PostgresTaskManager(concurrency=1, session_factory=session_factory, dsn=url)
+        await manager.start()
+        try:
+            first_pid = manager._listener.get_backend_pid()
+            with session_factory() as db:
+                db.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": first_pid})
+            for _ in range(50):
+                if manager._listener is None:
+                    break
+                await asyncio.sleep(0.02)
+            assert manager._listener is None
+
+            # Served by polling while the listener is down or coming back
+            result = await manager.get_result(await double(4, 1), timeout=5)
+            for _ in range(50):
+                if manager._listener is not None:
+                    break
+                await asyncio.sleep(0.05)
+            return result, first_pid, manager._listener.get_backend_pid()
+        finally:
+            await manager.stop()
+
+    result, first_pid, second_pid = asyncio.run(scenario())
+
+    assert result["status"] == "completed" and result["result"] == 8
+    assert second_pid != first_pid
+
+
+def test_reconnect_retries_any_listener_failure(session_factory, monkeypatch):
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+    monkeypatch.setattr(config, "TASK_LISTEN_RETRY_MAX", 0.05)
+    manager = PostgresTaskManager(concurrency=1, session_factory=session_factory, dsn=url)
+    connect = manager._connect_listener
+    failures = [psycopg2.InterfaceError("connection already closed"), OSError("bad fd")]
+
+    def flaky_connect():
+        if failures:
+            raise failures.pop(0)
+        return connect()
+
+    manager._connect_listener = flaky_connect
+
+    async def scenario():
+        try:
+            await asyncio.wait_for(manager._reconnect(), timeout=5)
+            return manager._listener is not None
+        finally:
+            manager._drop_listener()
+
+    assert asyncio.run(scenario())
+    assert failures == []
+
+
+def test_dsn_drops_the_driver_suffix():
+    url = "postgresql+psycopg2://user:secret@db:5432/app"
+
+    assert _libpq_dsn(url) == "postgresql://user:secret@db:5432/app"
+    assert PostgresTaskManager(dsn=url).dsn == LeaderLock(dsn=url).dsn == _libpq_dsn(url)
+
+
+def test_leader_lock_has_one_holder():
+    url = f"{config.SQLALCHEMY_DATABASE_URI}_test"
+    first, second = LeaderLock("test.leader", dsn=url), LeaderLock("test.leader", dsn=url)
+    try:
+        assert first.held()
+        assert first.held()
+        assert not second.held()
+
+        first.release()
+        assert second.held()
+        assert not first.held()
+    finally:
+        first.release()
+        second.release()
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from app.core.rail_time import (
+    SATURDAY,
+    WEEKDAYS,
+    day_bit,
+    day_type_mask,
+    format_hhmm,
+    minute_of_day,
+    normalise_crs,
+    parse_hhmm,
+    relative_minutes,
+    window_ranges,
+)
+
+
+def test_parse_and_format_round_trip():
+    assert parse_hhmm("00:00") == 0
+    assert parse_hhmm("23:59") == 1439
+    assert format_hhmm(parse_hhmm("07:05")) == "07:05"
+    assert format_hhmm(1445) == "00:05"
+    assert minute_of_day(datetime(2026, 1, 5, 13, 37)) == 817
+
+
+def test_relative_minutes_wraps_midnight():
+    assert relative_minutes(parse_hhmm("00:10"), parse_hhmm("23:50")) == 20
+    assert relative_minutes(parse_hhmm("23:50"), parse_hhmm("00:10")) == -20
+    assert relative_minutes(parse_hhmm("10:00"), parse_hhmm("10:00")) == 0
+
+
+def test_window_ranges_split_at_midnight():
+    assert window_ranges(600, 60) == [(600, 660)]
+    assert window_ranges(parse_hhmm("23:30"), 60) == [(1410, 1439), (0, 30)]
+
+
+def test_normalise_crs():
+    assert normalise_crs(" kgx ") == "KGX"
+
+
+def test_day_type_mask():
+    # 2026-01-05 is a Monday
+    assert day_bit(datetime(2026, 1, 5)) == 1
+    assert day_type_mask(datetime(2026, 1, 7)) == WEEKDAYS
+    assert day_type_mask(datetime(2026, 1, 10)) == SATURDAY
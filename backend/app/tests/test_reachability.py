@@ -0,0 +1,72 @@
+from app.services.reachability import ReachabilityIndex
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_unknown_terminus_is_not_unreachable():
+    index = ReachabilityIndex()
+    index.ensure_loaded("KGX", lambda: {"EDB": {"YRK", "EDB"}})
+
+    assert index.can_reach("KGX", "EDB", ["YRK"]) is True
+    assert index.can_reach("KGX", "EDB", ["CBG"]) is False
+    assert index.can_reach("KGX", "CBG", ["CBG"]) is None
+
+
+def test_record_extends_termini():
+    index = ReachabilityIndex()
+    index.record("KGX", "EDB", ["YRK", "EDB"])
+    index.record("KGX", "EDB", ["NCL", "EDB"])
+
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is True
+    assert index.can_reach("KGX", "EDB", ["EDB"]) is True
+    assert index.stats()["routes"] == 1
+
+
+def test_origins_reload_after_ttl():
+    clock = FakeClock()
+    index = ReachabilityIndex(ttl_seconds=60, timer=clock)
+    loads = []
+
+    def load():
+        loads.append(clock.now)
+        return {"EDB": {"YRK"}} if len(loads) == 1 else {"EDB": {"NCL"}}
+
+    index.ensure_loaded("KGX", load)
+    clock.now = 30
+    index.ensure_loaded("KGX", load)
+    assert index.can_reach("KGX", "EDB", ["YRK"]) is True
+
+    clock.now = 61
+    index.ensure_loaded("KGX", load)
+    assert loads == [0.0, 61]
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is True
+    assert index.stats()["loads"] == 2
+
+
+def test_stale_route_lets_one_departure_through_per_ttl():
+    clock = FakeClock()
+    index = ReachabilityIndex(ttl_seconds=60, timer=clock)
+    index.ensure_loaded("KGX", lambda: {"EDB": {"YRK"}})
+
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is False
+
+    clock.now = 61
+    index.ensure_loaded("KGX", lambda: {"EDB": {"YRK"}})
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is None
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is False
+
+    # The probed departure now calls at NCL
+    index.record("KGX", "EDB", ["NCL", "EDB"])
+    assert index.can_reach("KGX", "EDB", ["NCL"]) is True
+
+    clock.now = 100
+    assert index.can_reach("KGX", "EDB", ["CBG"]) is False
+    clock.now = 121
+    assert index.can_reach("KGX", "EDB", ["CBG"]) is None
+    assert index.stats()["probes"] == 2
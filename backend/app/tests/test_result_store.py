@@ -0,0 +1,49 @@
+from app.services.result_store import ResultStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(payload="x"):
+    return {"status": "completed", "result": payload}
+
+
+def test_ttl_expiry_leaves_tombstone():
+    clock = FakeClock()
+    store = ResultStore(ttl_seconds=10, timer=clock)
+    store.set("a", _record())
+
+    clock.now = 9
+    assert store.get("a") == _record()
+    clock.now = 10
+    assert store.get("a") is None
+    assert store.is_expired("a")
+    assert not store.is_expired("never")
+    assert store.stats()["expired"] == 1
+
+
+def test_count_and_byte_budgets_evict_oldest():
+    store = ResultStore(max_entries=2, max_bytes=10_000)
+    for task_id in ("a", "b", "c"):
+        store.set(task_id, _record())
+    assert "a" not in store and "b" in store and "c" in store
+
+    store.set("big", _record("y" * 9_960))
+    stats = store.stats()
+    assert "big" in store and len(store) == 1
+    assert stats["evicted"] == 3
+    assert stats["bytes"] <= 10_000
+
+
+def test_tombstones_are_bounded():
+    store = ResultStore(max_entries=1, max_tombstones=2)
+    for task_id in ("a", "b", "c", "d"):
+        store.set(task_id, _record())
+
+    assert not store.is_expired("a")
+    assert store.is_expired("b") and store.is_expired("c")
@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime
+
+from app.core import config
+from app.db import models
+from app.db.crud.profile_crud import get_favourite_origins
+from app import scheduler
+from app.scheduler import JourneyGraphRefresher, KnownServiceCompactor, prefetch_interval
+from app.services.journey_planner import JourneyPlanner
+
+
+def test_prefetch_interval_follows_time_of_day():
+    # 2024-03-04 is a Monday, 2024-03-09 a Saturday
+    assert prefetch_interval(datetime(2024, 3, 4, 8, 15)) == config.PREFETCH_PEAK_INTERVAL
+    assert prefetch_interval(datetime(2024, 3, 4, 13, 0)) == config.PREFETCH_OFFPEAK_INTERVAL
+    assert prefetch_interval(datetime(2024, 3, 9, 8, 15)) == config.PREFETCH_OFFPEAK_INTERVAL
+    assert prefetch_interval(datetime(2024, 3, 4, 3, 0)) == config.PREFETCH_NIGHT_INTERVAL
+
+
+def test_get_favourite_origins_is_distinct(test_db, test_user):
+    for origins, favourite in (
+        (["KGX", "STP"], True),
+        (["PAD"], False),
+    ):
+        profile = models.Profile(user_id=test_user.id, favourite=favourite)
+        profile.origins_list = origins
+        profile.destinations_list = ["CBG"]
+        test_db.add(profile)
+    other = models.User(email="other@email.com", hashed_password="x")
+    test_db.add(other)
+    test_db.commit()
+    profile = models.Profile(user_id=other.id, favourite=True)
+    profile.origins_list = ["KGX"]
+    test_db.add(profile)
+    test_db.commit()
+
+    assert get_favourite_origins(test_db) == ["KGX", "STP"]
+
+
+class FixedLeader:
+    def __init__(self, leading):
+        self.leading = leading
+
+    def held(self):
+        return self.leading
+
+
+def test_compactor_runs_only_on_the_leader(monkeypatch):
+    monkeypatch.setattr(config, "KNOWN_SERVICE_COMPACT_INTERVAL", 0.01)
+    cycles = []
+
+    async def scenario():
+        compactors = [
+            KnownServiceCompactor(leader=FixedLeader(leading))
+            for leading in (True, False)
+        ]
+        for compactor in compactors:
+            async def run_once(compactor=compactor):
+                cycles.append(compactor.leader.leading)
+            compactor.run_once = run_once
+            await compactor.start()
+        await asyncio.sleep(0.05)
+        for compactor in compactors:
+            await compactor.stop()
+
+    asyncio.run(scenario())
+
+    assert cycles and all(cycles)
+
+
+def test_journey_graph_refreshes_only_when_stale(monkeypatch):
+    planner = JourneyPlanner(ttl_seconds=60)
+    sessions = []
+
+    class FakeSession:
+        def close(self):
+            sessions.append("closed")
+
+    monkeypatch.setattr(scheduler, "journey_planner", planner)
+    monkeypatch.setattr(scheduler, "SessionLocal", FakeSession)
+    monkeypatch.setattr(scheduler, "load_timetable", lambda db: [])
+
+    refresher = JourneyGraphRefresher()
+    assert asyncio.run(refresher.run_once()) is True
+    assert asyncio.run(refresher.run_once()) is False
+    planner.invalidate()
+    assert asyncio.run(refresher.run_once()) is True
+    assert sessions == ["closed", "closed"]
@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+
+from app import simple_queue
+from app.exceptions import TaskQueueFull
+from app.simple_queue import Admission, AsyncTaskManager, async_task
+
+
+@pytest.fixture(autouse=True)
+def _fresh_queue(monkeypatch):
+    monkeypatch.setattr(simple_queue, "task_futures", {})
+    monkeypatch.setattr(simple_queue, "task_queue", asyncio.Queue())
+    monkeypatch.setattr(simple_queue, "admission", Admission(max_queued=100, max_per_owner=1))
+
+
+def test_get_result_wakes_waiters_on_completion():
+    release = None
+
+    @async_task
+    async def job(value):
+        await release.wait()
+        return value * 2
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        manager = AsyncTaskManager()
+        await manager.start()
+        try:
+            task_id = await job(21)
+            with pytest.raises(TimeoutError):
+                await manager.get_result(task_id, timeout=0)
+            with pytest.raises(TimeoutError):
+                await manager.get_result(task_id, timeout=0.01)
+
+            waiters = [asyncio.create_task(manager.get_result(task_id, timeout=5)) for _ in range(2)]
+            await asyncio.sleep(0)
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            release.set()
+            results = await asyncio.gather(*waiters)
+            # Delivered on completion, not on the next poll tick
+            assert loop.time() - started < 0.05
+            return results, await manager.get_result(task_id, timeout=0)
+        finally:
+            await manager.stop()
+
+    results, again = asyncio.run(scenario())
+
+    assert [r["result"] for r in results] == [42, 42]
+    assert again["status"] == "completed"
+    assert simple_queue.task_futures == {}
+
+
+def test_get_result_unknown_task():
+    async def scenario():
+        await AsyncTaskManager().get_result("missing", timeout=1)
+
+    with pytest.raises(KeyError):
+        asyncio.run(scenario())
+
+
+def test_get_result_reports_expired_results():
+    async def scenario():
+        manager = AsyncTaskManager()
+        manager.results.max_entries = 1
+        await manager._complete("old", {"status": "completed", "result": 1})
+        await manager._complete("new", {"status": "completed", "result": 2})
+        return await manager.get_result("old", timeout=0)
+
+    assert asyncio.run(scenario())["status"] == "expired"
+
+
+def test_workers_run_tasks_concurrently():
+    @async_task
+    async def slow(value):
+        await asyncio.sleep(0.1)
+        return value
+
+    async def scenario():
+        manager = AsyncTaskManager(concurrency=3)
+        await manager.start()
+        try:
+            started = asyncio.get_running_loop().time()
+            task_ids = [await slow(n) for n in range(4)]
+            results = [await manager.get_result(t, timeout=5) for t in task_ids]
+            return asyncio.get_running_loop().time() - started, results, manager.stats()
+        finally:
+            await manager.stop()
+
+    elapsed, results, stats = asyncio.run(scenario())
+
+    # Three run at once and the fourth waits for a free worker
+    assert 0.2 <= elapsed < 0.3
+    assert [r["result"] for r in results] == [0, 1, 2, 3]
+    assert results[3]["queue_wait"] >= 0.09
+    assert stats["workers"] == 3 and stats["completed"] == 4
+
+
+def test_identical_calls_share_one_task():
+    runs = []
+
+    @async_task(key=lambda origins, user_id: sorted(origins))
+    async def routes(origins, user_id):
+        runs.append(user_id)
+        await asyncio.sleep(0.05)
+        return origins
+
+    async def scenario():
+        manager = AsyncTaskManager(concurrency=2)
+        await manager.start()
+        try:
+            first = await routes(["KGX", "CBG"], 1)
+            second = await routes(["CBG", "KGX"], 2)
+            other = await routes(["KGX"], 1)
+            await manager.get_result(first, timeout=5)
+            await manager.get_result(other, timeout=5)
+            return first, second, other
+        finally:
+            await manager.stop()
+
+    first, second, other = asyncio.run(scenario())
+
+    assert first == second != other
+    assert runs == [1, 1]
+
+
+def test_handles_are_per_user():
+    manager = AsyncTaskManager()
+    handle = manager.issue_handle("task_abc", user_id=1)
+
+    assert handle != manager.issue_handle("task_abc", user_id=1)
+    assert manager.resolve_handle(handle, 1) == "task_abc"
+    with pytest.raises(KeyError):
+        manager.resolve_handle(handle, 2)
+
+
+def test_admission_replaces_and_bounds():
+    admission = Admission(max_queued=2, max_per_owner=2)
+
+    assert admission.admit("a", owner=1, slot="KGX") == []
+    assert admission.attach("a", owner=2, slot="KGX") == []
+    # User 1 asks for KGX again, but user 2 still wants "a"
+    assert admission.admit("b", owner=1, slot="KGX") == []
+    assert admission.depth() == 2
+    with pytest.raises(TaskQueueFull):
+        admission.admit("c", owner=3)
+
+    # User 2 replacing "a" frees its slot
+    assert admission.admit("c", owner=2, slot="KGX") == ["a"]
+    assert admission.was_cancelled("a") and not admission.start("a")
+    assert admission.start("b") and admission.depth() == 1
+    assert admission.stats()["rejected"] == 1
+
+
+def test_admission_caps_each_owner():
+    admission = Admission(max_queued=5, max_per_owner=2)
+
+    # Different journeys queue side by side up to the owner's cap
+    assert admission.admit("a", owner=1, slot="KGX") == []
+    assert admission.admit("b", owner=1, slot="STP") == []
+    with pytest.raises(TaskQueueFull) as refused:
+        admission.admit("c", owner=1, slot="EUS")
+    assert refused.value.owner == 1
+
+    # ...which leaves room in the shared queue for everyone else
+    assert admission.admit("d", owner=2, slot="KGX") == []
+    # Replacing a queued journey is always allowed
+    assert admission.admit("e", owner=1, slot="KGX") == ["a"]
+    assert admission.stats()["rejected_owner"] == 1
+
+
+def test_newer_request_cancels_older_queued_one():
+    @async_task(
+        key=lambda value, user_id: value,
+        owner=lambda value, user_id: user_id,
+        slot=lambda value, user_id: value[0]
+    )
+    async def routes(value, user_id):
+        return value
+
+    async def scenario():
+        manager = AsyncTaskManager(concurrency=1)
+        simple_queue.admission.max_queued = 2
+        older = await routes("old", 1)
+        waiter = asyncio.create_task(manager.get_result(older, timeout=5))
+        await asyncio.sleep(0)
+        newer = await routes("other", 1)
+        # The cancelled entry is dropped rather than left for a worker to skip
+        assert simple_queue.task_queue.qsize() == 1
+        assert simple_queue.admission.stats()["cancelled"] == 1
+        await routes("new", 2)
+        with pytest.raises(TaskQueueFull):
+            await routes("more", 3)
+
+        await manager.start()
+        try:
+            return await waiter, await manager.get_result(older, timeout=0), \
+                await manager.get_result(newer, timeout=5)
+        finally:
+            await manager.stop()
+
+    woken, later, newer = asyncio.run(scenario())
+
+    assert woken["status"] == later["status"] == "cancelled"
+    assert newer["result"] == "other"
@@ -0,0 +1,55 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_fetch():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["board"]
+
+    async def run():
+        return await asyncio.gather(
+            *(flights.do(("GetDepartureBoard", "KGX", 0, 60), fetch) for _ in range(5))
+        )
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+
+def test_different_keys_fetch_separately():
+    flights = SingleFlight("test")
+
+    async def run():
+        return await asyncio.gather(
+            flights.do("KGX", lambda: asyncio.sleep(0, result="KGX")),
+            flights.do("PAD", lambda: asyncio.sleep(0, result="PAD")),
+        )
+
+    assert asyncio.run(run()) == ["KGX", "PAD"]
+    assert flights.started == 2
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            flights.do("KGX", fail), flights.do("KGX", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert "KGX" not in flights
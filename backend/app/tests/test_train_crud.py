@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.core.rail_time import SATURDAY
+from app.db.crud.train_crud import (
+    bulk_upsert_services,
+    delete_stale_services,
+    get_calling_points,
+    get_origin_services,
+    mark_services_seen,
+)
+from app.db.models import KnownService, ServiceCallingPoint
+
+
+def _row(service_id, stops, operator="Test Rail"):
+    return {
+        "service_id": service_id,
+        "origin": "KGX",
+        "destination": stops[-1],
+        "destination_name": stops[-1].title(),
+        "scheduled_departure": "10:00",
+        "calling_points": [
+            {"crs": stop, "station_name": stop.title(), "scheduled_time": "10:30"}
+            for stop in stops
+        ],
+        "operator": operator,
+    }
+
+
+def test_bulk_upsert_inserts_batch(test_db):
+    written = bulk_upsert_services(test_db, [
+        _row("KGX-EDB-1000", ["YRK", "EDB"]),
+        _row("KGX-CBG-1000", ["CBG"]),
+    ])
+
+    assert sorted(written) == ["KGX-CBG-1000", "KGX-EDB-1000"]
+    assert test_db.query(KnownService).count() == 2
+
+
+def test_bulk_upsert_skips_unchanged_rows(test_db):
+    bulk_upsert_services(test_db, [
+        _row("KGX-EDB-1000", ["YRK", "EDB"]),
+        _row("KGX-CBG-1000", ["CBG"]),
+    ])
+
+    written = bulk_upsert_services(test_db, [
+        _row("KGX-EDB-1000", ["PBO", "YRK", "EDB"]),
+        _row("KGX-CBG-1000", ["CBG"]),
+    ])
+
+    assert written == ["KGX-EDB-1000"]
+    service = test_db.query(KnownService).filter_by(service_id="KGX-EDB-1000").one()
+    test_db.refresh(service)
+    assert [p["crs"] for p in service.calling_points] == ["PBO", "YRK", "EDB"]
+
+
+def test_bulk_upsert_collapses_duplicates(test_db):
+    written = bulk_upsert_services(test_db, [
+        _row("KGX-EDB-1000", ["YRK", "EDB"]),
+        _row("KGX-EDB-1000", ["YRK", "EDB"], operator="LNER"),
+    ])
+
+    assert written == ["KGX-EDB-1000"]
+    assert test_db.query(KnownService).one().operator == "LNER"
+    assert bulk_upsert_services(test_db, []) == []
+
+
+def test_get_origin_services(test_db):
+    bulk_upsert_services(test_db, [
+        _row("KGX-EDB-1000", ["YRK", "EDB"]),
+        _row("KGX-CBG-1000", ["CBG"]),
+    ])
+
+    rows = {r.service_id: r for r in get_origin_services(test_db, "KGX")}
+    assert set(rows) == {"KGX-EDB-1000", "KGX-CBG-1000"}
+    # Stops come from the calling point index, without the JSON column
+    assert sorted(rows["KGX-EDB-1000"].stops) == ["EDB", "YRK"]
+    assert not hasattr(rows["KGX-EDB-1000"], "calling_points")
+
+    points = get_calling_points(test_db, ["KGX-CBG-1000"])
+    assert [p["crs"] for p in points["KGX-CBG-1000"]] == ["CBG"]
+    assert get_calling_points(test_db, []) == {}
+
+
+def test_calling_point_index_follows_upserts(test_db):
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])])
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["PBO", "EDB"])])
+
+    points = test_db.query(ServiceCallingPoint).order_by(ServiceCallingPoint.seq).all()
+    assert [(p.seq, p.crs) for p in points] == [(0, "PBO"), (1, "EDB")]
+
+
+# 2026-01-05 is a Monday, 2026-01-10 a Saturday
+MONDAY = datetime(2026, 1, 5, 9, 30)
+SATURDAY_MORNING = datetime(2026, 1, 10, 9, 30)
+
+
+def _service(test_db, service_id):
+    service = test_db.query(KnownService).filter_by(service_id=service_id).one()
+    test_db.refresh(service)
+    return service
+
+
+def test_changed_calling_points_reset_days_seen(test_db):
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])], seen_at=MONDAY)
+    tuesday = MONDAY + timedelta(days=1)
+    assert bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])], seen_at=tuesday)
+    assert _service(test_db, "KGX-EDB-1000").days_seen == 0b11
+
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["EDB"])], seen_at=SATURDAY_MORNING)
+    service = _service(test_db, "KGX-EDB-1000")
+    assert service.days_seen == SATURDAY
+    assert service.last_seen_at == SATURDAY_MORNING
+
+
+def test_seen_bump_keeps_calling_point_index(test_db):
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])], seen_at=MONDAY)
+    before = test_db.execute(text("SELECT ctid FROM service_calling_points ORDER BY seq")).scalars().all()
+
+    tuesday = MONDAY + timedelta(days=1)
+    assert bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])], seen_at=tuesday)
+
+    after = test_db.execute(text("SELECT ctid FROM service_calling_points ORDER BY seq")).scalars().all()
+    assert after == before
+
+
+def test_mark_services_seen_once_per_day(test_db):
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["EDB"])], seen_at=MONDAY)
+
+    assert mark_services_seen(test_db, ["KGX-EDB-1000"], MONDAY + timedelta(hours=1)) == 0
+    assert mark_services_seen(test_db, ["KGX-EDB-1000"], SATURDAY_MORNING) == 1
+    assert _service(test_db, "KGX-EDB-1000").days_seen == 1 | SATURDAY
+
+
+def test_delete_stale_services(test_db):
+    bulk_upsert_services(test_db, [_row("KGX-EDB-1000", ["YRK", "EDB"])], seen_at=MONDAY)
+    bulk_upsert_services(test_db, [_row("KGX-CBG-1000", ["CBG"])], seen_at=SATURDAY_MORNING)
+
+    assert delete_stale_services(test_db, MONDAY + timedelta(days=1), batch_size=1) == 1
+    assert [s.service_id for s in test_db.query(KnownService)] == ["KGX-CBG-1000"]
+    assert {p.service_id for p in test_db.query(ServiceCallingPoint)} == {"KGX-CBG-1000"}
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.api_v1.routers import train
+from app.simple_queue import run_in_thread
+
+
+class FakeSession:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_stream_disconnect_waits_for_thread_work(monkeypatch):
+    db = FakeSession()
+    started, release = threading.Event(), threading.Event()
+    seen = []
+
+    def query():
+        started.set()
+        release.wait(5)
+        seen.append(db.closed)
+
+    class FakeTrainService:
+        async def get_train_routes(self, origins, destinations, force_fetch, on_progress):
+            await on_progress([{"service_id": "KGX-CBG-1000"}])
+            await run_in_thread(query)
+            return []
+
+    async def create_train_service(session):
+        return FakeTrainService()
+
+    monkeypatch.setattr(train, "SessionLocal", lambda: db)
+    monkeypatch.setattr(train, "create_train_service", create_train_service)
+
+    async def scenario():
+        response = await train.stream_train_routes(
+            origins=["KGX"], destinations=["CBG"], forceFetch=False,
+            current_user=SimpleNamespace(id=1)
+        )
+        body = response.body_iterator
+        assert (await body.__anext__()).startswith("event: routes")
+        await run_in_thread(started.wait, 5)
+
+        # The client goes away while the query still holds the session
+        await body.aclose()
+        await asyncio.sleep(0.05)
+        assert not db.closed
+        release.set()
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+    assert seen == [False]
+    assert db.closed
+
+
+def test_route_requests_replace_only_the_same_journey():
+    owner, slot = train.routes_task_owner, train.routes_task_slot
+
+    assert owner(["KGX"], ["CBG"], False, 1) == owner(["KGX"], ["EDB"], False, 1) == 1
+    assert slot(["kgx", "STP"], ["CBG"], False, 1) == slot(["STP", "KGX"], ["cbg"], True, 2)
+    assert slot(["KGX"], ["CBG"], False, 1) != slot(["KGX"], ["EDB"], False, 1)
+
+
+def test_stream_refuses_beyond_the_concurrency_limit(monkeypatch):
+    release = asyncio.Event()
+
+    class FakeTrainService:
+        async def get_train_routes(self, origins, destinations, force_fetch, on_progress):
+            await release.wait()
+            return []
+
+    async def create_train_service(session):
+        return FakeTrainService()
+
+    monkeypatch.setattr(train, "SessionLocal", FakeSession)
+    monkeypatch.setattr(train, "create_train_service", create_train_service)
+    monkeypatch.setattr(train, "stream_slots", asyncio.Semaphore(1))
+
+    async def scenario():
+        user = SimpleNamespace(id=1)
+        await train.stream_train_routes(
+            origins=["KGX"], destinations=["CBG"], forceFetch=False, current_user=user
+        )
+        with pytest.raises(HTTPException) as refused:
+            await train.stream_train_routes(
+                origins=["KGX"], destinations=["CBG"], forceFetch=False, current_user=user
+            )
+
+        release.set()
+        pending = asyncio.all_tasks() - {asyncio.current_task()}
+        await asyncio.gather(*pending)
+        # The slot is returned once the first stream's work is done
+        assert not train.stream_slots.locked()
+        return refused.value
+
+    refused = asyncio.run(scenario())
+
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == str(train.config.STREAM_RETRY_AFTER)
@@ -0,0 +1,322 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytz
+from sqlalchemy import event
+
+from app.db.models import KnownService
+from app.services.train_service import (
+    TrainService,
+    board_cache,
+    known_service_cache,
+    reachability_index,
+    revalidation_tasks,
+    seen_tracker,
+)
+
+
+def _location(crs):
+    return SimpleNamespace(location=[SimpleNamespace(crs=crs, locationName=crs.title())])
+
+
+class FakeService:
+    """Stand-in for the zeep service proxy with a fixed timetable."""
+
+    def __init__(self, timetable):
+        # {origin: [(std, destination, [calling point crs, ...]), ...]}
+        self.timetable = timetable
+        self.calls = []
+
+    def _services(self, crs, with_details, offset=0, window=120, rows=150, filter_crs=None):
+        now = datetime.now(pytz.timezone("Europe/London"))
+        now_mins = now.hour * 60 + now.minute
+        services = []
+        for std, destination, stops in self.timetable.get(crs, []):
+            hours, minutes = std.split(":")
+            if not offset <= (int(hours) * 60 + int(minutes) - now_mins) % 1440 <= offset + window:
+                continue
+            if filter_crs and filter_crs not in stops:
+                continue
+            if len(services) == rows:
+                break
+            service = SimpleNamespace(
+                std=std,
+                etd="On time",
+                platform="1",
+                isCancelled=None,
+                delayReason=None,
+                cancelReason=None,
+                length=None,
+                operator="Test Rail",
+                destination=_location(destination),
+            )
+            if with_details:
+                points = [
+                    SimpleNamespace(crs=stop, locationName=stop.title(), st=std)
+                    for stop in stops
+                ]
+                service.subsequentCallingPoints = SimpleNamespace(
+                    callingPointList=[SimpleNamespace(callingPoint=points)]
+                )
+            services.append(service)
+        return SimpleNamespace(trainServices=SimpleNamespace(service=services))
+
+    async def GetDepartureBoard(self, numRows, crs, timeOffset, timeWindow, filterCrs=None, filterType=None):
+        self.calls.append(("GetDepartureBoard", crs, timeOffset, filterCrs))
+        return self._services(crs, False, timeOffset, timeWindow, numRows, filterCrs)
+
+    async def GetDepBoardWithDetails(self, numRows, crs, timeOffset, timeWindow, filterCrs=None, filterType=None):
+        self.calls.append(("GetDepBoardWithDetails", crs, timeOffset, filterCrs))
+        return self._services(crs, True, timeOffset, timeWindow, numRows, filterCrs)
+
+
+def _timetable():
+    now = datetime.now(pytz.timezone("Europe/London"))
+    soon = [(now + timedelta(minutes=m)).strftime("%H:%M") for m in (5, 10, 15)]
+    return {
+        "KGX": [
+            (soon[0], "EDB", ["PBO", "YRK", "EDB"]),
+            (soon[1], "CBG", ["FPK", "CBG"]),
+        ],
+        "STP": [
+            (soon[2], "SHF", ["LEI", "SHF"]),
+        ],
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_board_cache():
+    board_cache.cache.clear()
+    reachability_index.clear()
+    seen_tracker.clear()
+    known_service_cache.clear()
+
+
+def _service(test_db, concurrent):
+    soap_client = SimpleNamespace(service=FakeService(_timetable()))
+    return TrainService(test_db, soap_client, concurrent=concurrent)
+
+
+def test_get_train_routes_concurrent_matches_sequential(test_db):
+    sequential = asyncio.run(_service(test_db, concurrent=False).get_train_routes(
+        ["KGX", "STP"], ["YRK", "SHF"], force_fetch=True
+    ))
+    concurrent = asyncio.run(_service(test_db, concurrent=True).get_train_routes(
+        ["KGX", "STP"], ["YRK", "SHF"], force_fetch=True
+    ))
+
+    assert [s["destination"] for s in sequential] == ["EDB", "SHF"]
+    assert concurrent == sequential
+
+
+def test_get_train_routes_uses_known_services(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    service.soap_client.service.calls.clear()
+
+    board_cache.cache.clear()
+    result = asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+
+    assert [s["destination"] for s in result] == ["CBG"]
+    assert [c[0] for c in service.soap_client.service.calls] == ["GetDepartureBoard"]
+
+
+def test_get_train_routes_serves_boards_from_cache(test_db):
+    service = _service(test_db, concurrent=True)
+    first = asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    service.soap_client.service.calls.clear()
+
+    second = asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+
+    assert second == first
+    assert service.soap_client.service.calls == []
+
+
+def test_prefetch_origins_stores_unknown_services(test_db):
+    service = _service(test_db, concurrent=True)
+
+    upstream_calls = asyncio.run(service.prefetch_origins(["KGX", "STP"]))
+
+    # One board and one detail call per origin
+    assert upstream_calls == 4
+    assert test_db.query(KnownService).count() == 3
+    assert ("GetDepartureBoard", "KGX", 0, 60, None) in board_cache.cache
+
+
+def test_get_train_routes_plans_detail_calls(test_db):
+    now = datetime.now(pytz.timezone("Europe/London"))
+    # 12 departures two minutes apart need two 10-row calls between them
+    timetable = {
+        "MAN": [
+            ((now + timedelta(minutes=2 + 2 * i)).strftime("%H:%M"), "LIV", ["WAR", "LIV"])
+            for i in range(12)
+        ]
+    }
+    soap_client = SimpleNamespace(service=FakeService(timetable))
+    service = TrainService(test_db, soap_client)
+
+    result = asyncio.run(service.get_train_routes(["MAN"], ["WAR"], force_fetch=True))
+
+    detail_calls = [c for c in soap_client.service.calls if c[0] == "GetDepBoardWithDetails"]
+    assert len(result) == 12
+    assert len(detail_calls) == 2
+    assert service.upstream_calls == 3
+
+
+def test_get_train_routes_filters_boards_for_few_destinations(test_db):
+    service = _service(test_db, concurrent=True)
+
+    result = asyncio.run(service.get_train_routes(["KGX"], ["YRK"], force_fetch=True))
+
+    calls = service.soap_client.service.calls
+    assert [s["destination"] for s in result] == ["EDB"]
+    assert {c[3] for c in calls} == {"YRK"}
+    assert len(calls) == 2
+
+
+def test_get_train_routes_prefers_warm_unfiltered_board(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.prefetch_origins(["KGX"]))
+    service.soap_client.service.calls.clear()
+
+    result = asyncio.run(service.get_train_routes(["KGX"], ["YRK"]))
+
+    assert [s["destination"] for s in result] == ["EDB"]
+    assert service.soap_client.service.calls == []
+
+
+def test_get_train_routes_skips_unreachable_termini(test_db):
+    service = _service(test_db, concurrent=True)
+    destinations = ["YRK", "NCL", "DON"]
+    asyncio.run(service.get_train_routes(["KGX"], destinations))
+
+    # A new Cambridge departure cannot reach York, so needs no details
+    later = (datetime.now(pytz.timezone("Europe/London")) + timedelta(minutes=20)).strftime("%H:%M")
+    service.soap_client.service.timetable["KGX"].append((later, "CBG", ["FPK", "CBG"]))
+    service.soap_client.service.calls.clear()
+    board_cache.cache.clear()
+
+    result = asyncio.run(service.get_train_routes(["KGX"], destinations))
+
+    assert [s["destination"] for s in result] == ["EDB"]
+    assert [c[0] for c in service.soap_client.service.calls] == ["GetDepartureBoard"]
+    assert reachability_index.stats()["skips"] == 1
+
+
+def test_warm_requests_skip_the_database(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(test_db.get_bind(), "before_cursor_execute", listener)
+    try:
+        board_cache.cache.clear()
+        result = asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    finally:
+        event.remove(test_db.get_bind(), "before_cursor_execute", listener)
+
+    assert [s["destination"] for s in result] == ["CBG"]
+    assert statements == []
+
+
+def test_get_train_routes_reports_progress(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    updates = []
+
+    async def on_progress(services):
+        updates.append([s["destination"] for s in services])
+
+    result = asyncio.run(service.get_train_routes(["KGX", "STP"], ["CBG", "SHF"], on_progress=on_progress))
+
+    # Known KGX services arrive before STP's details have been fetched
+    assert updates == [["CBG"], ["CBG", "SHF"]]
+    assert [s["destination"] for s in result] == updates[-1]
+
+
+def test_progress_does_not_wait_for_slower_origins(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    board_cache.cache.clear()
+    fake = service.soap_client.service
+    fetch_board = fake.GetDepartureBoard
+    updates = []
+
+    async def scenario():
+        stp_released = asyncio.Event()
+
+        async def slow_board(**params):
+            if params["crs"] == "STP":
+                await stp_released.wait()
+            return await fetch_board(**params)
+
+        async def on_progress(services):
+            updates.append([s["destination"] for s in services])
+            stp_released.set()
+
+        fake.GetDepartureBoard = slow_board
+        return await asyncio.wait_for(
+            service.get_train_routes(["KGX", "STP"], ["CBG", "SHF"], on_progress=on_progress),
+            timeout=5
+        )
+
+    result = asyncio.run(scenario())
+
+    # STP's board is held until KGX's known services have been reported
+    assert updates == [["CBG"], ["CBG", "SHF"]]
+    assert [s["destination"] for s in result] == ["CBG", "SHF"]
+
+
+def test_details_do_not_wait_for_slower_origins(test_db):
+    service = _service(test_db, concurrent=True)
+    fake = service.soap_client.service
+    fetch_board = fake.GetDepartureBoard
+    updates = []
+
+    async def scenario():
+        stp_released = asyncio.Event()
+
+        async def slow_board(**params):
+            if params["crs"] == "STP":
+                await stp_released.wait()
+            return await fetch_board(**params)
+
+        async def on_progress(services):
+            updates.append([s["destination"] for s in services])
+            stp_released.set()
+
+        fake.GetDepartureBoard = slow_board
+        return await asyncio.wait_for(
+            service.get_train_routes(["KGX", "STP"], ["CBG", "SHF"], on_progress=on_progress),
+            timeout=5
+        )
+
+    result = asyncio.run(scenario())
+
+    # Cold KGX details are fetched and reported while STP's board is held
+    assert updates == [["CBG"], ["CBG", "SHF"]]
+    assert [s["destination"] for s in result] == ["CBG", "SHF"]
+
+
+def test_stale_boards_revalidate_in_the_background(test_db):
+    service = _service(test_db, concurrent=True)
+    asyncio.run(service.get_train_routes(["KGX"], ["CBG"]))
+    # Age every cached board past its TTL but within the stale period
+    for key, (value, stored_at) in list(board_cache.cache.items()):
+        board_cache.cache[key] = (value, stored_at - board_cache.ttl)
+
+    async def scenario():
+        result = await service.get_train_routes(["KGX"], ["CBG"])
+        await asyncio.gather(*revalidation_tasks)
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert [s["destination"] for s in result] == ["CBG"]
+    assert service.upstream_calls == 0
+    assert service.revalidation_calls == 1
+    assert not revalidation_tasks
@@ -0,0 +1,363 @@
+# benchmarks/train_routes.py
+"""End-to-end benchmarks for the train routes hot path.
+
+Runs TrainService.get_train_routes and the /train_routes/ -> task_status/{id}/wait
+flow against the local LDBWS stand-in and a scratch database, then
+compares the run with a saved baseline:
+
+    python -m benchmarks.train_routes
+    python -m benchmarks.train_routes --save-baseline
+    python -m benchmarks.train_routes --quick --fail-on-regression
+
+Latency depends on the machine, so save a baseline on the machine you
+compare on. Upstream calls and DB round trips only move with the
+timetable seed and the time of day, so they get a tighter tolerance.
+Only p50 and those counts are gated: p95/p99 over a few iterations are
+the slowest sample, and allocation peaks swing with how pool threads
+overlap, so those columns are for reading rather than failing a run.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, NamedTuple
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy_utils import create_database, database_exists, drop_database
+from zeep import AsyncClient, Settings
+from zeep.transports import AsyncTransport
+
+from app.core import config
+from app.core.auth import get_current_active_user
+from app.core.state import app_state
+from app.db.models import KnownService
+from app.db.session import Base
+from app.fake_ldbws.server import FakeSettings, WSDL_PATH, create_app
+from app.main import app
+from app.services import ldbws_client
+from app.services.train_service import (
+    TrainService,
+    board_cache,
+    known_service_cache,
+    reachability_index,
+    seen_tracker,
+)
+from app.simple_queue import AsyncTaskManager
+import app.api.api_v1.routers.train as train_router
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+ORIGINS = ["KGX", "STP", "EUS", "PAD", "LST"]
+DESTINATIONS = [
+    "FPK", "SVG", "HIT", "CBG", "PBO", "YRK", "NCL", "EDB", "LDS", "DON",
+    "SHF", "LEI", "NOT", "BHM", "MAN", "LIV", "CRE", "RDG", "BRI", "OXF",
+]
+ORIGIN_COUNTS = (1, 3, 5)
+DESTINATION_COUNTS = (1, 5, 20)
+QUICK_ORIGIN_COUNTS = (1, 5)
+QUICK_DESTINATION_COUNTS = (1, 20)
+
+
+class Scenario(NamedTuple):
+    flow: str  # 'service' or 'api'
+    origins: int
+    destinations: int
+    # 'cold': empty known_services; 'warm': seeded table, cold process caches;
+    # 'hot': seeded table and in-process caches primed by an earlier request
+    known: str
+    force_fetch: bool
+
+    @property
+    def name(self) -> str:
+        force = "force" if self.force_fetch else "cached"
+        return f"{self.flow}/o{self.origins}/d{self.destinations}/{self.known}/{force}"
+
+
+def scenarios(quick: bool, flows: List[str]) -> List[Scenario]:
+    origin_counts = QUICK_ORIGIN_COUNTS if quick else ORIGIN_COUNTS
+    destination_counts = QUICK_DESTINATION_COUNTS if quick else DESTINATION_COUNTS
+    return [
+        Scenario(flow, o, d, known, force)
+        for flow in flows
+        for o in origin_counts
+        for d in destination_counts
+        for known in ("cold", "warm", "hot")
+        for force in (False, True)
+    ]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+class Harness:
+    """Fake upstream, scratch database and counters shared by all scenarios."""
+
+    def __init__(self, latency_ms: float, seed: int):
+        self.db_url = f"{config.SQLALCHEMY_DATABASE_URI}_bench"
+        if database_exists(self.db_url):
+            drop_database(self.db_url)
+        create_database(self.db_url)
+        self.engine = create_engine(self.db_url)
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        self.db_round_trips = 0
+        event.listen(self.engine, "before_cursor_execute", self._count_round_trip)
+
+        settings = FakeSettings()
+        settings.latency_ms = latency_ms
+        settings.jitter_ms = settings.error_rate = 0
+        settings.recordings = settings.token = None
+        settings.seed = seed
+        self.fake_app = create_app(settings)
+        self.soap_client = AsyncClient(
+            str(WSDL_PATH),
+            settings=Settings(strict=False, xml_huge_tree=True),
+            transport=AsyncTransport(client=httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=self.fake_app),
+                base_url="http://localhost:8081",
+            )),
+        )
+
+    def _count_round_trip(self, *args):
+        self.db_round_trips += 1
+
+    @property
+    def upstream_calls(self) -> int:
+        return sum(self.fake_app.state.calls.values())
+
+    def close(self):
+        self.engine.dispose()
+        drop_database(self.db_url)
+
+    def reset_known_services(self):
+        with self.Session() as db:
+            db.query(KnownService).delete()
+            db.commit()
+
+    async def seed_known_services(self, origins: List[str]):
+        """Store details for every departure currently on the origins' boards."""
+        with self.Session() as db:
+            await TrainService(db, self.soap_client).prefetch_origins(origins)
+
+    async def run_service(self, scenario: Scenario, origins, destinations):
+        with self.Session() as db:
+            service = TrainService(db, self.soap_client)
+            return await service.get_train_routes(origins, destinations, scenario.force_fetch)
+
+    async def run_api(self, client: httpx.AsyncClient, scenario: Scenario, origins, destinations):
+        response = await client.get("/api/v1/train/train_routes/", params={
+            "origins[]": origins,
+            "destinations[]": destinations,
+            "forceFetch": str(scenario.force_fetch).lower(),
+        })
+        task_id = response.json()["task_id"]
+        while True:
+            status = await client.get(f"/api/v1/train/train_routes/task_status/{task_id}/wait")
+            body = status.json()
+            if body.get("status") != "pending":
+                return body
+
+
+async def measure(
+        harness: Harness,
+        scenario: Scenario,
+        run: Callable,
+        iterations: int,
+        alloc_iterations: int
+) -> Dict[str, float]:
+    """Time one scenario; the database and in-process caches are reset per call."""
+    origins = ORIGINS[:scenario.origins]
+    destinations = DESTINATIONS[:scenario.destinations]
+
+    async def prepare():
+        board_cache.cache.clear()
+        reachability_index.clear()
+        known_service_cache.clear()
+        seen_tracker.clear()
+        harness.reset_known_services()
+        if scenario.known in ("warm", "hot"):
+            await harness.seed_known_services(origins)
+        if scenario.known == "hot":
+            await run(scenario, origins, destinations)
+        board_cache.cache.clear()
+
+    latencies, upstream, round_trips = [], [], []
+    for _ in range(iterations):
+        await prepare()
+        calls, trips = harness.upstream_calls, harness.db_round_trips
+        started = time.perf_counter()
+        await run(scenario, origins, destinations)
+        latencies.append((time.perf_counter() - started) * 1000)
+        upstream.append(harness.upstream_calls - calls)
+        round_trips.append(harness.db_round_trips - trips)
+
+    # tracemalloc slows everything down, so allocations get their own pass
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            await prepare()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await run(scenario, origins, destinations)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - before) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "upstream_calls": round(statistics.mean(upstream), 2),
+        "db_round_trips": round(statistics.mean(round_trips), 2),
+        "peak_alloc_kib": round(statistics.median(peaks), 1) if peaks else None,
+    }
+
+
+async def run_benchmarks(args) -> Dict[str, Dict[str, float]]:
+    harness = Harness(latency_ms=args.latency_ms, seed=args.seed)
+    results = {}
+
+    # The API flow runs the real router and task manager in this event loop
+    app.dependency_overrides[get_current_active_user] = lambda: SimpleNamespace(id=1)
+    ldbws_client._client = harness.soap_client
+    train_router.SessionLocal = harness.Session
+    app_state.task_manager = AsyncTaskManager()
+    await app_state.task_manager.start()
+    api_client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    )
+
+    runners = {
+        "service": harness.run_service,
+        "api": lambda *a: harness.run_api(api_client, *a),
+    }
+    try:
+        for scenario in scenarios(args.quick, args.flows):
+            if args.filter and args.filter not in scenario.name:
+                continue
+            results[scenario.name] = await measure(
+                harness, scenario, runners[scenario.flow],
+                args.iterations, args.alloc_iterations
+            )
+            print(format_row(scenario.name, results[scenario.name]), flush=True)
+    finally:
+        await api_client.aclose()
+        await app_state.task_manager.stop()
+        app.dependency_overrides.pop(get_current_active_user, None)
+        ldbws_client._client = None
+        harness.close()
+    return results
+
+
+COLUMNS = ("p50_ms", "p95_ms", "p99_ms", "upstream_calls", "db_round_trips", "peak_alloc_kib")
+COUNT_METRICS = ("upstream_calls", "db_round_trips")
+GATED_METRICS = ("p50_ms",) + COUNT_METRICS
+
+
+def format_row(name: str, metrics: Dict[str, float]) -> str:
+    return f"{name:<36}" + "".join(f"{metrics.get(c)!s:>16}" for c in COLUMNS)
+
+
+def compare(
+        results: Dict[str, Dict[str, float]],
+        baseline: Dict[str, Dict[str, float]],
+        tolerance: float,
+        count_tolerance: float
+) -> List[str]:
+    """Return a line per gated metric that regressed against the baseline."""
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for column in GATED_METRICS:
+            now, then = metrics.get(column), previous.get(column)
+            if now is None or then is None:
+                continue
+            allowed = count_tolerance if column in COUNT_METRICS else tolerance
+            limit = then * (1 + allowed)
+            if now > limit:
+                change = f"{(now - then) / then:+.0%}" if then else "new"
+                regressions.append(f"{name} {column}: {then} -> {now} ({change})")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--alloc-iterations", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="simulated upstream latency per SOAP call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--flows", nargs="+", default=["service", "api"],
+                        choices=["service", "api"])
+    parser.add_argument("--quick", action="store_true", help="smaller scenario grid")
+    parser.add_argument("--filter", help="only run scenarios whose name contains this")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative slowdown of p50 latency")
+    parser.add_argument("--count-tolerance", type=float, default=0.1,
+                        help="allowed relative increase in upstream calls and DB round trips")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Per-call info logs would dominate the measurements
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print(f"{'scenario':<36}" + "".join(f"{c:>16}" for c in COLUMNS))
+    results = asyncio.run(run_benchmarks(args))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "meta": {
+                "saved_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "latency_ms": args.latency_ms,
+                "seed": args.seed,
+                "iterations": args.iterations,
+            },
+            "results": results,
+        }, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare(
+        results, baseline["results"], args.tolerance, args.count_tolerance
+    )
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1 if args.fail_on_regression else 0
+
+    print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,15 +28,18 @@ export const fetchTrains = async (
   }
 };
 
+// Long-polls: the server holds each request until the task finishes or waitSeconds pass
 const pollTaskStatus = async (
   taskId: string, 
-  maxAttempts = 30
+  maxAttempts = 3,
+  waitSeconds = 10
 ): Promise<Train[]> => {
   let attempts = 0;
   while (attempts < maxAttempts) {
     try {
       const response = await axiosInstance.get<TaskResponse>(
-        `/api/v1/train/train_routes/task_status/${taskId}`
+        `/api/v1/train/train_routes/task_status/${taskId}/wait`,
+        { params: { timeout: waitSeconds } }
       );
 
       console.log("Task status: ", response.data.status);
@@ -49,7 +52,14 @@ const pollTaskStatus = async (
         throw new Error(response.data.error);
       }
 
-      await new Promise(resolve => setTimeout(resolve, 1000));
+      if (response.data.status === 'expired') {
+        throw new Error('Task result expired');
+      }
+
+      if (response.data.status === 'cancelled') {
+        throw new Error('Request replaced by a newer one');
+      }
+
       attempts++;
       
     } catch (error) {
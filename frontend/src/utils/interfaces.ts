@@ -31,9 +31,10 @@ export interface CallingPoint {
 
 
 export interface TaskResponse {
-  status: 'pending' | 'completed' | 'failed';
+  status: 'pending' | 'completed' | 'failed' | 'expired' | 'cancelled';
   task_id: string;
   check_status_url?: string;
+  wait_url?: string;
   result?: Train[];
   error?: string;
 }